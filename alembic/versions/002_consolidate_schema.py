@@ -0,0 +1,148 @@
+"""consolidate schema
+
+Moves the legacy sms_messages table into messages, adds the tables the
+application models use (device_stats, system_settings, system_logs) and
+the indexes behind the hot queries.
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('devices', sa.Column('port', sa.String(), nullable=True))
+    op.add_column('devices', sa.Column('model', sa.String(), nullable=True))
+
+    op.create_table(
+        'messages',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('device_id', sa.String(), nullable=True),
+        sa.Column('from_number', sa.String(), nullable=False),
+        sa.Column('to_number', sa.String(), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('received_at', sa.DateTime(), nullable=True),
+        sa.Column('forwarded_at', sa.DateTime(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('delivery_attempts', sa.Integer(), nullable=True),
+        sa.Column('last_attempt', sa.DateTime(), nullable=True),
+        sa.Column('retry_after', sa.DateTime(), nullable=True),
+        sa.Column('error_message', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(['device_id'], ['devices.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    # Carry over the legacy table; delivered=false with attempts means a failed forward
+    op.execute("""
+        INSERT INTO messages (id, device_id, from_number, to_number, text, received_at,
+                              forwarded_at, status, delivery_attempts, last_attempt,
+                              retry_after, error_message)
+        SELECT id, device_id, from_number, to_number, text, received_at,
+               CASE WHEN delivered THEN last_attempt END,
+               CASE WHEN delivered THEN 'delivered'
+                    WHEN delivery_attempts > 0 THEN 'failed'
+                    ELSE 'pending' END,
+               delivery_attempts, last_attempt, retry_after, error_message
+        FROM sms_messages
+    """)
+    op.execute(
+        "SELECT setval(pg_get_serial_sequence('messages', 'id'), "
+        "COALESCE((SELECT MAX(id) FROM messages), 0) + 1, false)"
+    )
+    op.drop_table('sms_messages')
+
+    op.create_table(
+        'device_stats',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('device_id', sa.String(), nullable=True),
+        sa.Column('timestamp', sa.DateTime(), nullable=True),
+        sa.Column('signal_strength', sa.Integer(), nullable=True),
+        sa.Column('network_type', sa.String(), nullable=True),
+        sa.Column('operator', sa.String(), nullable=True),
+        sa.Column('cell_id', sa.String(), nullable=True),
+        sa.Column('messages_sent', sa.Integer(), nullable=True),
+        sa.Column('messages_received', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['device_id'], ['devices.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    op.create_table(
+        'system_settings',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('value', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('key')
+    )
+
+    op.create_table(
+        'system_logs',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('timestamp', sa.DateTime(), nullable=True),
+        sa.Column('level', sa.String(), nullable=False),
+        sa.Column('message', sa.Text(), nullable=False),
+        sa.Column('source', sa.String(), nullable=True),
+        sa.Column('details', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    # Indexes for the hot queries
+    op.create_index('ix_messages_device_received', 'messages', ['device_id', 'received_at'])
+    op.create_index(
+        'ix_messages_retry_pending', 'messages', ['retry_after'],
+        postgresql_where=sa.text("status <> 'delivered'")
+    )
+    op.create_index('ix_device_stats_device_timestamp', 'device_stats', ['device_id', 'timestamp'])
+    op.create_index('ix_system_logs_level_timestamp', 'system_logs', ['level', 'timestamp'])
+
+def downgrade() -> None:
+    op.create_table(
+        'sms_messages',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('device_id', sa.String(), nullable=False),
+        sa.Column('from_number', sa.String(), nullable=False),
+        sa.Column('to_number', sa.String(), nullable=False),
+        sa.Column('text', sa.String(), nullable=False),
+        sa.Column('received_at', sa.DateTime(), nullable=False),
+        sa.Column('delivered', sa.Boolean(), default=False),
+        sa.Column('delivery_attempts', sa.Integer(), default=0),
+        sa.Column('last_attempt', sa.DateTime(), nullable=True),
+        sa.Column('error_message', sa.String(), nullable=True),
+        sa.Column('retry_after', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['device_id'], ['devices.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("""
+        INSERT INTO sms_messages (id, device_id, from_number, to_number, text, received_at,
+                                  delivered, delivery_attempts, last_attempt, error_message,
+                                  retry_after)
+        SELECT id, device_id, from_number, to_number, text, COALESCE(received_at, NOW()),
+               status = 'delivered', COALESCE(delivery_attempts, 0), last_attempt,
+               error_message, retry_after
+        FROM messages
+        WHERE device_id IS NOT NULL
+    """)
+    op.execute(
+        "SELECT setval(pg_get_serial_sequence('sms_messages', 'id'), "
+        "COALESCE((SELECT MAX(id) FROM sms_messages), 0) + 1, false)"
+    )
+    op.create_index('idx_sms_device', 'sms_messages', ['device_id'])
+    op.create_index('idx_sms_delivered', 'sms_messages', ['delivered'])
+    op.create_index('idx_sms_retry', 'sms_messages', ['retry_after'])
+
+    op.drop_table('system_logs')
+    op.drop_table('system_settings')
+    op.drop_table('device_stats')
+    op.drop_table('messages')
+    op.drop_column('devices', 'model')
+    op.drop_column('devices', 'port')
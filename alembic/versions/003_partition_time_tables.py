@@ -0,0 +1,96 @@
+"""partition time tables
+
+Turns messages, device_stats and system_logs into tables range-partitioned
+on their timestamp. Existing rows are not copied: each old table is
+attached as a "history" partition covering everything before the current
+period, so the migration only has to validate a CHECK constraint. The
+history partition is dropped by retention like any other once it ages out.
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+
+from src.config import settings
+from src.database.partitions import PartitionManager, period_start
+
+# revision identifiers
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+# table -> (partition key, secondary indexes as (name, definition))
+TABLES = {
+    'messages': ('received_at', [
+        ('ix_messages_device_received', '(device_id, received_at)'),
+        ('ix_messages_retry_pending', "(retry_after) WHERE status <> 'delivered'"),
+    ]),
+    'device_stats': ('timestamp', [
+        ('ix_device_stats_device_timestamp', '(device_id, timestamp)'),
+    ]),
+    'system_logs': ('timestamp', [
+        ('ix_system_logs_level_timestamp', '(level, timestamp)'),
+    ]),
+}
+
+def upgrade() -> None:
+    now = datetime.utcnow()
+    planner = PartitionManager(None)
+    for table, (key, indexes) in TABLES.items():
+        history = f"{table}_history"
+        boundary = period_start(now, settings.PARTITION_TABLES[table]['interval']).isoformat()
+
+        op.execute(f"UPDATE {table} SET {key} = NOW() AT TIME ZONE 'utc' WHERE {key} IS NULL")
+        op.execute(f"ALTER TABLE {table} RENAME TO {history}")
+        op.execute(f"ALTER TABLE {history} RENAME CONSTRAINT {table}_pkey TO {history}_pkey")
+        for name, _ in indexes:
+            op.execute(f"DROP INDEX IF EXISTS {name}")
+
+        op.execute(
+            f"CREATE TABLE {table} (LIKE {history} INCLUDING DEFAULTS) "
+            f"PARTITION BY RANGE ({key})"
+        )
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN {key} SET NOT NULL")
+        op.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id, {key})")
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+        if table != 'system_logs':
+            op.execute(f"ALTER TABLE {table} ADD FOREIGN KEY (device_id) REFERENCES devices (id)")
+
+        # The CHECK lets ATTACH skip its own full scan
+        op.execute(f"ALTER TABLE {history} ALTER COLUMN {key} SET NOT NULL")
+        op.execute(f"ALTER TABLE {history} ADD CONSTRAINT {history}_bound CHECK ({key} < '{boundary}')")
+        op.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {history} "
+            f"FOR VALUES FROM (MINVALUE) TO ('{boundary}')"
+        )
+        op.execute(f"ALTER TABLE {history} DROP CONSTRAINT {history}_bound")
+
+        for name, start, end in planner.planned(table, now):
+            op.execute(
+                f"CREATE TABLE {name} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+        for name, definition in indexes:
+            op.execute(f"CREATE INDEX {name} ON {table} {definition}")
+
+def downgrade() -> None:
+    for table, (key, indexes) in TABLES.items():
+        partitioned = f"{table}_partitioned"
+        op.execute(f"ALTER TABLE {table} RENAME TO {partitioned}")
+        op.execute(f"ALTER TABLE {partitioned} RENAME CONSTRAINT {table}_pkey TO {partitioned}_pkey")
+        for name, _ in indexes:
+            op.execute(f"DROP INDEX IF EXISTS {name}")
+        op.execute(f"CREATE TABLE {table} (LIKE {partitioned} INCLUDING DEFAULTS)")
+        op.execute(f"INSERT INTO {table} SELECT * FROM {partitioned}")
+        op.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id)")
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+        if table != 'system_logs':
+            op.execute(f"ALTER TABLE {table} ADD FOREIGN KEY (device_id) REFERENCES devices (id)")
+        op.execute(f"DROP TABLE {partitioned} CASCADE")
+        for name, definition in indexes:
+            op.execute(f"CREATE INDEX {name} ON {table} {definition}")
@@ -0,0 +1,64 @@
+"""message counters
+
+Hourly per-device message counts, kept up to date by ingest, so message
+analytics read a few hundred counter rows instead of aggregating
+messages. Partitioned on the hour like the other time tables; existing
+messages are backfilled into a history partition.
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+
+from src.config import settings
+from src.database.partitions import PartitionManager, period_start
+
+# revision identifiers
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    now = datetime.utcnow()
+    boundary = period_start(now, settings.PARTITION_TABLES['message_counters']['interval']).isoformat()
+
+    op.execute("""
+        CREATE TABLE message_counters (
+            device_id VARCHAR NOT NULL REFERENCES devices (id),
+            hour TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            received INTEGER NOT NULL DEFAULT 0,
+            delivered INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            last_message TIMESTAMP WITHOUT TIME ZONE,
+            PRIMARY KEY (device_id, hour)
+        ) PARTITION BY RANGE (hour)
+    """)
+    op.execute(
+        "CREATE TABLE message_counters_history PARTITION OF message_counters "
+        f"FOR VALUES FROM (MINVALUE) TO ('{boundary}')"
+    )
+    for name, start, end in PartitionManager(None).planned('message_counters', now):
+        op.execute(
+            f"CREATE TABLE {name} PARTITION OF message_counters "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    op.execute("CREATE INDEX ix_message_counters_hour ON message_counters (hour)")
+
+    # delivery_attempts counts failed forwards, matching the failed counter
+    op.execute("""
+        INSERT INTO message_counters (device_id, hour, received, delivered, failed, last_message)
+        SELECT device_id, date_trunc('hour', received_at), COUNT(*),
+               COUNT(*) FILTER (WHERE status = 'delivered'),
+               COALESCE(SUM(delivery_attempts), 0), MAX(received_at)
+        FROM messages
+        WHERE device_id IS NOT NULL
+        GROUP BY 1, 2
+    """)
+
+def downgrade() -> None:
+    op.execute("DROP TABLE message_counters")
@@ -0,0 +1,38 @@
+"""search indexes
+
+tsvector and trigram GIN indexes on message and log text, plus the
+(timestamp, id) indexes behind keyset pagination. Creating an index on a
+partitioned table builds it on every partition and cannot run
+CONCURRENTLY, so run this in a quiet period on large installs.
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_messages_received_id', 'messages', '(received_at, id)'),
+    ('ix_messages_from_received', 'messages', '(from_number, received_at)'),
+    ('ix_messages_text_fts', 'messages', "USING gin (to_tsvector('simple', text))"),
+    ('ix_messages_text_trgm', 'messages', 'USING gin (text gin_trgm_ops)'),
+    ('ix_system_logs_timestamp_id', 'system_logs', '(timestamp, id)'),
+    ('ix_system_logs_message_fts', 'system_logs', "USING gin (to_tsvector('simple', message))"),
+    ('ix_system_logs_message_trgm', 'system_logs', 'USING gin (message gin_trgm_ops)'),
+]
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table, definition in INDEXES:
+        op.execute(f"CREATE INDEX {name} ON {table} {definition}")
+
+def downgrade() -> None:
+    for name, _, _ in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
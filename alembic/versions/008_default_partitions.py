@@ -0,0 +1,31 @@
+"""default partitions
+
+Adds a DEFAULT partition to every range-partitioned table so rows with a
+timestamp outside the existing ranges (a modem clock that is off, a
+provider's historical time) are stored instead of failing their insert.
+PartitionManager moves such rows into a range partition when it creates one.
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+
+from src.config import settings
+from src.database.partitions import default_partition
+
+# revision identifiers
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    for table in settings.PARTITION_TABLES:
+        op.execute(f"CREATE TABLE IF NOT EXISTS {default_partition(table)} PARTITION OF {table} DEFAULT")
+
+def downgrade() -> None:
+    for table in settings.PARTITION_TABLES:
+        # Rows in the default partition have no other home; they go with it
+        op.execute(f"DROP TABLE IF EXISTS {default_partition(table)}")
@@ -0,0 +1,35 @@
+"""message ids
+
+Stores the provider id of each message and claims it in message_ids, so
+a redelivered webhook or a repeated poll is skipped even after a restart
+or on another worker. A unique index on messages would have to include
+received_at, which differs between deliveries of the same message.
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('external_id', sa.String(), nullable=True))
+    op.create_table(
+        'message_ids',
+        sa.Column('external_id', sa.String(), nullable=False),
+        sa.Column('seen_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('external_id')
+    )
+    op.create_index('ix_message_ids_seen_at', 'message_ids', ['seen_at'])
+
+def downgrade() -> None:
+    op.drop_index('ix_message_ids_seen_at', table_name='message_ids')
+    op.drop_table('message_ids')
+    op.drop_column('messages', 'external_id')
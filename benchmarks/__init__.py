@@ -0,0 +1,6 @@
+"""Hardware-free benchmarks for the SMS bridge
+
+Simulated modems (pty), Franklin/Twilio/SMSHUB HTTP servers and ADB
+endpoints drive the real device managers, supervisor and ingest
+pipeline. Run with ``python -m benchmarks``; see benchmarks/README.md.
+"""
@@ -0,0 +1,86 @@
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import sys
+from datetime import datetime
+
+from src.config import settings
+
+from .environment import apply_overrides, git_revision, raise_fd_limit
+from .scenarios import SCENARIOS, run_scenario
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Run hardware-free SMS bridge benchmarks and emit JSON results"
+    )
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run (repeatable, default: all)")
+    parser.add_argument("--devices", default="1,10,100,500",
+                        help="comma-separated device counts (default: 1,10,100,500)")
+    parser.add_argument("--duration", type=float, default=30,
+                        help="measurement window in seconds")
+    parser.add_argument("--rate", type=float, default=0.1,
+                        help="inbound messages per device per second")
+    parser.add_argument("--device-latency", type=float, default=0.01,
+                        help="simulated device/API response time in seconds")
+    parser.add_argument("--smshub-latency", type=float, default=0.02,
+                        help="simulated SMSHUB response time in seconds")
+    parser.add_argument("--urc", action="store_true",
+                        help="emit +CMTI URCs from simulated modems")
+    parser.add_argument("--warmup", type=float, default=30,
+                        help="max seconds to wait for devices to come online")
+    parser.add_argument("--drain", type=float, default=30,
+                        help="max seconds to wait for in-flight messages")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="override a setting, e.g. --set MESSAGE_CHECK_INTERVAL=2")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    return parser.parse_args(argv)
+
+async def run(args) -> dict:
+    options = {
+        "rate": args.rate,
+        "device_latency": args.device_latency,
+        "smshub_latency": args.smshub_latency,
+        "urc": args.urc,
+        "warmup": args.warmup,
+        "drain": args.drain
+    }
+    results = []
+    for scenario in args.scenario or sorted(SCENARIOS):
+        for count in [int(n) for n in args.devices.split(",")]:
+            logging.getLogger(__name__).warning(f"Running {scenario} with {count} devices")
+            results.append(await run_scenario(scenario, count, args.duration, options))
+    return {"results": results}
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format=settings.LOG_FORMAT)
+    # Device managers log every transient error; keep the output readable
+    logging.getLogger("src").setLevel(logging.CRITICAL)
+    overrides = apply_overrides(args.set)
+    raise_fd_limit()
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "options": vars(args),
+            "overrides": overrides
+        },
+        **asyncio.run(run(args))
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        sys.stdout.write(output + "\n")
+
+if __name__ == "__main__":
+    main()
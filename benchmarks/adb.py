@@ -0,0 +1,101 @@
+import asyncio
+import itertools
+import re
+import time
+from typing import Dict, Optional, Tuple
+
+from adb_shell import constants
+from adb_shell.adb_message import AdbMessage, unpack
+
+from .ledger import Ledger
+
+class FakeAdbDevice:
+    """ADB-over-TCP endpoint answering the shell commands AndroidManager uses
+
+    Speaks just enough of the ADB wire protocol for adb_shell: an
+    unauthenticated CNXN handshake, then OPEN/OKAY/WRTE/CLSE per shell
+    command. Each command is answered after `latency` seconds.
+    """
+
+    def __init__(self, ledger: Ledger, latency: float = 0.02):
+        self.ledger = ledger
+        self.latency = latency
+        self.inbox: Dict[int, Tuple[str, str, int]] = {}
+        self.commands = 0
+        self.port: Optional[int] = None
+        self._ids = itertools.count(1)
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def deliver(self, _key: str = None):
+        self.inbox[next(self._ids)] = (
+            "+15559998888", self.ledger.new_message(), int(time.time() * 1000)
+        )
+
+    def shell(self, command: str) -> str:
+        self.commands += 1
+        if command.startswith('getprop ro.product.model'):
+            return "BenchPhone\n"
+        if command.startswith('getprop ro.build.version.release'):
+            return "13\n"
+        if command.startswith('service call iphonesubinfo'):
+            return "Result: Parcel(00000000 '....')\n"
+        if command.startswith('content query --uri content://sms/inbox'):
+            return "".join(
+                f"_id={message_id} address={sender} body={text} date={date} read=0\n"
+                for message_id, (sender, text, date) in list(self.inbox.items())
+            )
+        match = re.match(r'content update --uri content://sms/(\d+)', command)
+        if match:
+            self.inbox.pop(int(match.group(1)), None)
+            return ""
+        if command.startswith('am broadcast'):
+            return "Broadcasting: Intent\nBroadcast completed: result=0\n"
+        if command.startswith('dumpsys telephony.registry'):
+            return "mSignalStrength=SignalStrength: 20 99\n"
+        return ""
+
+    @staticmethod
+    async def _read_message(reader: asyncio.StreamReader):
+        header = await reader.readexactly(constants.MESSAGE_SIZE)
+        command, arg0, arg1, length, _ = unpack(header)
+        data = await reader.readexactly(length) if length else b""
+        return constants.WIRE_TO_ID.get(command), arg0, arg1, data
+
+    @staticmethod
+    def _send(writer: asyncio.StreamWriter, command: bytes, arg0: int, arg1: int,
+              data: bytes = b""):
+        message = AdbMessage(command, arg0, arg1, data)
+        writer.write(message.pack() + data)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        streams = itertools.count(1)
+        try:
+            while True:
+                command, arg0, _, data = await self._read_message(reader)
+                if command == constants.CNXN:
+                    self._send(writer, constants.CNXN, constants.VERSION,
+                               constants.MAX_ADB_DATA, b"device::ro.product.model=BenchPhone;\0")
+                elif command == constants.OPEN:
+                    local_id, remote_id = next(streams), arg0
+                    self._send(writer, constants.OKAY, local_id, remote_id)
+                    destination = data.rstrip(b"\0").decode()
+                    await asyncio.sleep(self.latency)
+                    output = self.shell(destination.partition(':')[2])
+                    if output:
+                        self._send(writer, constants.WRTE, local_id, remote_id, output.encode())
+                    self._send(writer, constants.CLSE, local_id, remote_id)
+                # OKAY / CLSE acknowledgements from the client need no reply
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,43 @@
+"""Compare two benchmark result files: python -m benchmarks.compare old.json new.json"""
+import json
+import sys
+
+METRICS = (
+    ("throughput_per_s", "throughput/s", 1),
+    ("latency_ms.p50", "p50 ms", -1),
+    ("latency_ms.p99", "p99 ms", -1),
+    ("lost", "lost", -1)
+)
+
+def _get(result, path):
+    for key in path.split("."):
+        result = (result or {}).get(key)
+    return result
+
+def _key(result):
+    return result["scenario"], result["devices"]
+
+def compare(old, new):
+    previous = {_key(r): r for r in old["results"]}
+    lines = [f"{old['meta']['revision']} -> {new['meta']['revision']}"]
+    for result in new["results"]:
+        before = previous.get(_key(result))
+        if before is None:
+            continue
+        cells = []
+        for path, label, better in METRICS:
+            a, b = _get(before, path), _get(result, path)
+            if a is None or b is None:
+                cells.append(f"{label} n/a")
+                continue
+            change = (b - a) / a * 100 if a else 0.0
+            marker = "+" if change * better > 5 else "-" if change * better < -5 else " "
+            cells.append(f"{label} {a:g} -> {b:g} ({change:+.0f}%){marker}")
+        lines.append(f"{result['scenario']:>9} x{result['devices']:<4} " + "  ".join(cells))
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit(__doc__)
+    with open(sys.argv[1]) as a, open(sys.argv[2]) as b:
+        print(compare(json.load(a), json.load(b)))
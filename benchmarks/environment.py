@@ -0,0 +1,29 @@
+import json
+import resource
+import subprocess
+
+from src.config import settings
+
+def apply_overrides(pairs):
+    overrides = {}
+    for pair in pairs:
+        key, _, value = pair.partition("=")
+        if not hasattr(settings, key):
+            raise SystemExit(f"Unknown setting: {key}")
+        overrides[key] = type(getattr(settings, key))(json.loads(value))
+    settings.update(**overrides)
+    return overrides
+
+def raise_fd_limit():
+    """Every simulated modem costs a pty pair plus the serial handle"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return "unknown"
@@ -0,0 +1,51 @@
+import itertools
+import re
+import time
+from typing import Dict, List
+
+MESSAGE_PATTERN = re.compile(r'BENCH-(\d+)')
+
+class Ledger:
+    """Records when each benchmark SMS was generated and when SMSHUB got it
+
+    Simulated devices create message texts with `new_message()`; the fake
+    SMSHUB calls `delivered()` with the pushed text. Only messages generated
+    while `recording` is on are counted, so warm-up and drain traffic stay
+    out of the results.
+    """
+
+    def __init__(self):
+        self.recording = False
+        self.generated: Dict[int, float] = {}
+        self.received: Dict[int, float] = {}
+        self.duplicates = 0
+        self._sequence = itertools.count(1)
+
+    def new_message(self) -> str:
+        sequence = next(self._sequence)
+        if self.recording:
+            self.generated[sequence] = time.monotonic()
+        return f"BENCH-{sequence}"
+
+    def delivered(self, text: str):
+        match = MESSAGE_PATTERN.search(text or "")
+        if not match:
+            return
+        sequence = int(match.group(1))
+        if sequence not in self.generated:
+            return
+        if sequence in self.received:
+            self.duplicates += 1
+            return
+        self.received[sequence] = time.monotonic()
+
+    @property
+    def pending(self) -> int:
+        return len(self.generated) - len(self.received)
+
+    def latencies(self) -> List[float]:
+        return sorted(
+            self.received[sequence] - generated
+            for sequence, generated in self.generated.items()
+            if sequence in self.received
+        )
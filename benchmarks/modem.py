@@ -0,0 +1,160 @@
+import asyncio
+import os
+import pty
+import random
+import tty
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from .ledger import Ledger
+
+class SimulatedModem:
+    """AT command modem on a pseudo-terminal
+
+    The slave side of the pty is a real tty path, so the serial managers
+    open it with pyserial exactly like a USB modem. Responses are delayed
+    by `latency` seconds, messages arrive as a Poisson process at
+    `arrival_rate` per second and, with `urc`, announce themselves with
+    `+CMTI` unsolicited result codes.
+    """
+
+    def __init__(self, ledger: Ledger, latency: float = 0.01, arrival_rate: float = 0.0,
+                 urc: bool = False, send_latency: float = 0.5,
+                 sender: str = "+15559998888"):
+        self.ledger = ledger
+        self.latency = latency
+        self.arrival_rate = arrival_rate
+        self.urc = urc
+        self.send_latency = send_latency
+        self.sender = sender
+
+        self.master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        os.set_blocking(self.master, False)
+        self.port = os.ttyname(self._slave)
+
+        self.inbox: Dict[int, Tuple[str, str, str]] = {}
+        self.commands = 0
+        self.sent = 0
+        self._next_index = 1
+        self._input = b""
+        self._output = b""
+        self._composing: Optional[str] = None  # recipient while reading CMGS text
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._arrivals: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(self.master, self._on_readable)
+        if self.arrival_rate:
+            self._arrivals = asyncio.create_task(self._generate())
+
+    async def stop(self):
+        if self._arrivals:
+            self._arrivals.cancel()
+            await asyncio.gather(self._arrivals, return_exceptions=True)
+        if self._loop:
+            self._loop.remove_reader(self.master)
+            self._loop.remove_writer(self.master)
+        os.close(self.master)
+        os.close(self._slave)
+
+    def deliver(self, text: str):
+        """Place a message in the SIM inbox"""
+        index = self._next_index
+        self._next_index += 1
+        timestamp = datetime.utcnow().strftime('%y/%m/%d,%H:%M:%S+00')
+        self.inbox[index] = (self.sender, text, timestamp)
+        if self.urc:
+            self._write(f'\r\n+CMTI: "SM",{index}\r\n')
+
+    async def _generate(self):
+        while True:
+            await asyncio.sleep(random.expovariate(self.arrival_rate))
+            self.deliver(self.ledger.new_message())
+
+    def _on_readable(self):
+        try:
+            self._input += os.read(self.master, 4096)
+        except (BlockingIOError, OSError):
+            return
+        self._process()
+
+    def _process(self):
+        while True:
+            if self._composing is not None:
+                end = self._input.find(b'\x1a')
+                if end < 0:
+                    return
+                self._input = self._input[end + 1:]
+                self._composing = None
+                self.sent += 1
+                self._respond(f"+CMGS: {self.sent % 256}\r\n\r\nOK", self.send_latency)
+                continue
+
+            end = self._input.find(b'\r')
+            if end < 0:
+                return
+            line = self._input[:end].decode(errors='ignore').strip()
+            self._input = self._input[end + 1:].lstrip(b'\n')
+            if line:
+                self._command(line)
+
+    def _command(self, line: str):
+        self.commands += 1
+        command = line.upper()
+
+        if command.startswith('AT+CMGS='):
+            self._composing = line.split('=', 1)[1].strip('"')
+            self._respond("> ", terminate=False)
+        elif command.startswith('AT+CMGL'):
+            rows = [
+                f'+CMGL: {index},"REC UNREAD","{sender}",,"{timestamp}",145,{len(text)}\r\n{text}'
+                for index, (sender, text, timestamp) in self.inbox.items()
+            ]
+            self._respond("\r\n".join(rows + ["", "OK"]) if rows else "OK")
+        elif command.startswith('AT+CMGR='):
+            message = self.inbox.get(self._index(command))
+            if message is None:
+                self._respond("+CMS ERROR: 321")
+            else:
+                sender, text, timestamp = message
+                self._respond(f'+CMGR: "REC UNREAD","{sender}",,"{timestamp}"\r\n{text}\r\n\r\nOK')
+        elif command.startswith('AT+CMGD='):
+            self.inbox.pop(self._index(command), None)
+            self._respond("OK")
+        elif command.startswith('AT+CREG?'):
+            self._respond("+CREG: 0,1\r\n\r\nOK")
+        elif command.startswith('AT+CSQ'):
+            self._respond("+CSQ: 20,99\r\n\r\nOK")
+        elif command.startswith('AT+COPS?'):
+            self._respond('+COPS: 0,0,"BENCH",7\r\n\r\nOK')
+        else:
+            self._respond("OK")
+
+    @staticmethod
+    def _index(command: str) -> int:
+        try:
+            return int(command.split('=', 1)[1].split(',')[0])
+        except ValueError:
+            return -1
+
+    def _respond(self, body: str, delay: Optional[float] = None, terminate: bool = True):
+        text = f"\r\n{body}\r\n" if terminate else f"\r\n{body}"
+        self._loop.call_later(self.latency if delay is None else delay, self._write, text)
+
+    def _write(self, text: str):
+        if not self._output:
+            self._loop.add_writer(self.master, self._flush)
+        self._output += text.encode()
+
+    def _flush(self):
+        try:
+            written = os.write(self.master, self._output)
+        except BlockingIOError:
+            return
+        except OSError:
+            written = len(self._output)
+        self._output = self._output[written:]
+        if not self._output:
+            self._loop.remove_writer(self.master)
@@ -0,0 +1,253 @@
+import asyncio
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from src.config import settings
+from src.device_managers import DEVICE_MANAGERS
+from src.device_managers.registry import ManagerRegistry, ManagerResources
+from src.ingest import MessageIngest
+from src.models import Device
+from src.smshub_client import SMSHubClient
+from src.supervisor import DeviceSupervisor
+from src.tracing import tracker
+
+from .adb import FakeAdbDevice
+from .ledger import Ledger
+from .modem import SimulatedModem
+from .servers import FranklinServer, TwilioServer, poisson, serve, smshub_app
+
+class MemoryDatabase:
+    """Just enough of DatabaseManager for the app and ingest path, without Postgres"""
+
+    def __init__(self):
+        self.messages = 0
+        self.flushes = 0
+        self.devices = {}
+
+    async def initialize(self):
+        pass
+
+    async def cleanup(self):
+        pass
+
+    async def add_device(self, device):
+        self.devices[device.id] = device
+        return device
+
+    async def get_device(self, device_id: str):
+        return self.devices.get(device_id)
+
+    async def get_devices(self):
+        return list(self.devices.values())
+
+    async def update_device_status(self, device_id: str, status: str):
+        pass
+
+    async def add_messages(self, messages):
+        self.flushes += 1
+        for message in messages:
+            self.messages += 1
+            message.id = self.messages
+        return messages
+
+    @asynccontextmanager
+    async def unit_of_work(self):
+        yield None
+
+    async def update_message_statuses(self, message_ids, status: str, session=None):
+        pass
+
+    async def schedule_retries(self, message_ids, error: str = None, session=None):
+        pass
+
+    async def add_message_counts(self, counts, session=None):
+        pass
+
+    async def get_settings(self):
+        return {}
+
+    async def update_settings(self, values):
+        pass
+
+    async def claim_due_retries(self, limit: int = 100):
+        return []
+
+    async def prune_message_ids(self, before):
+        return 0
+
+def make_device(index: int, device_type: str, **fields) -> Device:
+    return Device(
+        id=f"bench-{device_type}-{index}",
+        type=device_type,
+        phone_number=f"+1555{index:07d}",
+        status="offline",
+        first_seen=datetime.utcnow(),
+        last_seen=datetime.utcnow(),
+        **fields
+    )
+
+async def modem_devices(stack: AsyncExitStack, ledger: Ledger, count: int,
+                        options: Dict) -> List[Device]:
+    """Huawei-style serial modems on pseudo-terminals"""
+    devices = []
+    for i in range(count):
+        modem = SimulatedModem(
+            ledger,
+            latency=options['device_latency'],
+            arrival_rate=options['rate'],
+            urc=options['urc']
+        )
+        modem.start()
+        stack.push_async_callback(modem.stop)
+        devices.append(make_device(i, options.get('modem_type', 'huawei'), port=modem.port))
+    return devices
+
+async def franklin_devices(stack: AsyncExitStack, ledger: Ledger, count: int,
+                           options: Dict) -> List[Device]:
+    """Franklin hotspots behind one fake web API"""
+    ids = [f"bench-franklin-{i}" for i in range(count)]
+    server = FranklinServer(ledger, ids, latency=options['device_latency'])
+    url = await stack.enter_async_context(serve(server.app()))
+    host = url.split('://', 1)[1]
+    await _arrivals(stack, options['rate'], ids, server.deliver)
+    return [
+        make_device(i, 'franklin', config={'ip': host, 'password': ids[i]})
+        for i in range(count)
+    ]
+
+async def voip_devices(stack: AsyncExitStack, ledger: Ledger, count: int,
+                       options: Dict) -> List[Device]:
+    """Twilio numbers on one account, polled (no webhooks)"""
+    devices = [make_device(i, 'voip') for i in range(count)]
+    server = TwilioServer(ledger, [d.phone_number for d in devices],
+                          latency=options['device_latency'])
+    url = await stack.enter_async_context(serve(server.app()))
+    for device in devices:
+        device.config = {
+            'service_type': 'twilio',
+            'account_sid': TwilioServer.ACCOUNT_SID,
+            'auth_token': "bench",
+            'api_base': url
+        }
+    await _arrivals(stack, options['rate'], server.numbers, server.deliver)
+    return devices
+
+async def android_devices(stack: AsyncExitStack, ledger: Ledger, count: int,
+                          options: Dict) -> List[Device]:
+    """Android phones over ADB/TCP, one endpoint per phone"""
+    devices = []
+    phones = {}
+    for i in range(count):
+        phone = FakeAdbDevice(ledger, latency=options['device_latency'])
+        await phone.start()
+        stack.push_async_callback(phone.stop)
+        device = make_device(i, 'android', config={'ip': '127.0.0.1', 'port': phone.port})
+        phones[device.id] = phone
+        devices.append(device)
+    await _arrivals(stack, options['rate'], list(phones), lambda d: phones[d].deliver())
+    return devices
+
+async def _arrivals(stack: AsyncExitStack, rate: float, keys: List[str], emit):
+    task = asyncio.create_task(poisson(rate, keys, emit))
+
+    async def cancel():
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    stack.push_async_callback(cancel)
+
+SCENARIOS = {
+    'modem': modem_devices,
+    'franklin': franklin_devices,
+    'voip': voip_devices,
+    'android': android_devices
+}
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p90": None, "p99": None, "max": None}
+    pick = lambda p: values[min(len(values) - 1, int(len(values) * p / 100))]
+    return {
+        "p50": round(pick(50) * 1000, 1),
+        "p90": round(pick(90) * 1000, 1),
+        "p99": round(pick(99) * 1000, 1),
+        "max": round(values[-1] * 1000, 1)
+    }
+
+async def _wait_online(devices: List[Device], timeout: float) -> int:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all(d.status == "online" for d in devices):
+            break
+        await asyncio.sleep(0.1)
+    return sum(1 for d in devices if d.status == "online")
+
+async def run_scenario(name: str, count: int, duration: float, options: Dict) -> Dict:
+    """Run the real registry/supervisor/ingest stack against simulated devices
+
+    Messages generated during the measurement window are followed from the
+    simulated device to the fake SMSHUB; end-to-end latency uses the
+    generation time, so it includes the poll interval.
+    """
+    ledger = Ledger()
+    async with AsyncExitStack() as stack:
+        smshub_url = await stack.enter_async_context(
+            serve(smshub_app(ledger, latency=options['smshub_latency']))
+        )
+        devices = await SCENARIOS[name](stack, ledger, count, options)
+
+        db = MemoryDatabase()
+        smshub = SMSHubClient("bench", smshub_url)
+        ingest = MessageIngest(db, smshub)
+        registry = ManagerRegistry(ManagerResources(db), DEVICE_MANAGERS, shards={})
+        supervisor = DeviceSupervisor(registry.manager_for, ingest)
+
+        await registry.start()
+        await ingest.start()
+        started = time.monotonic()
+        for device in devices:
+            supervisor.start(device)
+        online = await _wait_online(devices, options['warmup'])
+        warmup = time.monotonic() - started
+
+        tracker.reset()
+        ledger.recording = True
+        await asyncio.sleep(duration)
+        ledger.recording = False
+
+        # Let in-flight messages reach SMSHUB
+        deadline = time.monotonic() + options['drain']
+        while ledger.pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+        await supervisor.stop()
+        for device in devices:
+            await registry.manager_for(device).cleanup(device)
+        await ingest.stop()
+        await registry.stop()
+        await smshub.close()
+
+    latencies = ledger.latencies()
+    device_type = devices[0].type if devices else name
+    return {
+        "scenario": name,
+        "devices": count,
+        "online": online,
+        "warmup_s": round(warmup, 2),
+        "duration_s": duration,
+        "rate_per_device": options['rate'],
+        "generated": len(ledger.generated),
+        "delivered": len(ledger.received),
+        "lost": ledger.pending,
+        "duplicates": ledger.duplicates,
+        "throughput_per_s": round(len(ledger.received) / duration, 2),
+        "latency_ms": _percentiles(latencies),
+        "db_flushes": db.flushes,
+        "stages_ms": tracker.percentiles(device_type).get(device_type, {}).get("segments", {}),
+        "settings": {
+            "MESSAGE_CHECK_INTERVAL": settings.MESSAGE_CHECK_INTERVAL,
+            "MESSAGE_CHECK_INTERVAL_FAST": settings.MESSAGE_CHECK_INTERVAL_FAST
+        }
+    }
@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+import random
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import AsyncIterator, Callable, Dict, List, Sequence
+from urllib.parse import quote
+
+from aiohttp import web
+
+from .ledger import Ledger
+
+@asynccontextmanager
+async def serve(app: web.Application) -> AsyncIterator[str]:
+    """Run an aiohttp app on a free local port, yielding its base URL"""
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        await runner.cleanup()
+
+async def poisson(rate: float, keys: Sequence[str], emit: Callable[[str], None]):
+    """Emit arrivals at `rate` per key per second, spread over random keys"""
+    total = rate * len(keys)
+    if total <= 0:
+        return
+    while True:
+        await asyncio.sleep(random.expovariate(total))
+        emit(random.choice(keys))
+
+def smshub_app(ledger: Ledger, latency: float = 0.02) -> web.Application:
+    """SMSHUB push endpoint that acknowledges after `latency` seconds"""
+
+    async def push(request):
+        payload = await request.json()
+        await asyncio.sleep(latency)
+        ledger.delivered(payload.get('text'))
+        return web.json_response({'status': 'SUCCESS'})
+
+    app = web.Application()
+    app.router.add_post('/sms', push)
+    return app
+
+class FranklinServer:
+    """Franklin web API for many modems; the login password selects the device"""
+
+    def __init__(self, ledger: Ledger, device_ids: List[str], latency: float = 0.01):
+        self.ledger = ledger
+        self.latency = latency
+        self.device_ids = device_ids
+        self.inboxes: Dict[str, Dict[int, dict]] = {d: {} for d in device_ids}
+        self._passwords = {hashlib.md5(d.encode()).hexdigest(): d for d in device_ids}
+        self._next_id = 1
+
+    def deliver(self, device_id: str):
+        message_id = self._next_id
+        self._next_id += 1
+        self.inboxes[device_id][message_id] = {
+            'id': message_id,
+            'sender': "+15559998888",
+            'text': self.ledger.new_message(),
+            'timestamp': int(time.time())
+        }
+
+    def _device(self, request) -> str:
+        return request.headers.get('Authorization', '').rpartition('tok-')[2]
+
+    def app(self) -> web.Application:
+        async def login(request):
+            await asyncio.sleep(self.latency)
+            device_id = self._passwords.get((await request.json()).get('password'))
+            if device_id is None:
+                return web.json_response({'success': False})
+            return web.json_response({'success': True, 'token': f"tok-{device_id}"})
+
+        async def sms_list(request):
+            await asyncio.sleep(self.latency)
+            inbox = self.inboxes.get(self._device(request), {})
+            return web.json_response({'success': True, 'messages': list(inbox.values())})
+
+        async def sms_delete(request):
+            await asyncio.sleep(self.latency)
+            inbox = self.inboxes.get(self._device(request), {})
+            inbox.pop((await request.json()).get('id'), None)
+            return web.json_response({'success': True})
+
+        async def sms_send(request):
+            await asyncio.sleep(self.latency)
+            return web.json_response({'success': True})
+
+        async def signal(request):
+            await asyncio.sleep(self.latency)
+            return web.json_response({'success': True, 'signal': {'rssi': -70}})
+
+        async def device_info(request):
+            await asyncio.sleep(self.latency)
+            return web.json_response({'success': True, 'device': {'model': 'BENCH'}})
+
+        app = web.Application()
+        app.router.add_post('/api/v1/login', login)
+        app.router.add_get('/api/v1/sms/list', sms_list)
+        app.router.add_post('/api/v1/sms/delete', sms_delete)
+        app.router.add_post('/api/v1/sms/send', sms_send)
+        app.router.add_get('/api/v1/device/signal', signal)
+        app.router.add_get('/api/v1/device/info', device_info)
+        return app
+
+class TwilioServer:
+    """Twilio REST API subset: account lookup, message list and send
+
+    Messages older than `retention` seconds are dropped so listing stays
+    cheap; the bridge only asks for messages since its last sweep anyway.
+    """
+
+    ACCOUNT_SID = "ACbench"
+
+    def __init__(self, ledger: Ledger, numbers: List[str], latency: float = 0.02,
+                 retention: float = 120):
+        self.ledger = ledger
+        self.latency = latency
+        self.retention = retention
+        self.numbers = numbers
+        self.messages: Dict[str, List[dict]] = {n: [] for n in numbers}
+        self.requests = 0
+        self._next_sid = 1
+
+    def deliver(self, number: str):
+        now = datetime.now(timezone.utc)
+        messages = self.messages[number]
+        messages.append({
+            'sid': f"SM{self._next_sid:032d}",
+            'direction': 'inbound',
+            'from': "+15559998888",
+            'to': number,
+            'body': self.ledger.new_message(),
+            'date_created': format_datetime(now),
+            'date_sent': format_datetime(now),
+            '_at': time.monotonic()
+        })
+        self._next_sid += 1
+        cutoff = time.monotonic() - self.retention
+        while messages and messages[0]['_at'] < cutoff:
+            messages.pop(0)
+
+    def app(self) -> web.Application:
+        base = f"/2010-04-01/Accounts/{self.ACCOUNT_SID}"
+
+        async def account(request):
+            self.requests += 1
+            await asyncio.sleep(self.latency)
+            return web.json_response({'sid': self.ACCOUNT_SID, 'status': 'active'})
+
+        async def list_messages(request):
+            self.requests += 1
+            await asyncio.sleep(self.latency)
+            messages = self.messages.get(request.query.get('To'), [])
+            page = int(request.query.get('Page', 0))
+            size = int(request.query.get('PageSize', 50))
+            chunk = messages[page * size:(page + 1) * size]
+            next_page = None
+            if (page + 1) * size < len(messages):
+                next_page = (f"{base}/Messages.json?To={quote(request.query.get('To', ''))}"
+                             f"&PageSize={size}&Page={page + 1}")
+            return web.json_response({
+                'messages': [{k: v for k, v in m.items() if k != '_at'} for m in chunk],
+                'next_page_uri': next_page
+            })
+
+        async def send(request):
+            self.requests += 1
+            await asyncio.sleep(self.latency)
+            return web.json_response({'sid': 'SMout', 'status': 'queued'}, status=201)
+
+        app = web.Application()
+        app.router.add_get(f"{base}.json", account)
+        app.router.add_get(f"{base}/Messages.json", list_messages)
+        app.router.add_post(f"{base}/Messages.json", send)
+        return app
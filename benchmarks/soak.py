@@ -0,0 +1,344 @@
+import asyncio
+import gc
+import itertools
+import json
+import logging
+import os
+import random
+import time
+import tracemalloc
+from contextlib import AsyncExitStack
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import aiohttp
+import uvicorn
+
+from src.config import settings
+
+from .environment import git_revision
+from .ledger import Ledger
+from .scenarios import SCENARIOS, MemoryDatabase, _percentiles
+from .servers import serve, smshub_app
+
+logger = logging.getLogger(__name__)
+
+API_READS = (
+    "/api/devices",
+    "/api/devices/polling",
+    "/api/analytics/latency",
+    "/metrics"
+)
+
+def parse_duration(value: str) -> float:
+    """Seconds from '90', '45m', '6h' or '1d'"""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    value = value.strip().lower()
+    if value and value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def open_fds() -> Optional[int]:
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+def growth_per_hour(samples: List[Dict], key: str) -> Optional[float]:
+    """Least-squares slope of a sampled value, per hour"""
+    points = [(s["elapsed_s"], s[key]) for s in samples if s.get(key) is not None]
+    if len(points) < 2:
+        return None
+    mean_t = sum(t for t, _ in points) / len(points)
+    mean_v = sum(v for _, v in points) / len(points)
+    spread = sum((t - mean_t) ** 2 for t, _ in points)
+    if not spread:
+        return None
+    slope = sum((t - mean_t) * (v - mean_v) for t, v in points) / spread
+    return round(slope * 3600, 3)
+
+class SoakTest:
+    """Drive the full FastAPI app with simulated devices for hours
+
+    The app runs under uvicorn in this process, next to the simulated
+    devices and the load: inbound SMS from the devices, WebSocket
+    dashboards, API reads and periodic batch operations. Every report
+    interval a sample of latency, memory, live objects and event-loop
+    lag is logged and appended to the output file as a JSON line, so
+    slow leaks show up as a trend rather than a crash.
+    """
+
+    def __init__(self, options: Dict):
+        self.options = options
+        self.ledger = Ledger()
+        self.samples: List[Dict] = []
+        self.devices = []
+        self.base_url: Optional[str] = None
+        self._requests: Dict[str, List[float]] = {}
+        self._errors: Dict[str, int] = {}
+        self._lag: List[float] = []
+        self._ws_messages = 0
+        self._ws_reconnects = 0
+        self._delivered_cursor = 0
+        self._generated_cursor = 0
+        self._in_flight = set()
+        self._started = 0.0
+
+    # Load ----------------------------------------------------------------
+
+    def _record(self, name: str, started: float, ok: bool):
+        self._requests.setdefault(name, []).append(time.monotonic() - started)
+        if not ok:
+            self._errors[name] = self._errors.get(name, 0) + 1
+
+    async def _request(self, session: aiohttp.ClientSession, name: str, method: str,
+                       path: str, **kwargs) -> Optional[dict]:
+        started = time.monotonic()
+        try:
+            async with session.request(method, f"{self.base_url}{path}", **kwargs) as resp:
+                body = await resp.read()
+                self._record(name, started, resp.status < 400)
+                if resp.content_type == "application/json":
+                    return json.loads(body)
+        except Exception as e:
+            self._record(name, started, False)
+            logger.debug(f"{name} request error: {str(e)}")
+        return None
+
+    async def _api_reads(self, session: aiohttp.ClientSession):
+        """Open-loop reads: a slow server shows up as latency, not a lower rate"""
+        rate = self.options["api_rate"]
+        if rate <= 0:
+            return
+        paths = itertools.cycle(API_READS)
+        while True:
+            await asyncio.sleep(random.expovariate(rate))
+            if len(self._in_flight) >= self.options["max_in_flight"]:
+                self._errors["dropped"] = self._errors.get("dropped", 0) + 1
+                continue
+            path = next(paths)
+            task = asyncio.create_task(self._request(session, f"GET {path}", "GET", path))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _batches(self, session: aiohttp.ClientSession):
+        interval = self.options["batch_interval"]
+        if interval <= 0:
+            return
+        operations = itertools.cycle(("signal", "restart"))
+        while True:
+            await asyncio.sleep(interval)
+            count = min(self.options["batch_size"], len(self.devices))
+            operation = next(operations)
+            await self._request(
+                session, f"POST /api/batch {operation}", "POST", "/api/batch",
+                json={"type": operation, "devices": [d.id for d in random.sample(self.devices, count)]}
+            )
+
+    async def _dashboard(self, session: aiohttp.ClientSession):
+        while True:
+            try:
+                async with session.ws_connect(f"{self.base_url}/ws", heartbeat=30) as ws:
+                    async for message in ws:
+                        if message.type == aiohttp.WSMsgType.TEXT:
+                            self._ws_messages += 1
+                        elif message.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                            break
+            except Exception as e:
+                logger.debug(f"Dashboard connection error: {str(e)}")
+            self._ws_reconnects += 1
+            await asyncio.sleep(1)
+
+    async def _watch_loop(self):
+        """Event-loop lag: how late a 100ms sleep wakes up"""
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(0.1)
+            self._lag.append(max(0.0, time.monotonic() - started - 0.1))
+
+    # Reporting -------------------------------------------------------------
+
+    def _take(self, source: Dict, cursor: int):
+        return list(itertools.islice(source.items(), cursor, None))
+
+    def sample(self) -> Dict:
+        """Collect and reset the current report window"""
+        delivered = self._take(self.ledger.received, self._delivered_cursor)
+        self._delivered_cursor += len(delivered)
+        generated = len(self.ledger.generated) - self._generated_cursor
+        self._generated_cursor = len(self.ledger.generated)
+        latencies = sorted(at - self.ledger.generated[seq] for seq, at in delivered)
+
+        objects = gc.get_objects()
+        sample = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "elapsed_s": round(time.monotonic() - self._started, 1),
+            "generated": generated,
+            "delivered": len(delivered),
+            "pending": self.ledger.pending,
+            "sms_latency_ms": _percentiles(latencies),
+            "api_ms": {
+                name: {**_percentiles(sorted(values)), "count": len(values),
+                       "errors": self._errors.get(name, 0)}
+                for name, values in sorted(self._requests.items())
+            },
+            "loop_lag_ms": _percentiles(sorted(self._lag)),
+            "websocket": {"messages": self._ws_messages, "reconnects": self._ws_reconnects},
+            "rss_mb": round(rss_bytes() / 2 ** 20, 1),
+            "open_fds": open_fds(),
+            "tasks": len(asyncio.all_tasks()),
+            "gc_objects": len(objects),
+            "client_sessions": sum(1 for o in objects if isinstance(o, aiohttp.ClientSession)),
+            "dropped_requests": self._errors.get("dropped", 0)
+        }
+        del objects
+        if tracemalloc.is_tracing():
+            sample["traced_mb"] = round(tracemalloc.get_traced_memory()[0] / 2 ** 20, 1)
+            sample["top_growth"] = self._top_growth()
+
+        self._requests = {}
+        self._errors = {}
+        self._lag = []
+        self._ws_messages = 0
+        self._ws_reconnects = 0
+        return sample
+
+    def _top_growth(self, limit: int = 5) -> List[str]:
+        snapshot = tracemalloc.take_snapshot()
+        if not hasattr(self, "_baseline"):
+            self._baseline = snapshot
+            return []
+        stats = snapshot.compare_to(self._baseline, "lineno")
+        return [str(stat) for stat in stats[:limit] if stat.size_diff > 0]
+
+    def _log(self, sample: Dict):
+        lag = sample["loop_lag_ms"]
+        sms = sample["sms_latency_ms"]
+        logger.warning(
+            f"[{sample['elapsed_s']:>8.0f}s] sms {sample['delivered']}/{sample['generated']} "
+            f"p99 {sms['p99']}ms pending {sample['pending']} | loop lag p99 {lag['p99']}ms "
+            f"max {lag['max']}ms | rss {sample['rss_mb']}MB fds {sample['open_fds']} "
+            f"tasks {sample['tasks']} sessions {sample['client_sessions']}"
+        )
+
+    def summary(self) -> Dict:
+        measured = self.samples[1:] or self.samples
+        return {
+            "generated": len(self.ledger.generated),
+            "delivered": len(self.ledger.received),
+            "lost": self.ledger.pending,
+            "duplicates": self.ledger.duplicates,
+            "sms_latency_ms": _percentiles(self.ledger.latencies()),
+            "loop_lag_max_ms": max((s["loop_lag_ms"]["max"] or 0 for s in self.samples), default=None),
+            # The first window includes startup allocations, so leave it out
+            "rss_growth_mb_per_hour": growth_per_hour(measured, "rss_mb"),
+            "fd_growth_per_hour": growth_per_hour(measured, "open_fds"),
+            "task_growth_per_hour": growth_per_hour(measured, "tasks"),
+            "client_session_growth_per_hour": growth_per_hour(measured, "client_sessions"),
+            "rss_mb": {
+                "start": self.samples[0]["rss_mb"] if self.samples else None,
+                "end": self.samples[-1]["rss_mb"] if self.samples else None
+            }
+        }
+
+    # Run -------------------------------------------------------------------
+
+    async def _start_app(self, stack: AsyncExitStack, smshub_url: str):
+        # One synthetic client drives the whole fleet; keep the concurrency
+        # limits but not the per-client rate limits
+        settings.RATE_LIMIT_BACKEND = ""
+        from src import main
+
+        if self.options["memory_db"]:
+            # No PostgreSQL behind it, so no partitions to maintain
+            main.partitions.tables = {}
+            memory = MemoryDatabase()
+            main.db = memory
+            main.ingest.db = memory
+            main.registry.resources.db = memory
+            main.config_service.db = memory
+        main.smshub.base_url = smshub_url
+
+        config = uvicorn.Config(main.app, host="127.0.0.1", port=self.options["port"],
+                                log_level="warning", lifespan="on")
+        server = uvicorn.Server(config)
+        task = asyncio.create_task(server.serve())
+
+        async def stop():
+            server.should_exit = True
+            await asyncio.gather(task, return_exceptions=True)
+
+        stack.push_async_callback(stop)
+        while not server.started:
+            if task.done():
+                raise RuntimeError("App failed to start")
+            await asyncio.sleep(0.05)
+        port = server.servers[0].sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+
+    def _spawn(self, stack: AsyncExitStack, coro):
+        task = asyncio.create_task(coro)
+
+        async def cancel():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        stack.push_async_callback(cancel)
+
+    async def run(self, duration: float, output=None) -> Dict:
+        options = self.options
+        if options["tracemalloc"]:
+            tracemalloc.start(10)
+        async with AsyncExitStack() as stack:
+            smshub_url = await stack.enter_async_context(
+                serve(smshub_app(self.ledger, latency=options["smshub_latency"]))
+            )
+            self.devices = await SCENARIOS[options["scenario"]](
+                stack, self.ledger, options["devices"], options
+            )
+            await self._start_app(stack, smshub_url)
+            session = await stack.enter_async_context(aiohttp.ClientSession())
+
+            for device in self.devices:
+                await self._request(session, "POST /api/devices", "POST", "/api/devices",
+                                    data=device.json(),
+                                    headers={"content-type": "application/json"})
+
+            self._started = time.monotonic()
+            self.ledger.recording = True
+            self._spawn(stack, self._watch_loop())
+            self._spawn(stack, self._api_reads(session))
+            self._spawn(stack, self._batches(session))
+            for _ in range(options["dashboards"]):
+                self._spawn(stack, self._dashboard(session))
+
+            deadline = self._started + duration
+            while time.monotonic() < deadline:
+                await asyncio.sleep(min(options["report_interval"], max(0.0, deadline - time.monotonic())))
+                sample = self.sample()
+                self.samples.append(sample)
+                self._log(sample)
+                if output:
+                    output.write(json.dumps({"sample": sample}) + "\n")
+                    output.flush()
+
+            self.ledger.recording = False
+            drain_until = time.monotonic() + options["drain"]
+            while self.ledger.pending and time.monotonic() < drain_until:
+                await asyncio.sleep(0.1)
+
+        summary = self.summary()
+        if output:
+            output.write(json.dumps({
+                "summary": summary,
+                "meta": {"revision": git_revision(), "options": options}
+            }) + "\n")
+        return summary
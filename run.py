@@ -1,7 +1,7 @@
+import argparse
 import asyncio
-import uvicorn
+import json
 import logging
-from src.main import app, db, smshub
 
 logging.basicConfig(
     level=logging.INFO,
@@ -12,23 +12,27 @@ logger = logging.getLogger(__name__)
 
 async def startup():
     """Initialize database and connections"""
+    from src.main import db, smshub
     try:
         # Initialize database
         await db.initialize()
         logger.info("Database initialized successfully")
-        
+
         # Test SMSHUB connection
         await smshub.test_connection()
         logger.info("SMSHUB connection verified")
-        
+
     except Exception as e:
         logger.error(f"Startup error: {str(e)}")
         raise
 
 async def main():
+    import uvicorn
+    from src.main import app
+
     # Initialize services
     await startup()
-    
+
     # Configure and run server
     config = uvicorn.Config(
         app,
@@ -40,11 +44,79 @@ async def main():
     server = uvicorn.Server(config)
     await server.serve()
 
+async def soak(args):
+    """Run the app against simulated devices under sustained load"""
+    from benchmarks.environment import apply_overrides, raise_fd_limit
+    from benchmarks.soak import SoakTest, parse_duration
+
+    apply_overrides(args.set)
+    raise_fd_limit()
+    # Device managers log every transient error; keep the reports readable
+    logging.getLogger("src").setLevel(logging.CRITICAL)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    options = {
+        key: value for key, value in vars(args).items()
+        if key not in ("command", "duration", "output", "set")
+    }
+    test = SoakTest(options)
+    if args.output:
+        with open(args.output, "w") as output:
+            summary = await test.run(parse_duration(args.duration), output)
+    else:
+        summary = await test.run(parse_duration(args.duration))
+    print(json.dumps(summary, indent=2))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="SMS Bridge")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("serve", help="run the API server (default)")
+
+    soak_parser = commands.add_parser(
+        "soak", help="load test the full app against simulated devices"
+    )
+    soak_parser.add_argument("--scenario", default="modem",
+                             choices=["modem", "franklin", "voip", "android"])
+    soak_parser.add_argument("--devices", type=int, default=50)
+    soak_parser.add_argument("--duration", default="1h",
+                             help="how long to run, e.g. 900, 30m, 6h")
+    soak_parser.add_argument("--rate", type=float, default=0.05,
+                             help="inbound messages per device per second")
+    soak_parser.add_argument("--dashboards", type=int, default=10,
+                             help="concurrent WebSocket dashboard clients")
+    soak_parser.add_argument("--api-rate", type=float, default=20,
+                             help="API read requests per second")
+    soak_parser.add_argument("--batch-interval", type=float, default=300,
+                             help="seconds between batch operations (0 disables)")
+    soak_parser.add_argument("--batch-size", type=int, default=10,
+                             help="devices per batch operation")
+    soak_parser.add_argument("--report-interval", type=float, default=60,
+                             help="seconds between samples")
+    soak_parser.add_argument("--device-latency", type=float, default=0.01)
+    soak_parser.add_argument("--smshub-latency", type=float, default=0.02)
+    soak_parser.add_argument("--urc", action="store_true",
+                             help="emit +CMTI URCs from simulated modems")
+    soak_parser.add_argument("--memory-db", action="store_true",
+                             help="keep data in memory instead of DATABASE_URL")
+    soak_parser.add_argument("--tracemalloc", action="store_true",
+                             help="report the allocation sites growing the most")
+    soak_parser.add_argument("--max-in-flight", type=int, default=1000,
+                             help="cap on concurrent API reads")
+    soak_parser.add_argument("--drain", type=float, default=30,
+                             help="max seconds to wait for in-flight messages")
+    soak_parser.add_argument("--port", type=int, default=0,
+                             help="port for the app (default: any free port)")
+    soak_parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                             help="override a setting, e.g. --set MESSAGE_CHECK_INTERVAL=2")
+    soak_parser.add_argument("--output", help="append JSON-lines samples and summary here")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        asyncio.run(main())
+        asyncio.run(soak(args) if args.command == "soak" else main())
     except KeyboardInterrupt:
         logger.info("Shutting down gracefully...")
     except Exception as e:
         logger.error(f"Fatal error: {str(e)}")
-        raise 
\ No newline at end of file
+        raise
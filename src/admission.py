@@ -0,0 +1,220 @@
+from abc import ABC, abstractmethod
+import hashlib
+import json
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from src.config import settings
+from src.metrics import ADMISSION_IN_FLIGHT, ADMISSION_REJECTED
+from src.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Routes that end up as modem/provider operations
+CONTROL_PREFIXES = ("/api/batch", "/api/devices", "/api/messages/send")
+# Diagnostics must keep working under load; provider webhooks are already
+# bounded by the ingest queue and are retried by the provider on 503
+EXEMPT_PREFIXES = ("/api/admin", "/api/webhooks")
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """"control", "api" or None for routes admission control leaves alone"""
+    if not path.startswith("/api/") or path.startswith(EXEMPT_PREFIXES):
+        return None
+    if method not in SAFE_METHODS and path.startswith(CONTROL_PREFIXES):
+        return "control"
+    return "api"
+
+def client_key(scope: Dict, trust_forwarded: bool = False,
+               verify: Optional[Callable[[str], bool]] = None) -> str:
+    """Who to charge a request to: API key, bearer token or client address
+
+    Credentials only identify the client once `verify` accepts them;
+    otherwise anyone could get a fresh bucket per request by sending a
+    made-up key or token, so unverified requests are charged to their address.
+    """
+    headers = dict(scope.get("headers") or ())
+    credential = headers.get(b"x-api-key", b"").decode("latin-1")
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    if not credential and authorization.lower().startswith("bearer "):
+        credential = authorization[7:].strip()
+    if credential and verify and verify(credential):
+        if credential.startswith("smsb_"):
+            # The prefix identifies the key without keeping the secret around
+            return "key:" + credential.split("_", 2)[1]
+        return "token:" + hashlib.sha256(credential.encode()).hexdigest()[:16]
+    if trust_forwarded and b"x-forwarded-for" in headers:
+        return "ip:" + headers[b"x-forwarded-for"].decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+class ClientLimiter(ABC):
+    """Per-client token buckets; `take` returns 0 when admitted, else seconds to wait"""
+
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+class MemoryClientLimiter(ClientLimiter):
+    """Buckets in this process, least recently seen clients dropped past `max_clients`"""
+
+    def __init__(self, max_clients: int = None):
+        self.max_clients = max_clients or settings.RATE_LIMIT_MAX_CLIENTS
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(rate, burst)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            if bucket.rate != rate or bucket.capacity != burst:
+                bucket.update(rate, burst)
+        if bucket.try_acquire():
+            return 0.0
+        return max(bucket.delay(), 1e-3)
+
+class RedisClientLimiter(ClientLimiter):
+    """Buckets shared by every worker, as Redis hashes updated by a Lua script
+
+    The script uses the Redis clock so workers with skewed clocks agree. If
+    Redis is unreachable requests are admitted; the concurrency limits still
+    protect the devices.
+    """
+
+    TAKE = """
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+    return tostring(wait)
+    """
+
+    def __init__(self, url: str = None, prefix: str = None, client=None):
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.from_url(url or settings.REDIS_URL, decode_responses=True)
+        self.redis = client
+        self.prefix = prefix or f"{settings.SHARD_KEY_PREFIX}ratelimit:"
+        self._take = self.redis.register_script(self.TAKE)
+        self._last_error = 0.0
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        try:
+            return float(await self._take(keys=[self.prefix + key], args=[rate, burst]))
+        except Exception as e:
+            now = time.monotonic()
+            if now - self._last_error > 60:
+                logger.error(f"Rate limiter unavailable, admitting requests: {str(e)}")
+                self._last_error = now
+            return 0.0
+
+    async def close(self):
+        await self.redis.aclose()
+
+def create_client_limiter(backend: str = None) -> Optional[ClientLimiter]:
+    """Limiter for RATE_LIMIT_BACKEND, or None to skip per-client limits"""
+    backend = backend if backend is not None else settings.RATE_LIMIT_BACKEND
+    if not backend:
+        return None
+    if backend == "memory":
+        return MemoryClientLimiter()
+    if backend == "redis":
+        return RedisClientLimiter()
+    raise ValueError(f"Unsupported rate limit backend: {backend}")
+
+class AdmissionMiddleware:
+    """Rate limiting and load shedding in front of the API
+
+    Each request is put in a class (see route_class). Per class, a client
+    may spend `rate` requests per second with bursts of `burst` (429 past
+    that). At most `concurrency` requests run at once; beyond that new ones
+    are refused straight away with 503, instead of queueing behind slow
+    modem operations and timing out anyway. Without explicit `limits`,
+    ADMISSION_LIMITS is read per request so reloaded limits apply at once.
+    `verify` tells whether a presented API key or token is genuine (see
+    client_key); without it clients are told apart by address only.
+    """
+
+    def __init__(self, app, limiter: Optional[ClientLimiter] = None,
+                 limits: Dict[str, Dict] = None, trust_forwarded: bool = None,
+                 verify: Optional[Callable[[str], bool]] = None):
+        self.app = app
+        self.limiter = limiter
+        self.verify = verify
+        self._limits = limits
+        self.trust_forwarded = (
+            trust_forwarded if trust_forwarded is not None else settings.ADMISSION_TRUST_FORWARDED
+        )
+        self.in_flight: Dict[str, int] = {}
+        for name in self.limits:
+            self._track(name)
+
+    @property
+    def limits(self) -> Dict[str, Dict]:
+        return self._limits or settings.ADMISSION_LIMITS
+
+    def _track(self, name: str):
+        self.in_flight[name] = 0
+        ADMISSION_IN_FLIGHT.labels(name).set_function(lambda: self.in_flight[name])
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        name = route_class(scope["method"], scope["path"])
+        limit = self.limits.get(name) if name else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        if name not in self.in_flight:
+            self._track(name)
+        if self.in_flight[name] >= limit["concurrency"]:
+            ADMISSION_REJECTED.labels(name, "overloaded").inc()
+            await self._reject(send, 503, "Server busy, retry shortly", 1)
+            return
+        self.in_flight[name] += 1
+        try:
+            if self.limiter:
+                wait = await self.limiter.take(
+                    f"{name}:{client_key(scope, self.trust_forwarded, self.verify)}", limit["rate"], limit["burst"]
+                )
+                if wait > 0:
+                    ADMISSION_REJECTED.labels(name, "rate_limited").inc()
+                    await self._reject(send, 429, "Rate limit exceeded", wait)
+                    return
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight[name] -= 1
+
+    @staticmethod
+    async def _reject(send, status: int, detail: str, retry_after: float):
+        body = json.dumps({"detail": detail}).encode()
+        headers: Iterable[Tuple[bytes, bytes]] = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode())
+        ]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,223 @@
+import asyncio
+import calendar
+import hashlib
+import hmac
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, select, update
+
+from .models import ApiKey
+from .principals import Principal
+from src.config import settings
+from src.metrics import API_KEY_REQUESTS
+from src.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+KEY_TAG = "smsb"
+NEGATIVE_CACHE_SIZE = 10000
+
+class ApiKeyError(Exception):
+    pass
+
+class ApiKeyRateLimited(ApiKeyError):
+    def __init__(self, retry_after: float):
+        super().__init__("API key rate limit exceeded")
+        self.retry_after = retry_after
+
+def hash_key(raw: str) -> str:
+    # Keys are 256 random bits, so a fast hash is enough; bcrypt would only add latency
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+def generate_key() -> Tuple[str, str]:
+    """A new key and its prefix: smsb_<prefix>_<secret>"""
+    prefix = secrets.token_hex(6)
+    return f"{KEY_TAG}_{prefix}_{secrets.token_urlsafe(32)}", prefix
+
+def key_prefix(raw: str) -> Optional[str]:
+    parts = raw.split("_", 2)
+    if len(parts) != 3 or parts[0] != KEY_TAG or not parts[1]:
+        return None
+    return parts[1]
+
+def is_api_key(value: str) -> bool:
+    return value.startswith(f"{KEY_TAG}_")
+
+class _CachedKey:
+    __slots__ = ('id', 'key_hash', 'expires_at', 'principal', 'bucket', 'loaded_at')
+
+    def __init__(self, record: ApiKey, bucket: TokenBucket):
+        self.id = record.id
+        self.key_hash = record.key_hash
+        self.expires_at = record.expires_at
+        scopes = frozenset(record.scopes or ())
+        self.principal = Principal(
+            user_id=record.owner_id or 0,
+            username=f"api-key:{record.name}",
+            is_admin="admin" in scopes or "*" in scopes,
+            jti=f"key:{record.prefix}",
+            issued_at=0.0,
+            expires_at=calendar.timegm(record.expires_at.utctimetuple()) if record.expires_at else None,
+            scopes=scopes,
+            api_key=record.prefix
+        )
+        self.bucket = bucket
+        self.loaded_at = time.monotonic()
+
+class ApiKeyStore:
+    """API keys for machine clients
+
+    A key is looked up by its prefix (unique index), then its SHA-256 is
+    compared in constant time. Keys found are cached for API_KEY_CACHE_TTL
+    together with their rate limiter, so steady traffic costs one hash and
+    one dict lookup per request. Usage counts are kept in memory and
+    written every API_KEY_USAGE_FLUSH_INTERVAL.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._keys: Dict[str, _CachedKey] = {}
+        self._missing: "OrderedDict[str, float]" = OrderedDict()
+        self._usage: Dict[int, Tuple[int, datetime]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if not self._task and settings.API_KEY_USAGE_FLUSH_INTERVAL > 0:
+            self._task = asyncio.create_task(self._flush_loop(), name="api-key-usage")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush_usage()
+
+    async def verify(self, raw: str) -> Principal:
+        """Principal for a presented key; raises ApiKeyError or ApiKeyRateLimited"""
+        prefix = key_prefix(raw)
+        if prefix is None:
+            raise ApiKeyError("Malformed API key")
+        cached = await self._get(prefix)
+        if cached is None or not hmac.compare_digest(cached.key_hash, hash_key(raw)):
+            raise ApiKeyError("Invalid API key")
+        if cached.expires_at and cached.expires_at <= datetime.utcnow():
+            raise ApiKeyError("API key expired")
+        if not cached.bucket.try_acquire():
+            API_KEY_REQUESTS.labels(prefix, "rate_limited").inc()
+            raise ApiKeyRateLimited(cached.bucket.delay())
+        API_KEY_REQUESTS.labels(prefix, "ok").inc()
+        count, _ = self._usage.get(cached.id, (0, None))
+        self._usage[cached.id] = (count + 1, datetime.utcnow())
+        return cached.principal
+
+    def is_known(self, raw: str) -> bool:
+        """Whether a key matches one verified recently, without a lookup or a rate-limit charge"""
+        prefix = key_prefix(raw)
+        cached = self._keys.get(prefix) if prefix else None
+        if cached is None or not hmac.compare_digest(cached.key_hash, hash_key(raw)):
+            return False
+        return not (cached.expires_at and cached.expires_at <= datetime.utcnow())
+
+    async def _get(self, prefix: str) -> Optional[_CachedKey]:
+        now = time.monotonic()
+        cached = self._keys.get(prefix)
+        if cached and now - cached.loaded_at < settings.API_KEY_CACHE_TTL:
+            return cached
+        missing_until = self._missing.get(prefix)
+        if missing_until and missing_until > now:
+            return None
+
+        async with self.db.async_session() as session:
+            result = await session.execute(
+                select(ApiKey).where(ApiKey.prefix == prefix).where(ApiKey.is_active.is_(True))
+            )
+            record = result.scalar_one_or_none()
+        if record is None:
+            self._keys.pop(prefix, None)
+            self._missing[prefix] = now + settings.API_KEY_CACHE_TTL
+            if len(self._missing) > NEGATIVE_CACHE_SIZE:
+                self._missing.popitem(last=False)
+            return None
+
+        rate = record.rate_limit or settings.API_KEY_DEFAULT_RATE
+        if cached:
+            # Keep the balance across reloads so a refresh is not a free burst
+            cached.bucket.update(rate)
+            bucket = cached.bucket
+        else:
+            bucket = TokenBucket(rate)
+        self._missing.pop(prefix, None)
+        self._keys[prefix] = _CachedKey(record, bucket)
+        return self._keys[prefix]
+
+    def forget(self, prefix: str):
+        self._keys.pop(prefix, None)
+
+    def forget_owner(self, user_id: int):
+        """Drop the cached keys of a user, e.g. one just deactivated"""
+        for prefix in [p for p, k in self._keys.items() if k.principal.user_id == user_id]:
+            del self._keys[prefix]
+
+    async def create(self, name: str, scopes: List[str] = None, rate_limit: float = None,
+                     owner_id: int = None, expires_at: datetime = None) -> Tuple[ApiKey, str]:
+        """Store a new key; the plaintext is returned once and never stored"""
+        raw, prefix = generate_key()
+        record = ApiKey(
+            prefix=prefix, key_hash=hash_key(raw), name=name, scopes=scopes or [],
+            rate_limit=rate_limit, owner_id=owner_id, expires_at=expires_at
+        )
+        async with self.db.unit_of_work() as session:
+            session.add(record)
+            await session.flush()
+        return record, raw
+
+    async def list(self) -> List[ApiKey]:
+        await self.flush_usage()
+        async with self.db.async_session() as session:
+            result = await session.execute(select(ApiKey).order_by(ApiKey.created_at))
+            return result.scalars().all()
+
+    async def revoke(self, prefix: str) -> bool:
+        async with self.db.unit_of_work() as session:
+            result = await session.execute(
+                update(ApiKey).where(ApiKey.prefix == prefix).values(is_active=False)
+            )
+        self.forget(prefix)
+        return result.rowcount > 0
+
+    async def flush_usage(self):
+        """Add the in-memory usage counts to api_keys in one statement"""
+        if not self._usage:
+            return
+        usage, self._usage = self._usage, {}
+        table = ApiKey.__table__
+        try:
+            async with self.db.unit_of_work() as session:
+                await session.execute(
+                    update(table)
+                    .where(table.c.id == bindparam("key_id"))
+                    .values(
+                        usage_count=table.c.usage_count + bindparam("count"),
+                        last_used_at=bindparam("used_at")
+                    ),
+                    [
+                        {"key_id": key_id, "count": count, "used_at": used_at}
+                        for key_id, (count, used_at) in usage.items()
+                    ]
+                )
+        except Exception as e:
+            logger.error(f"API key usage flush error: {str(e)}")
+            # Put the counts back for the next attempt
+            for key_id, (count, used_at) in usage.items():
+                pending, last = self._usage.get(key_id, (0, used_at))
+                self._usage[key_id] = (pending + count, max(last, used_at))
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(settings.API_KEY_USAGE_FLUSH_INTERVAL)
+            await self.flush_usage()
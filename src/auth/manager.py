@@ -1,23 +1,67 @@
-from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
-from fastapi import Depends, HTTPException, status
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
 
-from .models import User
+from .api_keys import ApiKeyError, ApiKeyRateLimited, ApiKeyStore, is_api_key
+from .models import ApiKey, User
+from .principals import Principal, PrincipalCache, Revocations
+from .revocation import RevocationBus, create_revocation_bus
 from src.database.manager import DatabaseManager
 from src.config import settings
 
+logger = logging.getLogger(__name__)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+optional_bearer = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
 class AuthManager:
-    def __init__(self, db: DatabaseManager):
+    """Issues and verifies access tokens
+
+    Tokens carry everything authorization needs (user id, username, admin
+    flag), so verifying one is a signature check, or a cache lookup for a
+    token seen recently, and never a database query. Deactivating a user
+    disables their API keys and revokes their outstanding tokens on every
+    worker through the revocation bus. Machine clients authenticate with API keys instead
+    (see ApiKeyStore), which never involve bcrypt.
+    """
+
+    def __init__(self, db: DatabaseManager, bus: RevocationBus = None):
         self.db = db
         self.secret_key = settings.SECRET_KEY
         self.algorithm = settings.ALGORITHM
         self.access_token_expire_minutes = settings.ACCESS_TOKEN_EXPIRE_MINUTES
+        self.cache = PrincipalCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL)
+        self.revocations = Revocations(self.access_token_expire_minutes * 60)
+        self.bus = bus if bus is not None else create_revocation_bus()
+        self.api_keys = ApiKeyStore(db)
+        self._background: Set[asyncio.Task] = set()
+
+    async def start(self):
+        """Subscribe to revocations and refuse tokens of users already inactive"""
+        if self.bus:
+            await self.bus.subscribe(self._apply)
+        await self.api_keys.start()
+        try:
+            async with self.db.async_session() as session:
+                result = await session.execute(select(User.id).where(User.is_active.is_(False)))
+                now = time.time()
+                for user_id in result.scalars():
+                    self.revocations.revoke_user(user_id, now)
+        except Exception as e:
+            logger.error(f"Could not load inactive users: {str(e)}")
+
+    async def stop(self):
+        if self.bus:
+            await self.bus.close()
+        await self.api_keys.stop()
+        await asyncio.gather(*self._background, return_exceptions=True)
 
     async def authenticate_user(self, username: str, password: str) -> Optional[User]:
         async with self.db.async_session() as session:
@@ -25,49 +69,156 @@ class AuthManager:
                 select(User).where(User.username == username)
             )
             user = result.scalar_one_or_none()
-            
-            if not user or not User.verify_password(password, user.hashed_password):
-                return None
-                
-            # Update last login
-            user.last_login = datetime.utcnow()
-            await session.commit()
-            return user
-
-    def create_access_token(self, data: dict) -> str:
-        to_encode = data.copy()
-        expire = datetime.utcnow() + timedelta(minutes=self.access_token_expire_minutes)
-        to_encode.update({"exp": expire})
-        return jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm)
-
-    async def get_current_user(self, token: str = Depends(oauth2_scheme)) -> User:
-        credentials_exception = HTTPException(
+
+        if not user or not user.is_active:
+            return None
+        # bcrypt is deliberately slow; keep it off the event loop
+        verified = await asyncio.get_running_loop().run_in_executor(
+            None, User.verify_password, password, user.hashed_password
+        )
+        if not verified:
+            return None
+
+        # Last login is bookkeeping; don't make the caller wait for the commit
+        task = asyncio.create_task(self._record_login(user.id))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return user
+
+    async def _record_login(self, user_id: int):
+        try:
+            async with self.db.unit_of_work() as session:
+                await session.execute(
+                    update(User).where(User.id == user_id).values(last_login=datetime.utcnow())
+                )
+        except Exception as e:
+            logger.error(f"Last login update error: {str(e)}")
+
+    def create_access_token(self, user: User) -> str:
+        import jwt
+        now = time.time()
+        claims = {
+            "sub": user.username,
+            "uid": user.id,
+            "adm": bool(user.is_admin),
+            "jti": uuid.uuid4().hex,
+            "iat": now,
+            "exp": now + self.access_token_expire_minutes * 60
+        }
+        return jwt.encode(claims, self.secret_key, algorithm=self.algorithm)
+
+    def verify_token(self, token: str) -> Principal:
+        """Principal for a bearer token; cheap enough to call per request or WebSocket message"""
+        principal = self.cache.get(token)
+        if principal is None:
+            import jwt  # deferred with its crypto backends until the first token
+            try:
+                claims = jwt.decode(
+                    token, self.secret_key, algorithms=[self.algorithm],
+                    options={"require": ["exp", "iat", "jti", "sub", "uid"]}
+                )
+                principal = Principal.from_claims(claims)
+            except (jwt.PyJWTError, KeyError, ValueError):
+                raise self._credentials_error()
+            self.cache.put(token, principal)
+        if self.revocations.is_revoked(principal):
+            raise self._credentials_error()
+        return principal
+
+    @staticmethod
+    def _credentials_error() -> HTTPException:
+        return HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-        
+
+    async def get_current_user(self, token: str = Depends(oauth2_scheme)) -> Principal:
+        return self.verify_token(token)
+
+    async def get_current_admin(self, token: str = Depends(oauth2_scheme)) -> Principal:
+        principal = self.verify_token(token)
+        if not principal.is_admin:
+            raise HTTPException(status_code=403, detail="Admin required")
+        return principal
+
+    async def verify_api_key(self, key: str) -> Principal:
         try:
-            payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
-            username: str = payload.get("sub")
-            if username is None:
-                raise credentials_exception
-        except JWTError:
-            raise credentials_exception
-            
-        async with self.db.async_session() as session:
-            result = await session.execute(
-                select(User).where(User.username == username)
+            return await self.api_keys.verify(key)
+        except ApiKeyRateLimited as e:
+            raise HTTPException(
+                status_code=429, detail=str(e),
+                headers={"Retry-After": str(max(1, round(e.retry_after)))}
             )
-            user = result.scalar_one_or_none()
-            
-            if user is None:
-                raise credentials_exception
-            return user
-
-    async def get_current_active_user(
-        self, current_user: User = Depends(get_current_user)
-    ) -> User:
-        if not current_user.is_active:
-            raise HTTPException(status_code=400, detail="Inactive user")
-        return current_user 
\ No newline at end of file
+        except ApiKeyError as e:
+            raise HTTPException(status_code=401, detail=str(e))
+
+    def is_valid_credential(self, credential: str) -> bool:
+        """Cheap check for admission control: a genuine token or an API key already verified"""
+        if is_api_key(credential):
+            return self.api_keys.is_known(credential)
+        try:
+            self.verify_token(credential)
+        except HTTPException:
+            return False
+        return True
+
+    async def get_principal(self, token: Optional[str] = Depends(optional_bearer),
+                            x_api_key: Optional[str] = Header(None)) -> Principal:
+        """A user token or an API key, from `Authorization: Bearer` or `X-API-Key`"""
+        if x_api_key:
+            return await self.verify_api_key(x_api_key)
+        if not token:
+            raise self._credentials_error()
+        if is_api_key(token):
+            return await self.verify_api_key(token)
+        return self.verify_token(token)
+
+    def require_scope(self, scope: str):
+        """Dependency for routes open to users and to API keys holding `scope`"""
+        async def dependency(principal: Principal = Depends(self.get_principal)) -> Principal:
+            if not principal.allows(scope):
+                raise HTTPException(status_code=403, detail=f"Scope {scope} required")
+            return principal
+        return dependency
+
+    # Revocation
+    def _apply(self, event: Dict):
+        """Apply a revocation from this worker or from the bus"""
+        if event.get("user_id") is not None:
+            self.revocations.revoke_user(event["user_id"], event["at"])
+            self.cache.drop(user_id=event["user_id"])
+            self.api_keys.forget_owner(event["user_id"])
+        if event.get("jti"):
+            self.revocations.revoke_token(event["jti"], event["expires_at"])
+            self.cache.drop(jti=event["jti"])
+        if event.get("api_key"):
+            self.api_keys.forget(event["api_key"])
+        self.revocations.prune()
+
+    async def _revoke(self, event: Dict):
+        self._apply(event)
+        if self.bus:
+            try:
+                await self.bus.publish(event)
+            except Exception as e:
+                logger.error(f"Revocation publish error: {str(e)}")
+
+    async def revoke_token(self, principal: Principal):
+        """Log out one token everywhere"""
+        await self._revoke({"jti": principal.jti, "expires_at": principal.expires_at})
+
+    async def revoke_api_key(self, prefix: str) -> bool:
+        """Disable an API key on every worker"""
+        revoked = await self.api_keys.revoke(prefix)
+        await self._revoke({"api_key": prefix})
+        return revoked
+
+    async def deactivate_user(self, user_id: int):
+        """Disable a user and their API keys, and refuse every token issued to them so far"""
+        async with self.db.unit_of_work() as session:
+            await session.execute(update(User).where(User.id == user_id).values(is_active=False))
+            await session.execute(
+                update(ApiKey).where(ApiKey.owner_id == user_id).values(is_active=False)
+            )
+        await self._revoke({"user_id": user_id, "at": time.time()})
@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import Column, Integer, BigInteger, Float, String, DateTime, Boolean, ForeignKey, JSON
 from datetime import datetime
-from passlib.context import CryptContext
+from functools import lru_cache
 
-Base = declarative_base()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from src.database.models import Base
+
+@lru_cache(maxsize=None)
+def pwd_context():
+    # passlib and bcrypt are only needed once somebody logs in
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 class User(Base):
     __tablename__ = "users"
@@ -20,8 +24,25 @@ class User(Base):
 
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
-        return pwd_context.verify(plain_password, hashed_password)
+        return pwd_context().verify(plain_password, hashed_password)
 
     @staticmethod
     def get_password_hash(password: str) -> str:
-        return pwd_context.hash(password) 
\ No newline at end of file
+        return pwd_context().hash(password) 
+
+class ApiKey(Base):
+    """Long-lived key for machine clients; only a SHA-256 of the key is stored"""
+    __tablename__ = "api_keys"
+
+    id = Column(Integer, primary_key=True)
+    prefix = Column(String, unique=True, nullable=False)  # public lookup part of the key
+    key_hash = Column(String, nullable=False)  # hex SHA-256 of the whole key
+    name = Column(String, nullable=False)
+    scopes = Column(JSON, default=[])  # only "admin" (or "*" for all) is checked
+    rate_limit = Column(Float)  # requests per second, None for API_KEY_DEFAULT_RATE
+    owner_id = Column(Integer, ForeignKey("users.id"))
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime)
+    last_used_at = Column(DateTime)
+    usage_count = Column(BigInteger, default=0)
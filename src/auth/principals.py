@@ -0,0 +1,112 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional, Tuple
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated caller, built from verified token claims alone"""
+    user_id: int
+    username: str
+    is_admin: bool
+    jti: str
+    issued_at: float
+    expires_at: Optional[float]  # None for API keys without an expiry
+    scopes: Optional[FrozenSet[str]] = None  # None for users: everything their role allows
+    api_key: Optional[str] = None  # key prefix when authenticated with an API key
+
+    def allows(self, scope: str) -> bool:
+        if self.scopes is None:
+            return scope != "admin" or self.is_admin
+        return scope in self.scopes or "*" in self.scopes
+
+    @classmethod
+    def from_claims(cls, claims: Dict) -> "Principal":
+        return cls(
+            user_id=int(claims["uid"]),
+            username=claims["sub"],
+            is_admin=bool(claims.get("adm", False)),
+            jti=claims["jti"],
+            issued_at=float(claims["iat"]),
+            expires_at=float(claims["exp"])
+        )
+
+class PrincipalCache:
+    """TTL-bounded LRU of verified tokens
+
+    Entries are keyed by the exact token string that was verified, so a hit
+    proves the signature was checked before; a forged token with a known jti
+    is a miss. Entries live until the token expires or `ttl` passes,
+    whichever comes first.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[Principal, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str, now: float = None) -> Optional[Principal]:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        principal, expires = entry
+        if expires <= (now or time.time()):
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return principal
+
+    def put(self, token: str, principal: Principal, now: float = None):
+        if self.maxsize <= 0:
+            return
+        expires = min(principal.expires_at, (now or time.time()) + self.ttl)
+        self._entries[token] = (principal, expires)
+        self._entries.move_to_end(token)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def drop(self, user_id: int = None, jti: str = None) -> int:
+        """Forget cached tokens of a user or with a jti"""
+        stale = [
+            token for token, (principal, _) in self._entries.items()
+            if principal.user_id == user_id or principal.jti == jti
+        ]
+        for token in stale:
+            del self._entries[token]
+        return len(stale)
+
+class Revocations:
+    """Users and tokens that must be refused even though their signature is valid
+
+    A revoked user's tokens issued up to the revocation time are refused;
+    tokens issued afterwards (e.g. after reactivation) are not. Entries are
+    only needed until every token they cover has expired.
+    """
+
+    def __init__(self, token_lifetime: float):
+        self.token_lifetime = token_lifetime
+        self.users: Dict[int, float] = {}
+        self.tokens: Dict[str, float] = {}  # jti -> token expiry
+
+    def revoke_user(self, user_id: int, at: float):
+        self.users[user_id] = max(at, self.users.get(user_id, 0.0))
+
+    def revoke_token(self, jti: str, expires_at: float):
+        self.tokens[jti] = expires_at
+
+    def is_revoked(self, principal: Principal) -> bool:
+        revoked_at = self.users.get(principal.user_id)
+        if revoked_at is not None and principal.issued_at <= revoked_at:
+            return True
+        return principal.jti in self.tokens
+
+    def prune(self, now: float = None):
+        now = now or time.time()
+        self.tokens = {jti: exp for jti, exp in self.tokens.items() if exp > now}
+        self.users = {
+            user_id: at for user_id, at in self.users.items()
+            if at + self.token_lifetime > now
+        }
@@ -0,0 +1,77 @@
+from abc import ABC, abstractmethod
+import asyncio
+import json
+import logging
+from typing import Callable, Dict, Optional
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+class RevocationBus(ABC):
+    """Carries user and token revocations to every worker
+
+    Without a bus revocations only reach the worker that made them, which
+    is enough for single-process deployments.
+    """
+
+    @abstractmethod
+    async def publish(self, event: Dict):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def subscribe(self, callback: Callable[[Dict], None]):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+class RedisRevocationBus(RevocationBus):
+    """Revocations over a Redis pub/sub channel"""
+
+    def __init__(self, url: str = None, channel: str = None, client=None):
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.from_url(url or settings.REDIS_URL, decode_responses=True)
+        self.redis = client
+        self.channel = channel or settings.AUTH_REVOCATION_CHANNEL
+        self._task: Optional[asyncio.Task] = None
+
+    async def publish(self, event: Dict):
+        await self.redis.publish(self.channel, json.dumps(event))
+
+    async def subscribe(self, callback: Callable[[Dict], None]):
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(self.channel)
+        self._task = asyncio.create_task(self._listen(pubsub, callback), name="auth-revocations")
+
+    async def _listen(self, pubsub, callback: Callable[[Dict], None]):
+        try:
+            while True:
+                try:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=30)
+                    if message:
+                        callback(json.loads(message["data"]))
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Revocation listener error: {str(e)}")
+                    await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.redis.aclose()
+
+def create_revocation_bus(backend: str = None) -> Optional[RevocationBus]:
+    """Bus for AUTH_REVOCATION_BACKEND, or None to keep revocations in-process"""
+    backend = backend if backend is not None else settings.AUTH_REVOCATION_BACKEND
+    if not backend:
+        return None
+    if backend == "redis":
+        return RedisRevocationBus()
+    raise ValueError(f"Unsupported revocation backend: {backend}")
@@ -0,0 +1,264 @@
+import asyncio
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from pydantic import ValidationError
+
+from src.config import Settings, settings
+from src.models import DeviceOverrides
+
+logger = logging.getLogger(__name__)
+
+# Settings read on every use (or pushed to their consumers on change), so
+# they can be tuned without a restart. Everything else is captured at
+# startup: connection pools, worker layout, backends.
+RELOADABLE = frozenset({
+    "LOG_LEVEL",
+    "DEVICE_SCAN_INTERVAL", "MESSAGE_CHECK_INTERVAL", "MESSAGE_CHECK_INTERVAL_FAST",
+    "POLL_BACKOFF_FACTOR", "POLL_HOT_WINDOW", "SIGNAL_CHECK_INTERVAL",
+    "SUPERVISOR_MAX_FAILURES", "SUPERVISOR_MAX_BACKOFF", "MAX_RETRY_ATTEMPTS",
+    "OUTBOUND_RATE_PER_DEVICE", "OUTBOUND_BURST_PER_DEVICE", "OUTBOUND_MAX_PENDING",
+    "SMS_SEND_TIMEOUT",
+    "INGEST_RETRY_MAX_ATTEMPTS", "INGEST_RETRY_MAX_BACKOFF",
+    "API_KEY_CACHE_TTL", "API_KEY_DEFAULT_RATE",
+    "ADMISSION_LIMITS",
+    "DEFAULT_DEVICE_CONFIGS", "DEVICE_OVERRIDES",
+})
+POSITIVE = frozenset({
+    "DEVICE_SCAN_INTERVAL", "MESSAGE_CHECK_INTERVAL", "MESSAGE_CHECK_INTERVAL_FAST",
+    "SIGNAL_CHECK_INTERVAL", "SUPERVISOR_MAX_FAILURES", "OUTBOUND_RATE_PER_DEVICE",
+    "OUTBOUND_BURST_PER_DEVICE", "SMS_SEND_TIMEOUT", "API_KEY_DEFAULT_RATE",
+})
+_MISSING = object()
+
+class ConfigError(ValueError):
+    pass
+
+@dataclass
+class ConfigChange:
+    """What a reload changed"""
+    settings: Dict[str, Any]  # setting name -> new value
+    devices: Set[str] = field(default_factory=set)  # devices whose effective config changed
+
+def validate(values: Dict[str, Any]) -> Dict[str, Any]:
+    """Coerce and check reloadable settings; raises ConfigError"""
+    not_reloadable = sorted(set(values) - RELOADABLE)
+    if not_reloadable:
+        raise ConfigError(f"Not reloadable: {', '.join(not_reloadable)}")
+    try:
+        candidate = Settings(**values)
+    except ValidationError as e:
+        raise ConfigError(str(e))
+    validated = {name: getattr(candidate, name) for name in values}
+
+    for name in POSITIVE & set(validated):
+        if validated[name] <= 0:
+            raise ConfigError(f"{name} must be positive")
+    if validated.get("LOG_LEVEL") and not isinstance(
+        logging.getLevelName(validated["LOG_LEVEL"].upper()), int
+    ):
+        raise ConfigError(f"Unknown log level: {validated['LOG_LEVEL']}")
+    for route_class, limit in validated.get("ADMISSION_LIMITS", {}).items():
+        if set(limit) != {"rate", "burst", "concurrency"} or min(limit.values()) <= 0:
+            raise ConfigError(f"ADMISSION_LIMITS.{route_class} needs positive rate, burst and concurrency")
+    if validated.get("POLL_BACKOFF_FACTOR", 1) < 1:
+        raise ConfigError("POLL_BACKOFF_FACTOR must be at least 1")
+    # Type defaults and per-device overrides end up in the same layered
+    # config, so both go through the same model
+    for name in ("DEFAULT_DEVICE_CONFIGS", "DEVICE_OVERRIDES"):
+        if name not in validated:
+            continue
+        configs = {}
+        for key, values in validated[name].items():
+            try:
+                configs[key] = DeviceOverrides(**values).dict(exclude_unset=True)
+            except ValidationError as e:
+                raise ConfigError(f"{name}.{key}: {str(e)}")
+        validated[name] = configs
+    return validated
+
+class ConfigService:
+    """Applies configuration changes to the running bridge
+
+    Reloadable settings are merged from the environment, the config file
+    and the system_settings table (later sources win) and polled every
+    CONFIG_RELOAD_INTERVAL. A change set is validated as a whole and then
+    assigned onto the shared `settings`, so code reading settings per use
+    sees it right away; listeners get a ConfigChange for state derived
+    from settings (rate limiters, sleeping poll loops).
+
+    Each registered device's config is layered as DEFAULT_DEVICE_CONFIGS
+    for its type, then its own config, then DEVICE_OVERRIDES for its id.
+    Keys that managers set at runtime survive re-layering.
+    """
+
+    def __init__(self, db, devices, path: str = None):
+        self.db = db
+        self.devices = devices
+        self.path = path or settings.CONFIG_FILE
+        self._baseline = {name: getattr(Settings(), name) for name in RELOADABLE}
+        self._file_values: Dict[str, Any] = {}
+        self._file_mtime: Optional[float] = None
+        self._restart_required: Set[str] = set()
+        self._merged: Optional[Dict[str, Any]] = None
+        self._base: Dict[str, Dict[str, Any]] = {}
+        self._effective: Dict[str, Dict[str, Any]] = {}
+        self._listeners: List[Callable[[ConfigChange], Awaitable]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def add_listener(self, callback: Callable[[ConfigChange], Awaitable]):
+        self._listeners.append(callback)
+
+    async def start(self):
+        await self.reload()
+        if not self._task and settings.CONFIG_RELOAD_INTERVAL > 0:
+            self._task = asyncio.create_task(self._watch(), name="config-reload")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def current(self) -> Dict[str, Any]:
+        """Reloadable settings as in effect now"""
+        return {name: getattr(settings, name) for name in sorted(RELOADABLE)}
+
+    # Sources
+    def _read_file(self) -> Dict[str, Any]:
+        """Config file contents, re-read only when its mtime changes"""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            self._file_mtime, self._file_values = None, {}
+            return {}
+        if mtime != self._file_mtime:
+            with open(self.path, 'r') as f:
+                values = json.load(f)
+            if not isinstance(values, dict):
+                raise ConfigError(f"{self.path} must hold a JSON object")
+            self._file_mtime, self._file_values = mtime, values
+        return self._file_values
+
+    async def _read_db(self) -> Dict[str, Any]:
+        try:
+            return await self.db.get_settings()
+        except Exception as e:
+            logger.error(f"Config read from database failed: {str(e)}")
+            return {}
+
+    async def reload(self) -> Optional[ConfigChange]:
+        """Re-read every source and apply what changed"""
+        try:
+            file_values = self._read_file()
+        except Exception as e:
+            logger.error(f"Config file {self.path} rejected: {str(e)}")
+            return None
+        db_values = await self._read_db()
+
+        merged = {**file_values, **db_values}
+        # Overrides are merged per device so the file and the API can each set some
+        merged["DEVICE_OVERRIDES"] = {
+            **file_values.get("DEVICE_OVERRIDES", {}), **db_values.get("DEVICE_OVERRIDES", {})
+        }
+        if merged == self._merged:
+            return None
+        self._merged = merged
+        restart = {
+            name for name, value in merged.items()
+            if name not in RELOADABLE and name in Settings.__fields__ and value != getattr(settings, name)
+        }
+        if restart != self._restart_required:
+            self._restart_required = restart
+            if restart:
+                logger.warning(f"Config changes need a restart: {', '.join(sorted(restart))}")
+
+        desired = {**self._baseline, **{k: v for k, v in merged.items() if k in RELOADABLE}}
+        try:
+            return await self.apply(validate(desired))
+        except ConfigError as e:
+            logger.error(f"Config change rejected: {str(e)}")
+            return None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(settings.CONFIG_RELOAD_INTERVAL)
+            await self.reload()
+
+    # Changes
+    async def apply(self, validated: Dict[str, Any]) -> Optional[ConfigChange]:
+        """Assign validated settings and notify listeners of the ones that differ"""
+        async with self._lock:
+            changed = {
+                name: value for name, value in validated.items()
+                if getattr(settings, name) != value
+            }
+            if not changed:
+                return None
+            for name, value in changed.items():
+                setattr(settings, name, value)
+            if "LOG_LEVEL" in changed:
+                logging.getLogger().setLevel(changed["LOG_LEVEL"].upper())
+
+            change = ConfigChange(changed)
+            if "DEVICE_OVERRIDES" in changed or "DEFAULT_DEVICE_CONFIGS" in changed:
+                for entry in self.devices.values():
+                    if self.layer(entry):
+                        change.devices.add(entry.id)
+            logger.info(f"Config reloaded: {', '.join(sorted(changed))}")
+            for callback in self._listeners:
+                try:
+                    await callback(change)
+                except Exception as e:
+                    logger.error(f"Config listener error: {str(e)}")
+            return change
+
+    async def update(self, values: Dict[str, Any]) -> Optional[ConfigChange]:
+        """Persist settings for every worker and apply them here"""
+        validate(values)
+        await self.db.update_settings(values)
+        return await self.reload()
+
+    async def set_device_overrides(self, device_id: str,
+                                   overrides: Dict[str, Any]) -> Optional[ConfigChange]:
+        """Replace one device's overrides; an empty dict removes them"""
+        validate({"DEVICE_OVERRIDES": {device_id: overrides}})
+        stored = dict((await self.db.get_settings()).get("DEVICE_OVERRIDES") or {})
+        if overrides:
+            stored[device_id] = overrides
+        else:
+            stored.pop(device_id, None)
+        await self.db.update_settings({"DEVICE_OVERRIDES": stored})
+        return await self.reload()
+
+    # Device layering
+    def layer(self, entry) -> bool:
+        """Rebuild a device's effective config; True if it changed"""
+        previous = self._effective.get(entry.id)
+        if previous is None:
+            base = dict(entry.config or {})
+        else:
+            base = self._base[entry.id]
+            base.update({
+                key: value for key, value in entry.config.items()
+                if previous.get(key, _MISSING) != value
+            })
+        effective = {
+            **settings.DEFAULT_DEVICE_CONFIGS.get(entry.type, {}),
+            **base,
+            **settings.DEVICE_OVERRIDES.get(entry.id, {})
+        }
+        self._base[entry.id] = base
+        self._effective[entry.id] = dict(effective)
+        if effective == entry.config:
+            return False
+        entry.config = effective
+        return True
+
+    def forget(self, device_id: str):
+        self._base.pop(device_id, None)
+        self._effective.pop(device_id, None)
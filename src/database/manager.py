@@ -1,83 +1,389 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import select, update, delete
-from typing import List, Optional, Dict
+from sqlalchemy.engine import make_url
+from sqlalchemy import event, func, literal_column, select, update, delete, text as sa_text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Dict, Tuple
 import logging
+import time
 from datetime import datetime, timedelta
 
-from .models import Base, Device, Message, DeviceStats, SystemSettings, SystemLog
+from .search import Page, keyset, paginate, text_match
+from .models import Base, Device, Message, MessageCounter, MessageId, DeviceStats, SystemSettings, SystemLog
+from src.config import settings
 
 logger = logging.getLogger(__name__)
 
+def hour_bucket(at: datetime) -> datetime:
+    return at.replace(minute=0, second=0, microsecond=0)
+
 class DatabaseManager:
+    """Data access for the bridge
+
+    Every method takes an optional `session`; pass the one from
+    `unit_of_work()` to run several operations in a single transaction.
+    Without it each call runs in its own short transaction.
+    """
+
     def __init__(self, connection_string: str):
-        self.engine = create_async_engine(connection_string, echo=True)
+        self.engine = create_async_engine(
+            self._with_statement_cache(connection_string),
+            echo=settings.DB_ECHO,
+            **self._engine_options(connection_string)
+        )
         self.async_session = sessionmaker(
             self.engine, class_=AsyncSession, expire_on_commit=False
         )
+        if settings.DB_SLOW_QUERY_THRESHOLD > 0:
+            self._log_slow_queries(settings.DB_SLOW_QUERY_THRESHOLD)
+
+    @staticmethod
+    def _with_statement_cache(connection_string: str):
+        """Size the asyncpg prepared statement cache (0 behind pgbouncer)"""
+        url = make_url(connection_string)
+        if url.get_driver_name() != "asyncpg":
+            return url
+        return url.update_query_dict({
+            "prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)
+        })
+
+    @staticmethod
+    def _engine_options(connection_string: str) -> Dict:
+        url = make_url(connection_string)
+        if url.get_backend_name() == "sqlite":
+            return {}
+        options = {
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "pool_pre_ping": settings.DB_POOL_PRE_PING
+        }
+        if url.get_driver_name() == "asyncpg":
+            options["connect_args"] = {
+                "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+                "command_timeout": settings.DB_COMMAND_TIMEOUT,
+                "server_settings": {"application_name": settings.APP_NAME}
+            }
+        return options
+
+    def _log_slow_queries(self, threshold: float):
+        """Log statements slower than `threshold` seconds instead of echoing all of them"""
+        engine = self.engine.sync_engine
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info["query_started"].pop()
+            if elapsed >= threshold:
+                logger.warning(
+                    f"Slow query ({elapsed * 1000:.0f}ms"
+                    f"{', executemany' if executemany else ''}): {' '.join(statement.split())[:500]}"
+                )
+
+        @event.listens_for(engine, "handle_error")
+        def failed(context):
+            # A failed statement never reaches after_cursor_execute
+            started = context.connection.info.get("query_started") if context.connection else None
+            if started:
+                started.pop()
 
     async def initialize(self):
         """Initialize database"""
         async with self.engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # Trigram indexes on message and log text
+                await conn.execute(sa_text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
             await conn.run_sync(Base.metadata.create_all)
 
     async def cleanup(self):
         """Cleanup database connections"""
         await self.engine.dispose()
 
-    # Device Operations
-    async def add_device(self, device: Device) -> Device:
+    @asynccontextmanager
+    async def unit_of_work(self) -> AsyncIterator[AsyncSession]:
+        """One transaction for several operations; commits on exit, rolls back on error"""
         async with self.async_session() as session:
+            async with session.begin():
+                yield session
+
+    @asynccontextmanager
+    async def _session(self, session: Optional[AsyncSession]) -> AsyncIterator[AsyncSession]:
+        if session is not None:
+            # The caller's unit of work commits
+            yield session
+            return
+        async with self.unit_of_work() as session:
+            yield session
+
+    # Device Operations
+    async def add_device(self, device: Device, session: Optional[AsyncSession] = None) -> Device:
+        async with self._session(session) as session:
             session.add(device)
-            await session.commit()
+            await session.flush()
             return device
 
-    async def get_device(self, device_id: str) -> Optional[Device]:
-        async with self.async_session() as session:
+    async def get_device(self, device_id: str,
+                         session: Optional[AsyncSession] = None) -> Optional[Device]:
+        async with self._session(session) as session:
             result = await session.execute(
                 select(Device).where(Device.id == device_id)
             )
             return result.scalar_one_or_none()
 
-    async def get_devices(self) -> List[Device]:
-        async with self.async_session() as session:
+    async def get_devices(self, session: Optional[AsyncSession] = None) -> List[Device]:
+        async with self._session(session) as session:
             result = await session.execute(select(Device))
             return result.scalars().all()
 
-    async def update_device_status(self, device_id: str, status: str):
-        async with self.async_session() as session:
+    async def update_device_status(self, device_id: str, status: str,
+                                   session: Optional[AsyncSession] = None):
+        async with self._session(session) as session:
             await session.execute(
                 update(Device)
                 .where(Device.id == device_id)
                 .values(status=status, last_seen=datetime.utcnow())
             )
-            await session.commit()
 
     # Message Operations
-    async def add_message(self, message: Message) -> Message:
-        async with self.async_session() as session:
+    async def add_message(self, message: Message,
+                          session: Optional[AsyncSession] = None) -> Message:
+        async with self._session(session) as session:
             session.add(message)
-            await session.commit()
+            await session.flush()
             return message
 
-    async def update_message_status(self, message_id: int, status: str):
-        async with self.async_session() as session:
+    async def add_messages(self, messages: List[Message],
+                           session: Optional[AsyncSession] = None) -> List[Message]:
+        """Store messages, skipping those whose provider id is already stored
+
+        Returns the messages actually added, in order.
+        """
+        async with self._session(session) as session:
+            external_ids = list(dict.fromkeys(m.external_id for m in messages if m.external_id))
+            if external_ids:
+                now = datetime.utcnow()
+                claimed = set((await session.execute(
+                    pg_insert(MessageId)
+                    .values([{"external_id": i, "seen_at": now} for i in external_ids])
+                    .on_conflict_do_nothing()
+                    .returning(MessageId.external_id)
+                )).scalars())
+                fresh = []
+                for message in messages:
+                    if message.external_id:
+                        if message.external_id not in claimed:
+                            continue
+                        claimed.discard(message.external_id)
+                    fresh.append(message)
+                messages = fresh
+            # Flush so ids are set even inside a caller's unit of work
+            session.add_all(messages)
+            await session.flush()
+            return messages
+
+    async def prune_message_ids(self, before: datetime,
+                                session: Optional[AsyncSession] = None) -> int:
+        """Forget provider ids seen before `before`; redeliveries stop long before"""
+        async with self._session(session) as session:
+            result = await session.execute(delete(MessageId).where(MessageId.seen_at < before))
+            return result.rowcount
+
+    async def update_message_statuses(self, message_ids: List[int], status: str,
+                                      session: Optional[AsyncSession] = None):
+        async with self._session(session) as session:
+            await session.execute(
+                update(Message)
+                .where(Message.id.in_(message_ids))
+                .values(status=status, forwarded_at=datetime.utcnow())
+            )
+
+    async def update_message_status(self, message_id: int, status: str,
+                                    session: Optional[AsyncSession] = None):
+        async with self._session(session) as session:
             await session.execute(
                 update(Message)
                 .where(Message.id == message_id)
                 .values(status=status, forwarded_at=datetime.utcnow())
             )
-            await session.commit()
 
-    # Stats Operations
-    async def add_device_stats(self, stats: DeviceStats) -> DeviceStats:
+    async def schedule_retries(self, message_ids: List[int], error: str = None,
+                               session: Optional[AsyncSession] = None):
+        """Mark failed forwards and back off exponentially (capped) before the next try"""
+        now = datetime.utcnow()
+        async with self._session(session) as session:
+            result = await session.execute(
+                select(Message.id, Message.delivery_attempts).where(Message.id.in_(message_ids))
+            )
+            by_attempts: Dict[int, List[int]] = {}
+            for message_id, attempts in result:
+                by_attempts.setdefault((attempts or 0) + 1, []).append(message_id)
+            for attempts, ids in by_attempts.items():
+                await session.execute(
+                    update(Message)
+                    .where(Message.id.in_(ids))
+                    .values(
+                        status="failed",
+                        delivery_attempts=attempts,
+                        last_attempt=now,
+                        error_message=error,
+                        retry_after=now + timedelta(
+                            seconds=min(settings.INGEST_RETRY_MAX_BACKOFF, 2 ** attempts)
+                        )
+                    )
+                )
+
+    async def claim_due_retries(self, limit: int = 100, lease: int = 60,
+                                session: Optional[AsyncSession] = None) -> List[Message]:
+        """Take failed messages whose backoff expired, hiding them from other workers for `lease` seconds"""
+        now = datetime.utcnow()
+        async with self._session(session) as session:
+            due = (
+                select(Message.id)
+                # Literal, not a bind parameter, so the planner can use the partial index
+                .where(Message.status != literal_column("'delivered'"))
+                .where(Message.retry_after <= now)
+                .where(Message.delivery_attempts < settings.INGEST_RETRY_MAX_ATTEMPTS)
+                .order_by(Message.retry_after)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+            result = await session.execute(
+                update(Message)
+                .where(Message.id.in_(due.scalar_subquery()))
+                .values(retry_after=now + timedelta(seconds=lease))
+                .returning(Message)
+                .execution_options(synchronize_session=False)
+            )
+            return result.scalars().all()
+
+    # Counter Operations
+    async def add_message_counts(self, counts: Dict[Tuple[str, datetime], Dict],
+                                 session: Optional[AsyncSession] = None):
+        """Add to the hourly counters keyed by (device_id, hour)"""
+        if not counts:
+            return
+        # Sorted so concurrent workers lock counter rows in the same order
+        rows = [
+            {"device_id": device_id, "hour": hour, **values}
+            for (device_id, hour), values in sorted(counts.items())
+        ]
+        insert = pg_insert(MessageCounter).values(rows)
+        insert = insert.on_conflict_do_update(
+            index_elements=[MessageCounter.device_id, MessageCounter.hour],
+            set_={
+                "received": MessageCounter.received + insert.excluded.received,
+                "delivered": MessageCounter.delivered + insert.excluded.delivered,
+                "failed": MessageCounter.failed + insert.excluded.failed,
+                "last_message": func.greatest(MessageCounter.last_message, insert.excluded.last_message)
+            }
+        )
+        async with self._session(session) as session:
+            await session.execute(insert)
+
+    def _summary_query(self, hours: int):
+        received = func.coalesce(func.sum(MessageCounter.received), 0)
+        return (
+            select(
+                received.label("total_messages"),
+                func.coalesce(func.sum(MessageCounter.delivered), 0).label("delivered"),
+                func.coalesce(func.sum(MessageCounter.failed), 0).label("failed"),
+                # Failed forwards (retries included) per message received
+                (func.sum(MessageCounter.failed) * 1.0 / func.nullif(received, 0)).label("failure_rate"),
+                func.max(MessageCounter.last_message).label("last_message")
+            )
+            .where(MessageCounter.hour >= hour_bucket(datetime.utcnow() - timedelta(hours=hours)))
+        )
+
+    async def get_message_summary(self, device_id: str, hours: int = 24,
+                                  session: Optional[AsyncSession] = None) -> Dict:
+        """Message counts for one device over the last `hours` (whole hours)"""
+        async with self._session(session) as session:
+            result = await session.execute(
+                self._summary_query(hours).where(MessageCounter.device_id == device_id)
+            )
+            return dict(result.one()._mapping)
+
+    async def get_message_summaries(self, hours: int = 24,
+                                    session: Optional[AsyncSession] = None) -> Dict[str, Dict]:
+        """Message counts for every device over the last `hours`, in one query"""
+        async with self._session(session) as session:
+            result = await session.execute(
+                self._summary_query(hours)
+                .add_columns(MessageCounter.device_id)
+                .group_by(MessageCounter.device_id)
+            )
+            summaries = {}
+            for row in result:
+                summary = dict(row._mapping)
+                summaries[summary.pop("device_id")] = summary
+            return summaries
+
+    @staticmethod
+    def _message_query(device_id: str = None, from_number: str = None, status: str = None,
+                       since: datetime = None, until: datetime = None, search: str = None,
+                       match: str = "words"):
+        query = select(Message)
+        if device_id:
+            query = query.where(Message.device_id == device_id)
+        if from_number:
+            query = query.where(Message.from_number == from_number)
+        if status:
+            query = query.where(Message.status == status)
+        if since:
+            query = query.where(Message.received_at >= since)
+        if until:
+            query = query.where(Message.received_at < until)
+        if search:
+            query = query.where(text_match(Message.text, search, match))
+        return query
+
+    async def search_messages(self, limit: int = 50, cursor: str = None,
+                              session: Optional[AsyncSession] = None, **filters) -> Page:
+        """Newest messages first; pass `next_cursor` back as `cursor` for the next page
+
+        Filters: device_id, from_number, status, since, until, search, match.
+        """
+        query = keyset(self._message_query(**filters), Message.received_at, Message.id, cursor)
+        async with self._session(session) as session:
+            result = await session.execute(query.limit(limit + 1))
+            return paginate(result.scalars().all(), limit, "received_at")
+
+    async def stream_messages(self, **filters) -> AsyncIterator[List[Message]]:
+        """Matching messages, oldest first, in batches of EXPORT_BATCH_SIZE
+
+        Rows come from a server-side cursor, so memory stays flat however
+        many match. Takes the same filters as search_messages.
+        """
+        query = self._message_query(**filters).order_by(Message.received_at, Message.id)
+        async for batch in self._stream(query):
+            yield batch
+
+    async def _stream(self, query) -> AsyncIterator[List]:
         async with self.async_session() as session:
+            result = await session.stream_scalars(
+                query.execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+            )
+            async for batch in result.partitions():
+                yield batch
+                # Exported rows are not needed again; keep the identity map small
+                session.expunge_all()
+
+    # Stats Operations
+    async def add_device_stats(self, stats: DeviceStats,
+                               session: Optional[AsyncSession] = None) -> DeviceStats:
+        async with self._session(session) as session:
             session.add(stats)
-            await session.commit()
+            await session.flush()
             return stats
 
-    async def get_device_stats(self, device_id: str, hours: int = 24) -> List[DeviceStats]:
-        async with self.async_session() as session:
+    async def get_device_stats(self, device_id: str, hours: int = 24,
+                               session: Optional[AsyncSession] = None) -> List[DeviceStats]:
+        async with self._session(session) as session:
             result = await session.execute(
                 select(DeviceStats)
                 .where(DeviceStats.device_id == device_id)
@@ -87,27 +393,32 @@ class DatabaseManager:
             return result.scalars().all()
 
     # Settings Operations
-    async def get_settings(self) -> Dict:
-        async with self.async_session() as session:
+    async def get_settings(self, session: Optional[AsyncSession] = None) -> Dict:
+        async with self._session(session) as session:
             result = await session.execute(select(SystemSettings))
             settings = {}
             for row in result.scalars().all():
                 settings[row.key] = row.value
             return settings
 
-    async def update_settings(self, settings: Dict):
-        async with self.async_session() as session:
-            for key, value in settings.items():
-                await session.merge(SystemSettings(
-                    key=key,
-                    value=value,
-                    updated_at=datetime.utcnow()
-                ))
-            await session.commit()
+    async def update_settings(self, settings: Dict, session: Optional[AsyncSession] = None):
+        """Upsert by key; merge() matched on the id and hit the unique key instead"""
+        if not settings:
+            return
+        now = datetime.utcnow()
+        insert = pg_insert(SystemSettings).values([
+            {"key": key, "value": value, "updated_at": now} for key, value in settings.items()
+        ])
+        async with self._session(session) as session:
+            await session.execute(insert.on_conflict_do_update(
+                index_elements=[SystemSettings.key],
+                set_={"value": insert.excluded.value, "updated_at": insert.excluded.updated_at}
+            ))
 
     # Logging Operations
-    async def add_log(self, level: str, message: str, source: str = None, details: Dict = None):
-        async with self.async_session() as session:
+    async def add_log(self, level: str, message: str, source: str = None, details: Dict = None,
+                      session: Optional[AsyncSession] = None):
+        async with self._session(session) as session:
             log = SystemLog(
                 level=level,
                 message=message,
@@ -115,18 +426,38 @@ class DatabaseManager:
                 details=details
             )
             session.add(log)
-            await session.commit()
 
-    async def get_logs(self, level: str = None, search: str = None, 
-                      limit: int = 100) -> List[SystemLog]:
-        async with self.async_session() as session:
-            query = select(SystemLog).order_by(SystemLog.timestamp.desc())
-            
-            if level and level != "all":
-                query = query.where(SystemLog.level == level)
-            if search:
-                query = query.where(SystemLog.message.ilike(f"%{search}%"))
-                
-            query = query.limit(limit)
-            result = await session.execute(query)
-            return result.scalars().all() 
\ No newline at end of file
+    @staticmethod
+    def _log_query(level: str = None, source: str = None, since: datetime = None,
+                   until: datetime = None, search: str = None, match: str = "words"):
+        query = select(SystemLog)
+        if level and level != "all":
+            query = query.where(SystemLog.level == level)
+        if source:
+            query = query.where(SystemLog.source == source)
+        if since:
+            query = query.where(SystemLog.timestamp >= since)
+        if until:
+            query = query.where(SystemLog.timestamp < until)
+        if search:
+            query = query.where(text_match(SystemLog.message, search, match))
+        return query
+
+    async def get_logs(self, level: str = None, search: str = None, limit: int = 100,
+                       cursor: str = None, session: Optional[AsyncSession] = None,
+                       **filters) -> Page:
+        """Newest logs first; pass `next_cursor` back as `cursor` for the next page
+
+        Filters besides level and search: source, since, until, match.
+        """
+        query = self._log_query(level=level, search=search, **filters)
+        query = keyset(query, SystemLog.timestamp, SystemLog.id, cursor)
+        async with self._session(session) as session:
+            result = await session.execute(query.limit(limit + 1))
+            return paginate(result.scalars().all(), limit, "timestamp")
+
+    async def stream_logs(self, **filters) -> AsyncIterator[List[SystemLog]]:
+        """Matching logs, oldest first, in batches; see stream_messages"""
+        query = self._log_query(**filters).order_by(SystemLog.timestamp, SystemLog.id)
+        async for batch in self._stream(query):
+            yield batch
@@ -1,8 +1,10 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, JSON, Text
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, JSON, Text, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
+from .search import tsvector
+
 Base = declarative_base()
 
 class Device(Base):
@@ -17,32 +19,71 @@ class Device(Base):
     config = Column(JSON, default={})
     status = Column(String, default="offline")
     signal_strength = Column(Integer)
+    signal_details = Column(JSON, default={})
+    device_metadata = Column(JSON, default={})
     first_seen = Column(DateTime, default=datetime.utcnow)
     last_seen = Column(DateTime, default=datetime.utcnow)
     
     messages = relationship("Message", back_populates="device")
     stats = relationship("DeviceStats", back_populates="device")
 
+    __table_args__ = (
+        Index("idx_devices_type", "type"),
+        Index("idx_devices_status", "status"),
+    )
+
 class Message(Base):
     __tablename__ = "messages"
     
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     device_id = Column(String, ForeignKey("devices.id"))
     from_number = Column(String, nullable=False)
     to_number = Column(String, nullable=False)
     text = Column(Text, nullable=False)
-    received_at = Column(DateTime, default=datetime.utcnow)
+    # Partition key (see src/database/partitions.py), so part of the primary key
+    received_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
     forwarded_at = Column(DateTime)
     status = Column(String, default="pending")  # pending, delivered, failed
+    delivery_attempts = Column(Integer, default=0)
+    last_attempt = Column(DateTime)
+    retry_after = Column(DateTime)  # when a failed forward may be retried
+    error_message = Column(String)
+    external_id = Column(String)  # provider message id, see MessageId
     
     device = relationship("Device", back_populates="messages")
 
+    __table_args__ = (
+        Index("ix_messages_device_received", "device_id", "received_at"),
+        # Only undelivered rows are ever due for retry, so keep the index small
+        Index("ix_messages_retry_pending", "retry_after",
+              postgresql_where=(status != "delivered")),
+        # Search: keyset pagination, sender filter, words and substrings
+        Index("ix_messages_received_id", "received_at", "id"),
+        Index("ix_messages_from_received", "from_number", "received_at"),
+        Index("ix_messages_text_fts", tsvector(text), postgresql_using="gin"),
+        Index("ix_messages_text_trgm", "text", postgresql_using="gin",
+              postgresql_ops={"text": "gin_trgm_ops"}),
+        {"postgresql_partition_by": "RANGE (received_at)"},
+    )
+
+class MessageId(Base):
+    """Provider message ids already stored
+
+    A unique index on messages would have to include the partition key,
+    and a redelivered webhook gets a new received_at, so ids are claimed
+    here instead, in the same transaction as the message rows.
+    """
+    __tablename__ = "message_ids"
+
+    external_id = Column(String, primary_key=True)
+    seen_at = Column(DateTime, default=datetime.utcnow, index=True)
+
 class DeviceStats(Base):
     __tablename__ = "device_stats"
     
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     device_id = Column(String, ForeignKey("devices.id"))
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow)
     signal_strength = Column(Integer)
     network_type = Column(String)
     operator = Column(String)
@@ -52,6 +93,27 @@ class DeviceStats(Base):
     
     device = relationship("Device", back_populates="stats")
 
+    __table_args__ = (
+        Index("ix_device_stats_device_timestamp", "device_id", "timestamp"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
+
+class MessageCounter(Base):
+    """Hourly per-device message counts, maintained on ingest"""
+    __tablename__ = "message_counters"
+
+    device_id = Column(String, ForeignKey("devices.id"), primary_key=True)
+    hour = Column(DateTime, primary_key=True)  # received_at truncated to the hour
+    received = Column(Integer, nullable=False, default=0)
+    delivered = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)  # failed forward attempts
+    last_message = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_message_counters_hour", "hour"),
+        {"postgresql_partition_by": "RANGE (hour)"},
+    )
+
 class SystemSettings(Base):
     __tablename__ = "system_settings"
     
@@ -63,9 +125,18 @@ class SystemSettings(Base):
 class SystemLog(Base):
     __tablename__ = "system_logs"
     
-    id = Column(Integer, primary_key=True)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow)
     level = Column(String, nullable=False)
     message = Column(Text, nullable=False)
     source = Column(String)
-    details = Column(JSON) 
\ No newline at end of file
+    details = Column(JSON)
+
+    __table_args__ = (
+        Index("ix_system_logs_level_timestamp", "level", "timestamp"),
+        Index("ix_system_logs_timestamp_id", "timestamp", "id"),
+        Index("ix_system_logs_message_fts", tsvector(message), postgresql_using="gin"),
+        Index("ix_system_logs_message_trgm", "message", postgresql_using="gin",
+              postgresql_ops={"message": "gin_trgm_ops"}),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Any constant works; it only has to be the same for every worker
+MAINTENANCE_LOCK_ID = 0x534D5350
+
+_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+def period_start(at: datetime, interval: str) -> datetime:
+    """Start of the day/week (Monday) containing `at`"""
+    day = at.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    if interval == "day":
+        return day
+    raise ValueError(f"Unsupported partition interval: {interval}")
+
+def period_step(interval: str) -> timedelta:
+    return timedelta(weeks=1) if interval == "week" else timedelta(days=1)
+
+def partition_name(table: str, start: datetime) -> str:
+    return f"{table}_p{start:%Y%m%d}"
+
+def default_partition(table: str) -> str:
+    """Catch-all for rows outside every range, e.g. a modem clock days off"""
+    return f"{table}_default"
+
+def upper_bound(bound_expr: str) -> Optional[datetime]:
+    """Upper bound of a range partition from pg_get_expr(relpartbound); None for MAXVALUE/DEFAULT"""
+    match = _BOUND.search(bound_expr)
+    if not match:
+        return None
+    return datetime.fromisoformat(match.group(1))
+
+class PartitionManager:
+    """Creates time partitions ahead of time and drops expired ones
+
+    `messages`, `device_stats` and `system_logs` are range-partitioned on
+    their timestamp (see migration 003). Retention detaches and drops whole
+    partitions, so it costs the same whether a partition holds ten rows or
+    ten million, and writes no WAL for the deleted rows.
+
+    Each table also has a DEFAULT partition, so an insert with a timestamp
+    outside the existing ranges lands there instead of failing its batch.
+    Rows that a new range partition covers are moved into it when it is
+    created; expired rows are deleted from the default partition.
+    """
+
+    def __init__(self, engine, tables: Dict[str, Dict] = None, premake: int = None):
+        self.engine = engine
+        self.tables = tables or settings.PARTITION_TABLES
+        self.premake = premake if premake is not None else settings.PARTITION_PREMAKE
+        self._task: Optional[asyncio.Task] = None
+
+    def planned(self, table: str, now: datetime) -> List[Tuple[str, datetime, datetime]]:
+        """(name, start, end) of the current partition and the next `premake`"""
+        interval = self.tables[table]["interval"]
+        start = period_start(now, interval)
+        step = period_step(interval)
+        return [
+            (partition_name(table, start + step * i), start + step * i, start + step * (i + 1))
+            for i in range(self.premake + 1)
+        ]
+
+    def expired(self, table: str, partitions: Dict[str, str], now: datetime) -> List[str]:
+        """Partitions whose every row is past retention"""
+        cutoff = now - timedelta(days=self.tables[table]["retention_days"])
+        names = []
+        for name, bound in partitions.items():
+            end = upper_bound(bound)
+            if end is not None and end <= cutoff:
+                names.append(name)
+        return sorted(names)
+
+    async def _partitions(self, conn, table: str) -> Dict[str, str]:
+        result = await conn.execute(text("""
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = :table
+        """), {"table": table})
+        return dict(result.all())
+
+    async def maintain(self, now: Optional[datetime] = None) -> Dict[str, Dict[str, List[str]]]:
+        """Create upcoming partitions and drop expired ones on every partitioned table"""
+        now = now or datetime.utcnow()
+        report = {}
+        if not self.tables:
+            return report
+        # Each DDL statement commits on its own, so locks are held only briefly
+        async with self.engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            locked = (await conn.execute(
+                text("SELECT pg_try_advisory_lock(:id)"), {"id": MAINTENANCE_LOCK_ID}
+            )).scalar()
+            if not locked:
+                # Another worker is already on it
+                return report
+            try:
+                for table in self.tables:
+                    report[table] = await self._maintain_table(conn, table, now)
+            finally:
+                await conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MAINTENANCE_LOCK_ID})
+        return report
+
+    async def _partition_key(self, conn, table: str) -> str:
+        result = await conn.execute(text("""
+            SELECT a.attname
+            FROM pg_partitioned_table p
+            JOIN pg_class c ON c.oid = p.partrelid
+            JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0]
+            WHERE c.relname = :table
+        """), {"table": table})
+        return result.scalar_one()
+
+    async def _create_partition(self, conn, table: str, key: str, name: str,
+                                start: datetime, end: datetime):
+        default = default_partition(table)
+        bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        in_range = f'"{key}" >= :start AND "{key}" < :end'
+        params = {"start": start, "end": end}
+        stray = (await conn.execute(
+            text(f'SELECT EXISTS (SELECT 1 FROM "{default}" WHERE {in_range})'), params
+        )).scalar()
+        if not stray:
+            await conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" {bounds}'))
+            return
+
+        # The new range may not overlap rows in the default partition:
+        # move them over with the default detached, all in one transaction
+        async with self.engine.begin() as tx:
+            await tx.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{default}"'))
+            await tx.execute(text(f'CREATE TABLE "{name}" PARTITION OF "{table}" {bounds}'))
+            await tx.execute(text(f'INSERT INTO "{table}" SELECT * FROM "{default}" WHERE {in_range}'), params)
+            await tx.execute(text(f'DELETE FROM "{default}" WHERE {in_range}'), params)
+            await tx.execute(text(f'ALTER TABLE "{table}" ATTACH PARTITION "{default}" DEFAULT'))
+        logger.info(f"Moved rows for {name} out of {default}")
+
+    async def _maintain_table(self, conn, table: str, now: datetime) -> Dict[str, List[str]]:
+        existing = await self._partitions(conn, table)
+        default = default_partition(table)
+        if default not in existing:
+            await conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{default}" PARTITION OF "{table}" DEFAULT'))
+        key = await self._partition_key(conn, table)
+
+        created = []
+        for name, start, end in self.planned(table, now):
+            if name in existing:
+                continue
+            await self._create_partition(conn, table, key, name, start, end)
+            created.append(name)
+
+        dropped = []
+        # No DETACH ... CONCURRENTLY: PostgreSQL refuses it on a table with a default partition
+        for name in self.expired(table, existing, now):
+            await conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+            await conn.execute(text(f'DROP TABLE "{name}"'))
+            dropped.append(name)
+        # The default partition is never dropped; trim it row by row instead
+        cutoff = now - timedelta(days=self.tables[table]["retention_days"])
+        await conn.execute(text(f'DELETE FROM "{default}" WHERE "{key}" < :cutoff'), {"cutoff": cutoff})
+
+        if created or dropped:
+            logger.info(f"Partitions for {table}: created {created}, dropped {dropped}")
+        return {"created": created, "dropped": dropped}
+
+    async def start(self):
+        """Maintain partitions now and then every PARTITION_MAINTENANCE_INTERVAL (if > 0)"""
+        try:
+            await self.maintain()
+        except Exception as e:
+            logger.error(f"Partition maintenance error: {str(e)}")
+        if not self._task and settings.PARTITION_MAINTENANCE_INTERVAL > 0:
+            self._task = asyncio.create_task(self._run(), name="partition-maintenance")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.PARTITION_MAINTENANCE_INTERVAL)
+            try:
+                await self.maintain()
+            except Exception as e:
+                logger.error(f"Partition maintenance error: {str(e)}")
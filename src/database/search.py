@@ -0,0 +1,68 @@
+import base64
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import func, literal_column, tuple_
+
+# Text search configuration for the tsvector indexes; 'simple' does no
+# stemming or stop words, which suits SMS in any language and log lines
+TS_CONFIG = literal_column("'simple'")
+
+MATCH_MODES = ("words", "substring")
+
+class InvalidCursor(ValueError):
+    pass
+
+@dataclass
+class Page:
+    items: List[Any]
+    next_cursor: Optional[str]
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    raw = f"{timestamp.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+def tsvector(column):
+    # Must match the index expression exactly for the GIN index to be used
+    return func.to_tsvector(TS_CONFIG, column)
+
+def text_match(column, search: str, mode: str = "words"):
+    """Indexed text filter
+
+    "words" matches whole words (websearch syntax: quotes, OR, -exclude)
+    through the tsvector index; "substring" is a case-insensitive contains
+    through the trigram index, for codes and numbers inside words. Trigram
+    lookups need at least three characters to narrow anything down.
+    """
+    if mode == "words":
+        return tsvector(column).op("@@")(func.websearch_to_tsquery(TS_CONFIG, search))
+    if mode == "substring":
+        escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return column.ilike(f"%{escaped}%", escape="\\")
+    raise ValueError(f"Unknown match mode: {mode}")
+
+def keyset(query, timestamp_column, id_column, cursor: Optional[str]):
+    """Newest first on (timestamp, id), continuing after `cursor`"""
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(timestamp_column, id_column) < tuple_(timestamp, row_id)
+        )
+    return query.order_by(timestamp_column.desc(), id_column.desc())
+
+def paginate(rows: List[Any], limit: int, timestamp_attr: str) -> Page:
+    """Trim the extra row fetched to detect a next page"""
+    if len(rows) <= limit:
+        return Page(rows, None)
+    rows = rows[:limit]
+    last = rows[-1]
+    return Page(rows, encode_cursor(getattr(last, timestamp_attr), last.id))
@@ -1,29 +1,75 @@
+import importlib
 import logging
-from typing import Dict, Type
+from collections.abc import Mapping
+from typing import Dict, Iterator, Optional, Type
 from .base import BaseModemManager
-from .franklin import FranklinManager
-from .sierra import SierraManager
-from .huawei import HuaweiManager
-from .android import AndroidManager
-from .voip import VoipManager
+from .registry import ManagerRegistry, ManagerResources
 
 logger = logging.getLogger(__name__)
 
-DEVICE_MANAGERS: Dict[str, Type[BaseModemManager]] = {
-    'franklin': FranklinManager,
-    'sierra': SierraManager,
-    'huawei': HuaweiManager,
-    'android': AndroidManager,
-    'voip': VoipManager
+# Manager modules are imported when a device of their type first shows up;
+# some pull in heavy drivers (adb_shell, pyserial) a deployment may not use
+MANAGER_PATHS: Dict[str, str] = {
+    'franklin': 'src.device_managers.franklin:FranklinManager',
+    'sierra': 'src.device_managers.sierra:SierraManager',
+    'huawei': 'src.device_managers.huawei:HuaweiManager',
+    'android': 'src.device_managers.android:AndroidManager',
+    'voip': 'src.device_managers.voip:VoipManager'
 }
 
+def load_manager_class(device_type: str) -> Type[BaseModemManager]:
+    module_name, _, class_name = MANAGER_PATHS[device_type].partition(':')
+    return getattr(importlib.import_module(module_name), class_name)
+
+class LazyManagerClasses(Mapping):
+    """Device type -> manager class, importing each module on first lookup"""
+
+    def __init__(self, paths: Dict[str, str]):
+        self._paths = paths
+        self._loaded: Dict[str, Type[BaseModemManager]] = {}
+
+    def load(self, device_type: str) -> Type[BaseModemManager]:
+        """Import the manager class for a type now, e.g. ahead of its first device"""
+        manager_class = self._loaded.get(device_type)
+        if manager_class is None:
+            if device_type not in self._paths:
+                raise KeyError(device_type)
+            manager_class = self._loaded[device_type] = load_manager_class(device_type)
+        return manager_class
+
+    def __getitem__(self, device_type: str) -> Type[BaseModemManager]:
+        return self.load(device_type)
+
+    def __contains__(self, device_type) -> bool:
+        return device_type in self._paths
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._paths)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+DEVICE_MANAGERS: LazyManagerClasses = LazyManagerClasses(MANAGER_PATHS)
+
+def __getattr__(name: str):
+    # `from src.device_managers import HuaweiManager` keeps working
+    for device_type, path in MANAGER_PATHS.items():
+        if path.endswith(f":{name}"):
+            return DEVICE_MANAGERS[device_type]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+_registry: Optional[ManagerRegistry] = None
+
+def create_registry(resources: ManagerResources, **kwargs) -> ManagerRegistry:
+    """Create the process-wide manager registry used by get_manager"""
+    global _registry
+    _registry = ManagerRegistry(resources, DEVICE_MANAGERS, **kwargs)
+    return _registry
+
 def get_manager(device_type: str) -> BaseModemManager:
-    """Get appropriate device manager with error handling"""
+    """Get the shared device manager for a type with error handling"""
     if device_type not in DEVICE_MANAGERS:
         raise ValueError(f"Unsupported device type: {device_type}")
-    
-    try:
-        return DEVICE_MANAGERS[device_type]()
-    except Exception as e:
-        logger.error(f"Failed to initialize {device_type} manager: {str(e)}")
-        raise 
\ No newline at end of file
+    if _registry is None:
+        raise RuntimeError("Device manager registry has not been created")
+    return _registry.get(device_type)
@@ -4,9 +4,6 @@ import re
 import logging
 from datetime import datetime
 import json
-import adb_shell.adb_device
-from adb_shell.auth.sign_pythonrsa import PythonRSASigner
-from adb_shell.auth.keygen import keygen
 import os
 
 from .base import BaseModemManager
@@ -15,15 +12,29 @@ from src.models import Device, SMS
 logger = logging.getLogger(__name__)
 
 class AndroidManager(BaseModemManager):
-    """Manager for Android devices using ADB"""
+    """Manager for Android devices using ADB
+
+    adb_shell and the ADB key pair are loaded on the first connection, so
+    a bridge without Android devices never pays for them (generating a
+    missing key is RSA keygen, seconds on small hosts).
+    """
     
-    def __init__(self, db):
-        super().__init__(db)
+    def __init__(self, db, resources=None):
+        super().__init__(db, resources)
         self._adb_connections = {}
-        self._initialize_adb_auth()
+        self.signer = None
+        self._signer_lock = asyncio.Lock()
+
+    async def _get_signer(self):
+        async with self._signer_lock:
+            if self.signer is None:
+                self.signer = await self._run_blocking(self._initialize_adb_auth)
+        return self.signer
 
     def _initialize_adb_auth(self):
         """Initialize ADB authentication"""
+        from adb_shell.auth.keygen import keygen
+        from adb_shell.auth.sign_pythonrsa import PythonRSASigner
         try:
             # Create ADB keys directory if it doesn't exist
             adb_dir = os.path.expanduser('~/.android')
@@ -43,7 +54,7 @@ class AndroidManager(BaseModemManager):
             with open(pub_key_path, 'rb') as f:
                 pub_key = f.read()
 
-            self.signer = PythonRSASigner(pub_key, priv_key)
+            return PythonRSASigner(pub_key, priv_key)
             
         except Exception as e:
             logger.error(f"ADB auth initialization error: {str(e)}")
@@ -52,15 +63,18 @@ class AndroidManager(BaseModemManager):
     async def _initialize_modem(self, device: Device) -> bool:
         """Initialize Android device connection"""
         try:
+            from adb_shell.adb_device import AdbDeviceTcp
+            signer = await self._get_signer()
+
             # Connect to device via ADB
-            adb_device = adb_shell.adb_device.AdbDeviceTcp(
+            adb_device = AdbDeviceTcp(
                 device.config.get('ip', '127.0.0.1'),
                 device.config.get('port', 5555),
                 default_transport_timeout_s=30
             )
             
             # Connect and authenticate
-            adb_device.connect(rsa_keys=[self.signer], auth_timeout_s=30)
+            await self._run_blocking(adb_device.connect, rsa_keys=[signer], auth_timeout_s=30)
             
             # Store connection
             self._adb_connections[device.id] = adb_device
@@ -85,15 +99,15 @@ class AndroidManager(BaseModemManager):
 
             info = {}
             # Get device model
-            model = adb.shell('getprop ro.product.model').strip()
+            model = (await self._run_blocking(adb.shell, 'getprop ro.product.model')).strip()
             info['model'] = model
 
             # Get Android version
-            version = adb.shell('getprop ro.build.version.release').strip()
+            version = (await self._run_blocking(adb.shell, 'getprop ro.build.version.release')).strip()
             info['android_version'] = version
 
             # Get IMEI
-            imei = adb.shell('service call iphonesubinfo 1').strip()
+            imei = (await self._run_blocking(adb.shell, 'service call iphonesubinfo 1')).strip()
             if imei:
                 # Parse IMEI from service call response
                 imei = re.findall(r"'([0-9a-fA-F]+)'", imei)
@@ -110,70 +124,75 @@ class AndroidManager(BaseModemManager):
         """Check for new messages using Android content provider"""
         messages = []
         try:
-            adb = self._adb_connections.get(device.id)
-            if not adb:
-                return messages
-
-            # Query SMS content provider
-            cmd = (
-                'content query --uri content://sms/inbox '
-                '--projection "_id,address,body,date,read" '
-                '--where "read=0"'
-            )
-            output = adb.shell(cmd)
-
-            # Parse messages
-            for line in output.splitlines():
-                if not line.strip():
-                    continue
+            async with self.device_lock(device):
+                adb = self._adb_connections.get(device.id)
+                if not adb:
+                    raise IOError(f"No ADB connection to {device.id}")
+
+                # Query SMS content provider
+                cmd = (
+                    'content query --uri content://sms/inbox '
+                    '--projection "_id,address,body,date,read" '
+                    '--where "read=0"'
+                )
+                output = await self._run_blocking(adb.shell, cmd)
+
+                # Parse messages
+                for line in output.splitlines():
+                    if not line.strip():
+                        continue
                     
-                try:
-                    # Parse content query output
-                    msg_data = dict(item.split('=', 1) for item in line.split(' '))
+                    try:
+                        # Parse content query output
+                        msg_data = dict(item.split('=', 1) for item in line.split(' '))
                     
-                    message = SMS(
-                        device_id=device.id,
-                        from_number=msg_data['address'].strip('"'),
-                        to_number=device.phone_number,
-                        text=msg_data['body'].strip('"'),
-                        received_at=datetime.fromtimestamp(int(msg_data['date'])/1000),
-                        delivered=False
-                    )
-                    messages.append(message)
+                        message = SMS(
+                            device_id=device.id,
+                            from_number=msg_data['address'].strip('"'),
+                            to_number=device.phone_number,
+                            text=msg_data['body'].strip('"'),
+                            received_at=datetime.fromtimestamp(int(msg_data['date'])/1000),
+                            delivered=False
+                        )
+                        messages.append(message)
                     
-                    # Mark message as read
-                    adb.shell(
-                        f'content update --uri content://sms/{msg_data["_id"]} '
-                        '--bind read:i:1'
-                    )
+                        # Mark message as read
+                        await self._run_blocking(
+                            adb.shell,
+                            f'content update --uri content://sms/{msg_data["_id"]} '
+                            '--bind read:i:1'
+                        )
                     
-                except Exception as e:
-                    logger.error(f"Message parsing error: {str(e)}")
-                    continue
+                    except Exception as e:
+                        logger.error(f"Message parsing error: {str(e)}")
+                        continue
 
             return messages
             
         except Exception as e:
             logger.error(f"Check messages error: {str(e)}")
-            return messages
+            if messages:
+                return messages
+            raise
 
     async def send_message(self, device: Device, to_number: str, text: str) -> bool:
         """Send SMS using Android telephony manager"""
         try:
-            adb = self._adb_connections.get(device.id)
-            if not adb:
-                return False
-
-            # Create and execute intent to send SMS
-            cmd = (
-                'am broadcast -a android.provider.Telephony.SMS_SEND '
-                f'-n com.android.mms/.transaction.SmsReceiverService '
-                f'--es "address" "{to_number}" '
-                f'--es "sms_body" "{text}"'
-            )
-            output = adb.shell(cmd)
+            async with self.device_lock(device):
+                adb = self._adb_connections.get(device.id)
+                if not adb:
+                    return False
+
+                # Create and execute intent to send SMS
+                cmd = (
+                    'am broadcast -a android.provider.Telephony.SMS_SEND '
+                    f'-n com.android.mms/.transaction.SmsReceiverService '
+                    f'--es "address" "{to_number}" '
+                    f'--es "sms_body" "{text}"'
+                )
+                output = await self._run_blocking(adb.shell, cmd)
             
-            return "Broadcast completed" in output
+                return "Broadcast completed" in output
             
         except Exception as e:
             logger.error(f"Send message error: {str(e)}")
@@ -182,24 +201,25 @@ class AndroidManager(BaseModemManager):
     async def get_signal_strength(self, device: Device) -> Optional[int]:
         """Get signal strength using Android telephony manager"""
         try:
-            adb = self._adb_connections.get(device.id)
-            if not adb:
-                return None
-
-            # Get signal strength using telephony manager
-            cmd = (
-                'dumpsys telephony.registry | '
-                'grep -i signalstrength'
-            )
-            output = adb.shell(cmd)
+            async with self.device_lock(device):
+                adb = self._adb_connections.get(device.id)
+                if not adb:
+                    return None
+
+                # Get signal strength using telephony manager
+                cmd = (
+                    'dumpsys telephony.registry | '
+                    'grep -i signalstrength'
+                )
+                output = await self._run_blocking(adb.shell, cmd)
             
-            # Parse signal strength
-            match = re.search(r'SignalStrength:\s*(\d+)', output)
-            if match:
-                signal = int(match.group(1))
-                return min(signal * 3.226, 100)  # Convert to percentage
+                # Parse signal strength
+                match = re.search(r'SignalStrength:\s*(\d+)', output)
+                if match:
+                    signal = int(match.group(1))
+                    return min(signal * 3.226, 100)  # Convert to percentage
                 
-            return None
+                return None
             
         except Exception as e:
             logger.error(f"Signal strength error: {str(e)}")
@@ -210,7 +230,7 @@ class AndroidManager(BaseModemManager):
         try:
             adb = self._adb_connections.pop(device.id, None)
             if adb:
-                adb.close()
+                await self._run_blocking(adb.close)
             await super().cleanup(device)
         except Exception as e:
             logger.error(f"Cleanup error: {str(e)}")
\ No newline at end of file
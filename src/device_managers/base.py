@@ -1,30 +1,60 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional, Dict
-import serial
+from typing import Any, Callable, List, Optional, Dict, Tuple
+import functools
 import logging
 import asyncio
+import time
 from datetime import datetime
 
 from src.models import Device, SMS
 from src.database.manager import DatabaseManager
+from src.metrics import AT_COMMAND_SECONDS, command_name
 
 logger = logging.getLogger(__name__)
 
+# Final result codes that end an AT command response
+FINAL_RESPONSES = ("OK", "ERROR")
+# Statuses set by the API that cleanup must not overwrite with "offline"
+TERMINAL_STATUSES = ("removed",)
+
 class BaseModemManager(ABC):
-    def __init__(self, db: DatabaseManager):
+    def __init__(self, db: DatabaseManager, resources=None):
         self.db = db
+        self.resources = resources  # shared ManagerResources, set by the registry
         self._ports = {}  # Store serial connections
+        self._locks: Dict[str, asyncio.Lock] = {}  # One AT dialog per device at a time
+
+    async def start(self):
+        """Lifecycle hook, called once when the registry starts"""
+
+    async def stop(self):
+        """Lifecycle hook, called once when the registry stops"""
+
+    async def _run_blocking(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking driver call on the shared device I/O executor"""
+        executor = self.resources.executor if self.resources else None
+        return await asyncio.get_running_loop().run_in_executor(
+            executor, functools.partial(func, *args, **kwargs)
+        )
+
+    def device_lock(self, device: Device) -> asyncio.Lock:
+        """Lock held for a whole AT dialog, so a poll never interleaves with a send"""
+        lock = self._locks.get(device.id)
+        if lock is None:
+            lock = self._locks[device.id] = asyncio.Lock()
+        return lock
 
     async def initialize(self, device: Device) -> bool:
         """Initialize device connection and configuration"""
         try:
-            # Open serial port
-            if not await self._open_port(device):
-                return False
-                
-            # Basic initialization sequence
-            if not await self._initialize_modem(device):
-                return False
+            async with self.device_lock(device):
+                # Open serial port
+                if not await self._open_port(device):
+                    return False
+
+                # Basic initialization sequence
+                if not await self._initialize_modem(device):
+                    return False
                 
             # Update device status
             await self.db.update_device_status(device.id, "online")
@@ -39,13 +69,19 @@ class BaseModemManager(ABC):
         """Cleanup device resources"""
         try:
             await self._close_port(device)
-            await self.db.update_device_status(device.id, "offline")
+            if device.status not in TERMINAL_STATUSES:
+                await self.db.update_device_status(device.id, "offline")
         except Exception as e:
             logger.error(f"Device cleanup error: {str(e)}")
 
     @abstractmethod
     async def check_messages(self, device: Device) -> List[SMS]:
-        """Check for new messages"""
+        """Check for new messages
+
+        Raises when the device can't be polled, so the supervisor counts the
+        failure and eventually restarts the device. Messages already taken
+        off the device before an error are returned instead, so none are lost.
+        """
         pass
 
     @abstractmethod
@@ -64,7 +100,9 @@ class BaseModemManager(ABC):
             if device.id in self._ports:
                 return True
                 
-            ser = serial.Serial(
+            import serial  # only serial modem types need pyserial
+            ser = await self._run_blocking(
+                serial.Serial,
                 port=device.port,
                 baudrate=115200,
                 timeout=1
@@ -79,42 +117,69 @@ class BaseModemManager(ABC):
     async def _close_port(self, device: Device):
         """Close serial port connection"""
         try:
-            if device.id in self._ports:
-                self._ports[device.id].close()
-                del self._ports[device.id]
+            ser = self._ports.pop(device.id, None)
+            if ser:
+                await self._run_blocking(ser.close)
         except Exception as e:
             logger.error(f"Port close error: {str(e)}")
 
     async def _send_at_command(self, device: Device, command: str, 
-                             timeout: int = 1) -> Optional[str]:
-        """Send AT command and get response"""
+                             timeout: int = 1,
+                             expect: Tuple[str, ...] = FINAL_RESPONSES) -> Optional[str]:
+        """Send AT command and get response; callers hold device_lock
+
+        Raises IOError when the port isn't open and passes on port errors.
+        """
+        ser = self._ports.get(device.id)
+        if not ser:
+            raise IOError(f"Port for {device.id} is not open")
         try:
-            ser = self._ports.get(device.id)
-            if not ser:
-                return None
-                
             # Clear input buffer
-            ser.reset_input_buffer()
+            await self._run_blocking(ser.reset_input_buffer)
             
             # Send command
-            ser.write(f"{command}\r\n".encode())
+            started = time.monotonic()
+            await self._write(device, f"{command}\r\n".encode())
             
             # Wait for response
-            response = ""
-            start_time = datetime.now()
-            while (datetime.now() - start_time).seconds < timeout:
-                if ser.in_waiting:
-                    response += ser.read(ser.in_waiting).decode()
-                    if "OK" in response or "ERROR" in response:
-                        break
-                await asyncio.sleep(0.1)
-                
-            return response.strip()
+            response = await self._read_response(device, timeout, expect)
+            AT_COMMAND_SECONDS.labels(device.id, command_name(command)).observe(
+                time.monotonic() - started
+            )
+            return response
             
         except Exception as e:
             logger.error(f"AT command error: {str(e)}")
+            raise
+
+    async def _write(self, device: Device, data: bytes) -> bool:
+        """Write raw bytes to the device's port"""
+        ser = self._ports.get(device.id)
+        if not ser:
+            return False
+        await self._run_blocking(ser.write, data)
+        return True
+
+    async def _read_response(self, device: Device, timeout: float,
+                             expect: Tuple[str, ...] = FINAL_RESPONSES) -> Optional[str]:
+        """Read from the port until one of `expect` arrives or timeout expires"""
+        ser = self._ports.get(device.id)
+        if not ser:
             return None
 
+        response = ""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            waiting = ser.in_waiting
+            if waiting:
+                data = await self._run_blocking(ser.read, waiting)
+                response += data.decode(errors='ignore')
+                if any(token in response for token in expect):
+                    break
+            await asyncio.sleep(0.1)
+
+        return response.strip()
+
     @abstractmethod
     async def _initialize_modem(self, device: Device) -> bool:
         """Initialize modem with basic AT commands"""
@@ -26,10 +26,10 @@ class FranklinManager(BaseModemManager):
         'change_password': '/api/v1/settings/password'
     }
 
-    def __init__(self, db):
-        super().__init__(db)
-        self.auth_token = None
-        self.base_url = None
+    def __init__(self, db, resources=None):
+        super().__init__(db, resources)
+        self._base_urls = {}  # device id -> modem web UI URL
+        self._tokens = {}  # device id -> API bearer token
         self._session = None
 
     @property
@@ -42,7 +42,7 @@ class FranklinManager(BaseModemManager):
         """Initialize Franklin modem"""
         try:
             # Set base URL
-            self.base_url = f"http://{device.config.get('ip', '192.168.1.1')}"
+            self._base_urls[device.id] = f"http://{device.config.get('ip', '192.168.1.1')}"
             
             # Login to device
             if not await self._login(device):
@@ -69,12 +69,12 @@ class FranklinManager(BaseModemManager):
             
             client = await self.session
             async with client.post(
-                f"{self.base_url}{self.ENDPOINTS['login']}", 
+                f"{self._base_urls[device.id]}{self.ENDPOINTS['login']}", 
                 json=payload
             ) as response:
                 data = await response.json()
                 if data.get('success'):
-                    self.auth_token = data.get('token')
+                    self._tokens[device.id] = data.get('token')
                     return True
                 return False
                 
@@ -82,18 +82,52 @@ class FranklinManager(BaseModemManager):
             logger.error(f"Login error: {str(e)}")
             return False
 
+    def _headers(self, device: Device) -> dict:
+        return {'Authorization': f'Bearer {self._tokens.get(device.id)}'}
+
+    async def _get_device_info(self, device: Device) -> dict:
+        """Get model and firmware details"""
+        try:
+            client = await self.session
+            async with client.get(
+                f"{self._base_urls[device.id]}{self.ENDPOINTS['device_info']}",
+                headers=self._headers(device)
+            ) as response:
+                data = await response.json()
+                return data.get('device', {}) if data.get('success') else {}
+
+        except Exception as e:
+            logger.error(f"Get device info error: {str(e)}")
+            return {}
+
+    async def _delete_message(self, device: Device, message_id) -> bool:
+        """Delete a message from the modem's inbox"""
+        try:
+            client = await self.session
+            async with client.post(
+                f"{self._base_urls[device.id]}{self.ENDPOINTS['sms_delete']}",
+                headers=self._headers(device),
+                json={'id': message_id}
+            ) as response:
+                data = await response.json()
+                return data.get('success', False)
+
+        except Exception as e:
+            logger.error(f"Delete message error: {str(e)}")
+            return False
+
     async def check_messages(self, device: Device) -> List[SMS]:
         """Check for new messages"""
         messages = []
-        if not self.auth_token and not await self._login(device):
-            return messages
+        if device.id not in self._tokens and not await self._login(device):
+            raise IOError(f"Login to {device.id} failed")
             
         try:
-            headers = {'Authorization': f'Bearer {self.auth_token}'}
+            headers = self._headers(device)
             
             client = await self.session
             async with client.get(
-                f"{self.base_url}{self.ENDPOINTS['sms_list']}", 
+                f"{self._base_urls[device.id]}{self.ENDPOINTS['sms_list']}", 
                 headers=headers
             ) as response:
                 data = await response.json()
@@ -112,21 +146,23 @@ class FranklinManager(BaseModemManager):
                     messages.append(message)
                     
                     # Delete processed message
-                    await self._delete_message(msg['id'])
+                    await self._delete_message(device, msg['id'])
                     
                 return messages
                 
         except Exception as e:
             logger.error(f"Check messages error: {str(e)}")
-            return messages
+            if messages:
+                return messages
+            raise
 
     async def send_message(self, device: Device, to_number: str, text: str) -> bool:
         """Send SMS message"""
-        if not self.auth_token and not await self._login(device):
+        if device.id not in self._tokens and not await self._login(device):
             return False
             
         try:
-            headers = {'Authorization': f'Bearer {self.auth_token}'}
+            headers = self._headers(device)
             payload = {
                 'to': to_number,
                 'text': text
@@ -134,7 +170,7 @@ class FranklinManager(BaseModemManager):
             
             client = await self.session
             async with client.post(
-                f"{self.base_url}{self.ENDPOINTS['sms_send']}", 
+                f"{self._base_urls[device.id]}{self.ENDPOINTS['sms_send']}", 
                 headers=headers,
                 json=payload
             ) as response:
@@ -147,15 +183,15 @@ class FranklinManager(BaseModemManager):
 
     async def get_signal_strength(self, device: Device) -> Optional[int]:
         """Get current signal strength"""
-        if not self.auth_token and not await self._login(device):
+        if device.id not in self._tokens and not await self._login(device):
             return None
             
         try:
-            headers = {'Authorization': f'Bearer {self.auth_token}'}
+            headers = self._headers(device)
             
             client = await self.session
             async with client.get(
-                f"{self.base_url}{self.ENDPOINTS['signal_info']}", 
+                f"{self._base_urls[device.id]}{self.ENDPOINTS['signal_info']}", 
                 headers=headers
             ) as response:
                 data = await response.json()
@@ -172,10 +208,12 @@ class FranklinManager(BaseModemManager):
     async def cleanup(self, device: Device):
         """Cleanup resources"""
         try:
-            if self._session:
+            self._tokens.pop(device.id, None)
+            self._base_urls.pop(device.id, None)
+            # The HTTP session is shared by every Franklin device
+            if self._session and not self._base_urls:
                 await self._session.close()
                 self._session = None
-            self.auth_token = None
             await super().cleanup(device)
         except Exception as e:
             logger.error(f"Cleanup error: {str(e)}")
\ No newline at end of file
@@ -2,9 +2,11 @@ from typing import List, Optional
 import re
 from datetime import datetime
 import logging
+import asyncio
 
 from .base import BaseModemManager
 from src.models import Device, SMS
+from src.config import settings
 from src.database.manager import DatabaseManager
 
 logger = logging.getLogger(__name__)
@@ -53,59 +55,60 @@ class HuaweiManager(BaseModemManager):
         """Check for new messages"""
         messages = []
         try:
-            response = await self._send_at_command(device, self.AT_COMMANDS['CHECK_SMS'])
-            if not response:
-                return messages
+            async with self.device_lock(device):
+                response = await self._send_at_command(device, self.AT_COMMANDS['CHECK_SMS'])
+                if not response:
+                    return messages
                 
-            # Parse messages
-            for match in re.finditer(r'\+CMGL: (\d+),".*?","(.*?)",.*?"(.*?)",(.*?)\r\n(.*?)\r\n', 
-                                   response, re.DOTALL):
-                index, sender, timestamp, _, text = match.groups()
+                # Parse messages
+                for match in re.finditer(r'\+CMGL: (\d+),".*?","(.*?)",.*?"(.*?)",(.*?)\r\n(.*?)\r\n', 
+                                       response, re.DOTALL):
+                    index, sender, timestamp, _, text = match.groups()
                 
-                message = SMS(
-                    device_id=device.id,
-                    from_number=sender,
-                    to_number=device.phone_number,
-                    text=text.strip(),
-                    received_at=datetime.utcnow(),
-                    delivered=False
-                )
-                messages.append(message)
+                    message = SMS(
+                        device_id=device.id,
+                        from_number=sender,
+                        to_number=device.phone_number,
+                        text=text.strip(),
+                        received_at=datetime.utcnow(),
+                        delivered=False
+                    )
+                    messages.append(message)
                 
-                # Delete processed message
-                await self._send_at_command(
-                    device, 
-                    self.AT_COMMANDS['DELETE_SMS'].format(index)
-                )
+                    # Delete processed message
+                    await self._send_at_command(
+                        device, 
+                        self.AT_COMMANDS['DELETE_SMS'].format(index)
+                    )
                 
-            return messages
+                return messages
             
         except Exception as e:
             logger.error(f"Check messages error: {str(e)}")
-            return messages
+            if messages:
+                return messages
+            raise
 
     async def send_message(self, device: Device, to_number: str, text: str) -> bool:
         """Send SMS message"""
         try:
-            # Start SMS sending
-            response = await self._send_at_command(
-                device,
-                self.AT_COMMANDS['SEND_SMS'].format(to_number)
-            )
-            if not response or '>' not in response:
-                return False
-                
-            # Send message content
-            ser = self._ports.get(device.id)
-            if not ser:
-                return False
+            async with self.device_lock(device):
+                # Start SMS sending
+                response = await self._send_at_command(
+                    device,
+                    self.AT_COMMANDS['SEND_SMS'].format(to_number),
+                    expect=('>', 'ERROR')
+                )
+                if not response or '>' not in response:
+                    return False
                 
-            ser.write(text.encode())
-            ser.write(b'\x1A')  # Ctrl+Z to end message
+                # Send message content, Ctrl+Z to end message
+                if not await self._write(device, text.encode() + b'\x1A'):
+                    return False
             
-            # Wait for confirmation
-            response = await self._send_at_command(device, "", timeout=5)
-            return response and "OK" in response
+                # Wait for the network to accept it (+CMGS: <mr> then OK)
+                response = await self._read_response(device, settings.SMS_SEND_TIMEOUT)
+                return bool(response) and "OK" in response
             
         except Exception as e:
             logger.error(f"Send message error: {str(e)}")
@@ -114,16 +117,17 @@ class HuaweiManager(BaseModemManager):
     async def get_signal_strength(self, device: Device) -> Optional[int]:
         """Get current signal strength"""
         try:
-            response = await self._send_at_command(device, self.AT_COMMANDS['CHECK_SIGNAL'])
-            if not response:
-                return None
+            async with self.device_lock(device):
+                response = await self._send_at_command(device, self.AT_COMMANDS['CHECK_SIGNAL'])
+                if not response:
+                    return None
                 
-            match = re.search(r'\+CSQ: (\d+),', response)
-            if match:
-                signal = int(match.group(1))
-                return min(signal * 3.226, 100)  # Convert to percentage
+                match = re.search(r'\+CSQ: (\d+),', response)
+                if match:
+                    signal = int(match.group(1))
+                    return min(signal * 3.226, 100)  # Convert to percentage
                 
-            return None
+                return None
             
         except Exception as e:
             logger.error(f"Signal strength error: {str(e)}")
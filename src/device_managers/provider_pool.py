@@ -0,0 +1,168 @@
+import asyncio
+import hashlib
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import aiohttp
+
+from src.config import settings
+from src.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+class CoalescedCallCancelled(Exception):
+    """Raised to callers sharing a coalesced call whose leader was cancelled"""
+
+class ProviderClient:
+    """HTTP client shared by every device on one provider account
+
+    Owns a single connection pool and a token bucket sized to the
+    provider's account limit. 429 responses pause the whole account for
+    the advertised Retry-After before the request is retried.
+    """
+
+    def __init__(self, provider: str, account_id: str, rate: float,
+                 auth: Optional[aiohttp.BasicAuth] = None):
+        self.provider = provider
+        self.account_id = account_id
+        self.limiter = TokenBucket(rate)
+        self.refs = 0
+        self._session = aiohttp.ClientSession(
+            auth=auth,
+            connector=aiohttp.TCPConnector(
+                limit=settings.VOIP_POOL_CONNECTIONS,
+                ttl_dns_cache=300
+            ),
+            timeout=aiohttp.ClientTimeout(total=settings.DEFAULT_DEVICE_CONFIGS['voip']['timeout'])
+        )
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._cache: Dict[str, Tuple[float, Any]] = {}
+
+    @staticmethod
+    def _retry_after(response: aiohttp.ClientResponse) -> float:
+        value = response.headers.get('Retry-After')
+        try:
+            return max(float(value), 0.0) if value else 1.0
+        except ValueError:
+            return 1.0
+
+    @asynccontextmanager
+    async def request(self, method: str, url: str, **kwargs):
+        """Rate-limited request; usable like `session.get(...)`"""
+        attempts = 0
+        while True:
+            await self.limiter.acquire()
+            response = await self._session.request(method, url, **kwargs)
+            if response.status == 429 and attempts < settings.VOIP_MAX_RETRIES:
+                delay = self._retry_after(response)
+                response.release()
+                attempts += 1
+                logger.warning(
+                    f"{self.provider} account {self.account_id} rate limited, "
+                    f"backing off {delay:.1f}s"
+                )
+                self.limiter.block_for(delay)
+                continue
+            break
+
+        try:
+            yield response
+        finally:
+            response.release()
+
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    async def coalesce(self, key: str, fetch: Callable[[], Awaitable[Any]],
+                       ttl: float = 0.0) -> Any:
+        """Run `fetch` once for all concurrent callers asking for `key`
+
+        With `ttl` the result is also reused for that many seconds, which
+        is how per-account calls (balance, account info) stay at one
+        request no matter how many numbers the account has.
+        """
+        if ttl:
+            cached = self._cache.get(key)
+            if cached and cached[0] > time.monotonic():
+                return cached[1]
+
+        pending = self._inflight.get(key)
+        if pending:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await fetch()
+        except BaseException as e:
+            # Followers wait on the future, so it must settle whatever happens
+            # to the leader; they weren't cancelled themselves, so they get an error
+            if isinstance(e, asyncio.CancelledError):
+                e = CoalescedCallCancelled(f"{self.provider} call {key} was cancelled")
+            future.set_exception(e)
+            # Mark retrieved so lone failures don't warn about unconsumed exceptions
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            if ttl:
+                self._cache[key] = (time.monotonic() + ttl, result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    async def close(self):
+        await self._session.close()
+
+class ProviderClientPool:
+    """Account-keyed registry of ProviderClient instances
+
+    Devices acquire a client for their (provider, credentials) pair and
+    release it on cleanup; the session closes with its last device.
+    """
+
+    def __init__(self, rate_limits: Optional[Dict[str, float]] = None):
+        self.rate_limits = rate_limits or settings.VOIP_RATE_LIMITS
+        self._clients: Dict[Tuple[str, str, str], ProviderClient] = {}
+
+    @staticmethod
+    def _key(provider: str, account_id: str, secret: str) -> Tuple[str, str, str]:
+        # Keep the secret out of the key itself but still split rotated credentials
+        return (provider, account_id, hashlib.sha256(secret.encode()).hexdigest()[:16])
+
+    def acquire(self, provider: str, account_id: str, secret: str,
+                basic_auth: bool = True, rate: Optional[float] = None) -> ProviderClient:
+        key = self._key(provider, account_id, secret)
+        client = self._clients.get(key)
+        if client is None:
+            client = ProviderClient(
+                provider,
+                account_id,
+                rate or self.rate_limits.get(provider, 1.0),
+                auth=aiohttp.BasicAuth(account_id, secret) if basic_auth else None
+            )
+            self._clients[key] = client
+        client.refs += 1
+        return client
+
+    async def release(self, client: ProviderClient):
+        client.refs -= 1
+        if client.refs > 0:
+            return
+        for key, value in list(self._clients.items()):
+            if value is client:
+                del self._clients[key]
+        await client.close()
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    async def close(self):
+        for client in list(self._clients.values()):
+            await client.close()
+        self._clients.clear()
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+from .base import BaseModemManager
+from .provider_pool import ProviderClientPool
+from src.config import settings
+from src.models import Device
+
+logger = logging.getLogger(__name__)
+
+class ManagerResources:
+    """Shared resources injected into every manager instance"""
+
+    def __init__(self, db, provider_pool: Optional[ProviderClientPool] = None,
+                 executor: Optional[ThreadPoolExecutor] = None):
+        self.db = db
+        self.provider_pool = provider_pool if provider_pool is not None else ProviderClientPool()
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=settings.DEVICE_IO_THREADS,
+            thread_name_prefix="device-io"
+        )
+
+    async def close(self):
+        await self.provider_pool.close()
+        self.executor.shutdown(wait=False)
+
+class ManagerRegistry:
+    """Creates and owns device manager instances
+
+    Managers are built once, lazily, with shared resources injected.
+    Devices of one type can be sharded across several instances
+    (MANAGER_SHARDS) and, with WORKER_COUNT > 1, across worker processes:
+    each process only owns the devices that hash to its WORKER_INDEX. With
+    SHARD_BACKEND set, leases decide ownership (see src.sharding) and the
+    static split is not applied.
+
+    Hooks registered with `add_hook` run for the `started` and `stopped`
+    events with the manager instance as argument. Instances created after
+    the registry started are started in the background.
+    """
+
+    EVENTS = ('started', 'stopped')
+
+    def __init__(self, resources: ManagerResources,
+                 manager_classes: Dict[str, Type[BaseModemManager]],
+                 shards: Optional[Dict[str, int]] = None,
+                 worker_index: Optional[int] = None,
+                 worker_count: Optional[int] = None):
+        self.resources = resources
+        self.manager_classes = manager_classes
+        self.shards = shards if shards is not None else settings.MANAGER_SHARDS
+        self.worker_index = settings.WORKER_INDEX if worker_index is None else worker_index
+        self.worker_count = worker_count or settings.WORKER_COUNT
+        if settings.SHARD_BACKEND and self.worker_count > 1:
+            logger.warning("WORKER_COUNT is ignored when SHARD_BACKEND is set")
+            self.worker_index, self.worker_count = 0, 1
+        self._instances: Dict[Tuple[str, int], BaseModemManager] = {}
+        self._hooks: Dict[str, List[Callable[[BaseModemManager], Awaitable]]] = {
+            event: [] for event in self.EVENTS
+        }
+        self._started = False
+        self._starting: set = set()
+
+    def supports(self, device_type: str) -> bool:
+        return device_type in self.manager_classes
+
+    @staticmethod
+    def _hash(device_id: str) -> int:
+        return zlib.crc32(device_id.encode())
+
+    def owns(self, device_id: str) -> bool:
+        """Whether this worker process is responsible for a device"""
+        return self.worker_count <= 1 or self._hash(device_id) % self.worker_count == self.worker_index
+
+    def shard_for(self, device: Device) -> int:
+        count = max(self.shards.get(device.type, 1), 1)
+        # Divide out the worker split so shards stay balanced within a worker
+        return (self._hash(device.id) // max(self.worker_count, 1)) % count
+
+    def add_hook(self, event: str, callback: Callable[[BaseModemManager], Awaitable]):
+        if event not in self._hooks:
+            raise ValueError(f"Unknown registry event: {event}")
+        self._hooks[event].append(callback)
+
+    async def _emit(self, event: str, manager: BaseModemManager):
+        for callback in self._hooks[event]:
+            try:
+                await callback(manager)
+            except Exception as e:
+                logger.error(f"Registry {event} hook error: {str(e)}")
+
+    def _create(self, device_type: str, shard: int) -> BaseModemManager:
+        if device_type not in self.manager_classes:
+            raise ValueError(f"Unsupported device type: {device_type}")
+        try:
+            manager = self.manager_classes[device_type](self.resources.db, resources=self.resources)
+        except Exception as e:
+            logger.error(f"Failed to initialize {device_type} manager: {str(e)}")
+            raise
+        self._instances[(device_type, shard)] = manager
+        return manager
+
+    def get(self, device_type: str, shard: int = 0) -> BaseModemManager:
+        """Get the manager for a type/shard, creating it on first use"""
+        manager = self._instances.get((device_type, shard))
+        if manager is None:
+            manager = self._create(device_type, shard)
+            if self._started:
+                task = asyncio.get_running_loop().create_task(self._start_manager(manager))
+                self._starting.add(task)
+                task.add_done_callback(self._starting.discard)
+        return manager
+
+    async def _start_manager(self, manager: BaseModemManager):
+        try:
+            await manager.start()
+        except Exception as e:
+            logger.error(f"Manager start error: {str(e)}")
+            return
+        await self._emit('started', manager)
+
+    def manager_for(self, device: Device) -> BaseModemManager:
+        return self.get(device.type, self.shard_for(device))
+
+    def managers(self, device_type: Optional[str] = None) -> Iterable[BaseModemManager]:
+        return [
+            manager for (kind, _), manager in self._instances.items()
+            if device_type is None or kind == device_type
+        ]
+
+    async def start(self):
+        self._started = True
+        for manager in list(self._instances.values()):
+            await self._start_manager(manager)
+
+    async def stop(self):
+        if self._starting:
+            await asyncio.gather(*self._starting, return_exceptions=True)
+        for manager in list(self._instances.values()):
+            try:
+                await manager.stop()
+            except Exception as e:
+                logger.error(f"Manager stop error: {str(e)}")
+            await self._emit('stopped', manager)
+        self._started = False
+        await self.resources.close()
@@ -6,6 +6,7 @@ import asyncio
 
 from .base import BaseModemManager
 from src.models import Device, SMS
+from src.config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -76,59 +77,60 @@ class SierraManager(BaseModemManager):
         """Check for new messages"""
         messages = []
         try:
-            response = await self._send_at_command(device, self.AT_COMMANDS['CHECK_SMS'])
-            if not response:
-                return messages
-                
-            # Parse messages - Sierra format is slightly different
-            for match in re.finditer(r'\+CMGL: (\d+),".*?","(.*?)",.*?,.*?"(.*?)".*?\r\n(.*?)\r\n', 
-                                   response, re.DOTALL):
-                index, sender, timestamp, text = match.groups()
-                
-                message = SMS(
-                    device_id=device.id,
-                    from_number=sender,
-                    to_number=device.phone_number,
-                    text=text.strip(),
-                    received_at=datetime.utcnow(),
-                    delivered=False
-                )
-                messages.append(message)
-                
-                # Delete processed message
-                await self._send_at_command(
-                    device, 
-                    self.AT_COMMANDS['DELETE_SMS'].format(index)
-                )
+            async with self.device_lock(device):
+                response = await self._send_at_command(device, self.AT_COMMANDS['CHECK_SMS'])
+                if not response:
+                    return messages
+                
+                # Parse messages - Sierra format is slightly different
+                for match in re.finditer(r'\+CMGL: (\d+),".*?","(.*?)",.*?,.*?"(.*?)".*?\r\n(.*?)\r\n', 
+                                       response, re.DOTALL):
+                    index, sender, timestamp, text = match.groups()
+                
+                    message = SMS(
+                        device_id=device.id,
+                        from_number=sender,
+                        to_number=device.phone_number,
+                        text=text.strip(),
+                        received_at=datetime.utcnow(),
+                        delivered=False
+                    )
+                    messages.append(message)
+                
+                    # Delete processed message
+                    await self._send_at_command(
+                        device, 
+                        self.AT_COMMANDS['DELETE_SMS'].format(index)
+                    )
                 
-            return messages
+                return messages
             
         except Exception as e:
             logger.error(f"Check messages error: {str(e)}")
-            return messages
+            if messages:
+                return messages
+            raise
 
     async def send_message(self, device: Device, to_number: str, text: str) -> bool:
         """Send SMS message"""
         try:
-            # Start SMS sending
-            response = await self._send_at_command(
-                device,
-                self.AT_COMMANDS['SEND_SMS'].format(to_number)
-            )
-            if not response or '>' not in response:
-                return False
-                
-            # Send message content
-            ser = self._ports.get(device.id)
-            if not ser:
-                return False
+            async with self.device_lock(device):
+                # Start SMS sending
+                response = await self._send_at_command(
+                    device,
+                    self.AT_COMMANDS['SEND_SMS'].format(to_number),
+                    expect=('>', 'ERROR')
+                )
+                if not response or '>' not in response:
+                    return False
                 
-            ser.write(text.encode())
-            ser.write(b'\x1A')  # Ctrl+Z to end message
+                # Send message content, Ctrl+Z to end message
+                if not await self._write(device, text.encode() + b'\x1A'):
+                    return False
             
-            # Wait for confirmation
-            response = await self._send_at_command(device, "", timeout=5)
-            return response and "OK" in response
+                # Wait for the network to accept it (+CMGS: <mr> then OK)
+                response = await self._read_response(device, settings.SMS_SEND_TIMEOUT)
+                return bool(response) and "OK" in response
             
         except Exception as e:
             logger.error(f"Send message error: {str(e)}")
@@ -137,16 +139,17 @@ class SierraManager(BaseModemManager):
     async def get_signal_strength(self, device: Device) -> Optional[int]:
         """Get current signal strength"""
         try:
-            response = await self._send_at_command(device, self.AT_COMMANDS['CHECK_SIGNAL'])
-            if not response:
-                return None
+            async with self.device_lock(device):
+                response = await self._send_at_command(device, self.AT_COMMANDS['CHECK_SIGNAL'])
+                if not response:
+                    return None
                 
-            match = re.search(r'\+CSQ: (\d+),', response)
-            if match:
-                signal = int(match.group(1))
-                return min(signal * 3.226, 100)  # Convert to percentage
+                match = re.search(r'\+CSQ: (\d+),', response)
+                if match:
+                    signal = int(match.group(1))
+                    return min(signal * 3.226, 100)  # Convert to percentage
                 
-            return None
+                return None
             
         except Exception as e:
             logger.error(f"Signal strength error: {str(e)}")
@@ -158,22 +161,23 @@ class SierraManager(BaseModemManager):
             return False
             
         try:
-            # Set bands
-            response = await self._send_at_command(
-                device,
-                self.AT_COMMANDS['SET_BANDS'].format(self.LTE_BANDS[bands])
-            )
-            if not response or "OK" not in response:
-                return False
+            async with self.device_lock(device):
+                # Set bands
+                response = await self._send_at_command(
+                    device,
+                    self.AT_COMMANDS['SET_BANDS'].format(self.LTE_BANDS[bands])
+                )
+                if not response or "OK" not in response:
+                    return False
                 
-            # Reset radio for changes to take effect
-            await self._send_at_command(device, self.AT_COMMANDS['RADIO_OFF'])
-            await asyncio.sleep(1)
-            await self._send_at_command(device, self.AT_COMMANDS['RADIO_ON'])
+                # Reset radio for changes to take effect
+                await self._send_at_command(device, self.AT_COMMANDS['RADIO_OFF'])
+                await asyncio.sleep(1)
+                await self._send_at_command(device, self.AT_COMMANDS['RADIO_ON'])
             
-            # Update device config
-            device.config['current_bands'] = bands
-            return True
+                # Update device config
+                device.config['current_bands'] = bands
+                return True
             
         except Exception as e:
             logger.error(f"Set bands error: {str(e)}")
@@ -182,15 +186,16 @@ class SierraManager(BaseModemManager):
     async def get_temperature(self, device: Device) -> Optional[float]:
         """Get device temperature"""
         try:
-            response = await self._send_at_command(device, self.AT_COMMANDS['GET_TEMP'])
-            if not response:
-                return None
+            async with self.device_lock(device):
+                response = await self._send_at_command(device, self.AT_COMMANDS['GET_TEMP'])
+                if not response:
+                    return None
                 
-            match = re.search(r'(-?\d+\.\d+)', response)
-            if match:
-                return float(match.group(1))
+                match = re.search(r'(-?\d+\.\d+)', response)
+                if match:
+                    return float(match.group(1))
                 
-            return None
+                return None
             
         except Exception as e:
             logger.error(f"Get temperature error: {str(e)}")
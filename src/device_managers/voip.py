@@ -1,23 +1,66 @@
-from typing import List, Optional
+from typing import List, Optional, Dict, Tuple
 import asyncio
 import logging
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
 import aiohttp
 import json
 from urllib.parse import urljoin
 
 from .base import BaseModemManager
+from .provider_pool import ProviderClientPool
 from src.models import Device, SMS
+from src.config import settings
+from src.webhooks import normalize_number, parse_twilio_date
 
 logger = logging.getLogger(__name__)
 
 class VoipManager(BaseModemManager):
-    """Manager for VoIP/SIP SMS services"""
+    """Manager for VoIP/SIP SMS services
+
+    Inbound messages normally arrive through provider webhooks
+    (see src/webhooks.py). Polling is kept as gap recovery only: when a
+    device has `webhook` enabled in its config, `check_messages` sweeps
+    the provider at most every VOIP_GAP_RECOVERY_INTERVAL seconds.
+
+    All devices on the same provider account share one rate-limited
+    client from the ProviderClientPool.
+    """
+
+    API_BASES = {
+        'twilio': 'https://api.twilio.com',
+        'nexmo': 'https://rest.nexmo.com',
+        'plivo': 'https://api.plivo.com'
+    }
     
-    def __init__(self, db):
-        super().__init__(db)
-        self._sessions = {}
+    def __init__(self, db, resources=None, pool: Optional[ProviderClientPool] = None):
+        super().__init__(db, resources)
+        if pool is None:
+            pool = resources.provider_pool if resources else ProviderClientPool()
+        self.pool = pool
+        self._sessions = {}  # device id -> shared ProviderClient
         self._api_tokens = {}
+        self._numbers: Dict[Tuple[str, str], Device] = {}  # (service, normalized number) -> device
+        self._last_sweep: Dict[str, float] = {}
+
+    def _api_base(self, device: Device) -> str:
+        """Provider API root, overridable per device (e.g. for a local stand-in)"""
+        service_type = device.config.get('service_type')
+        return device.config.get('api_base', self.API_BASES.get(service_type, '')).rstrip('/')
+
+    def find_device(self, service_type: str, phone_number: Optional[str]) -> Optional[Device]:
+        """Resolve the device owning a provider number (used by webhooks)"""
+        number = normalize_number(phone_number)
+        if not number:
+            return None
+        return self._numbers.get((service_type, number))
+
+    def _should_poll(self, device: Device) -> bool:
+        """Polling only runs as periodic gap recovery once webhooks are on"""
+        if not device.config.get('webhook'):
+            return True
+        last = self._last_sweep.get(device.id)
+        return last is None or time.monotonic() - last >= settings.VOIP_GAP_RECOVERY_INTERVAL
 
     async def _initialize_modem(self, device: Device) -> bool:
         """Initialize VoIP service connection"""
@@ -30,14 +73,18 @@ class VoipManager(BaseModemManager):
 
             # Initialize service-specific client
             if service_type == 'twilio':
-                return await self._initialize_twilio(device)
+                initialized = await self._initialize_twilio(device)
             elif service_type == 'nexmo':
-                return await self._initialize_nexmo(device)
+                initialized = await self._initialize_nexmo(device)
             elif service_type == 'plivo':
-                return await self._initialize_plivo(device)
+                initialized = await self._initialize_plivo(device)
             else:
                 logger.error(f"Unsupported VoIP service type: {service_type}")
                 return False
+
+            if initialized:
+                self._numbers[(service_type, normalize_number(device.phone_number))] = device
+            return initialized
                 
         except Exception as e:
             logger.error(f"VoIP initialization error: {str(e)}")
@@ -53,18 +100,10 @@ class VoipManager(BaseModemManager):
                 logger.error("Twilio credentials not provided")
                 return False
 
-            # Create session for API calls
-            auth = aiohttp.BasicAuth(account_sid, auth_token)
-            session = aiohttp.ClientSession(auth=auth)
-            self._sessions[device.id] = session
-
-            # Test authentication
-            async with session.get(
-                f"https://api.twilio.com/2010-04-01/Accounts/{account_sid}.json"
-            ) as response:
-                if response.status != 200:
-                    logger.error("Twilio authentication failed")
-                    return False
+            url = f"{self._api_base(device)}/2010-04-01/Accounts/{account_sid}.json"
+            if not await self._connect(device, 'twilio', account_sid, auth_token, url):
+                logger.error("Twilio authentication failed")
+                return False
 
             return True
             
@@ -72,10 +111,87 @@ class VoipManager(BaseModemManager):
             logger.error(f"Twilio initialization error: {str(e)}")
             return False
 
+    async def _initialize_nexmo(self, device: Device) -> bool:
+        """Initialize Nexmo (Vonage) client"""
+        try:
+            api_key = device.config.get('api_key')
+            api_secret = device.config.get('api_secret')
+
+            if not (api_key and api_secret):
+                logger.error("Nexmo credentials not provided")
+                return False
+
+            # Nexmo authenticates with query/form parameters, not basic auth
+            url = f"{self._api_base(device)}/account/get-balance"
+            params = {'api_key': api_key, 'api_secret': api_secret}
+            if not await self._connect(device, 'nexmo', api_key, api_secret, url,
+                                       basic_auth=False, params=params):
+                logger.error("Nexmo authentication failed")
+                return False
+
+            return True
+
+        except Exception as e:
+            logger.error(f"Nexmo initialization error: {str(e)}")
+            return False
+
+    async def _initialize_plivo(self, device: Device) -> bool:
+        """Initialize Plivo client"""
+        try:
+            auth_id = device.config.get('auth_id')
+            auth_token = device.config.get('auth_token')
+
+            if not (auth_id and auth_token):
+                logger.error("Plivo credentials not provided")
+                return False
+
+            url = f"{self._api_base(device)}/v1/Account/{auth_id}/"
+            if not await self._connect(device, 'plivo', auth_id, auth_token, url):
+                logger.error("Plivo authentication failed")
+                return False
+
+            return True
+
+        except Exception as e:
+            logger.error(f"Plivo initialization error: {str(e)}")
+            return False
+
+    async def _connect(self, device: Device, provider: str, account_id: str, secret: str,
+                       url: str, basic_auth: bool = True, **kwargs) -> bool:
+        """Take a reference on the account's shared client, testing auth once per account
+
+        The reference is only kept when authentication succeeds, so failed
+        initializations retried by the supervisor don't leak clients.
+        """
+        previous = self._sessions.pop(device.id, None)
+        if previous:
+            await self.pool.release(previous)
+        client = self.pool.acquire(provider, account_id, secret, basic_auth=basic_auth)
+        authenticated = False
+        try:
+            authenticated = await client.coalesce(
+                'auth', lambda: self._check_auth(client, url, **kwargs),
+                ttl=settings.VOIP_ACCOUNT_CACHE_TTL
+            )
+        finally:
+            if authenticated:
+                self._sessions[device.id] = client
+            else:
+                await self.pool.release(client)
+        return authenticated
+
+    @staticmethod
+    async def _check_auth(client, url: str, **kwargs) -> bool:
+        async with client.get(url, **kwargs) as response:
+            return response.status == 200
+
     async def check_messages(self, device: Device) -> List[SMS]:
         """Check for new messages from VoIP service"""
         messages = []
         try:
+            if not self._should_poll(device):
+                return messages
+
             service_type = device.config.get('service_type')
             if service_type == 'twilio':
                 messages = await self._check_twilio_messages(device)
@@ -83,55 +199,139 @@ class VoipManager(BaseModemManager):
                 messages = await self._check_nexmo_messages(device)
             elif service_type == 'plivo':
                 messages = await self._check_plivo_messages(device)
-                
+
+            self._last_sweep[device.id] = time.monotonic()
             return messages
             
         except Exception as e:
+            # Raised so the supervisor counts it; the sweep is retried next poll
             logger.error(f"Check messages error: {str(e)}")
-            return messages
+            raise
 
     async def _check_twilio_messages(self, device: Device) -> List[SMS]:
-        """Check for new Twilio messages"""
+        """Check for new Twilio messages
+
+        Only inbound messages to this device's number are requested and
+        every page is followed, so a sweep costs O(new messages) rather
+        than O(account history).
+        """
         messages = []
         try:
-            session = self._sessions.get(device.id)
-            if not session:
-                return messages
+            client = self._sessions.get(device.id)
+            if not client:
+                raise IOError(f"No provider client for {device.id}")
 
             account_sid = device.config.get('account_sid')
-            last_check = device.config.get('last_check', datetime.utcnow().isoformat())
-
-            # Get messages since last check
-            url = (
-                f"https://api.twilio.com/2010-04-01/Accounts/{account_sid}/Messages.json"
-                f"?DateSent>={last_check}"
+            last_check = device.config.get('last_check')
+            since = (
+                datetime.fromisoformat(last_check) if last_check
+                else datetime.utcnow()
             )
-            
-            async with session.get(url) as response:
-                if response.status != 200:
-                    return messages
-                    
-                data = await response.json()
+            sweep_started = datetime.utcnow()
+
+            base = self._api_base(device)
+            url = f"{base}/2010-04-01/Accounts/{account_sid}/Messages.json"
+            params = {
+                'To': device.phone_number,
+                # Twilio filters on whole days; finer filtering happens below
+                'DateSent>': since.strftime('%Y-%m-%d'),
+                'PageSize': settings.VOIP_POLL_PAGE_SIZE
+            }
+
+            while url:
+                async with client.get(url, params=params) as response:
+                    if response.status != 200:
+                        raise IOError(f"Message list returned HTTP {response.status}")
+                    data = await response.json()
+
                 for msg in data.get('messages', []):
-                    if msg['direction'] == 'inbound':
-                        message = SMS(
-                            device_id=device.id,
-                            from_number=msg['from'],
-                            to_number=msg['to'],
-                            text=msg['body'],
-                            received_at=datetime.fromisoformat(msg['date_created']),
-                            delivered=False
-                        )
-                        messages.append(message)
+                    if msg.get('direction') != 'inbound':
+                        continue
+                    received_at = parse_twilio_date(
+                        msg.get('date_sent') or msg['date_created']
+                    )
+                    # date_sent has whole-second resolution; ingest drops repeats
+                    if received_at < since - timedelta(seconds=1):
+                        continue
+                    messages.append(SMS(
+                        device_id=device.id,
+                        from_number=msg['from'],
+                        to_number=msg['to'],
+                        text=msg['body'],
+                        received_at=received_at,
+                        delivered=False,
+                        external_id=f"twilio:{msg['sid']}"
+                    ))
+
+                next_page = data.get('next_page_uri')
+                url = f"{base}{next_page}" if next_page else None
+                params = None  # next_page_uri already carries the query
 
             # Update last check time
-            device.config['last_check'] = datetime.utcnow().isoformat()
+            device.config['last_check'] = sweep_started.isoformat()
             return messages
             
         except Exception as e:
             logger.error(f"Check Twilio messages error: {str(e)}")
+            raise
+
+    async def _check_nexmo_messages(self, device: Device) -> List[SMS]:
+        """Nexmo has no inbound message search; delivery is webhook-only"""
+        return []
+
+    async def _check_plivo_messages(self, device: Device) -> List[SMS]:
+        """Check for new Plivo messages"""
+        messages = []
+        try:
+            client = self._sessions.get(device.id)
+            if not client:
+                raise IOError(f"No provider client for {device.id}")
+
+            auth_id = device.config.get('auth_id')
+            last_check = device.config.get('last_check', datetime.utcnow().isoformat())
+            sweep_started = datetime.utcnow()
+
+            base = self._api_base(device)
+            url = f"{base}/v1/Account/{auth_id}/Message/"
+            params = {
+                'message_direction': 'inbound',
+                'message_time__gte': last_check.replace('T', ' '),
+                'limit': min(settings.VOIP_POLL_PAGE_SIZE, 20),  # Plivo's max page size
+                'offset': 0
+            }
+
+            while url:
+                async with client.get(url, params=params) as response:
+                    if response.status != 200:
+                        raise IOError(f"Message list returned HTTP {response.status}")
+                    data = await response.json()
+
+                for msg in data.get('objects', []):
+                    if normalize_number(msg.get('to_number')) != normalize_number(device.phone_number):
+                        continue
+                    messages.append(SMS(
+                        device_id=device.id,
+                        from_number=msg['from_number'],
+                        to_number=msg['to_number'],
+                        text=msg.get('message_text', ''),
+                        received_at=datetime.fromisoformat(
+                            msg['message_time'].split('+')[0]
+                        ),
+                        delivered=False,
+                        external_id=f"plivo:{msg['message_uuid']}"
+                    ))
+
+                next_page = (data.get('meta') or {}).get('next')
+                url = f"{base}{next_page}" if next_page else None
+                params = None
+
+            device.config['last_check'] = sweep_started.isoformat()
             return messages
 
+        except Exception as e:
+            logger.error(f"Check Plivo messages error: {str(e)}")
+            raise
+
     async def send_message(self, device: Device, to_number: str, text: str) -> bool:
         """Send message through VoIP service"""
         try:
@@ -152,27 +352,74 @@ class VoipManager(BaseModemManager):
     async def _send_twilio_message(self, device: Device, to_number: str, text: str) -> bool:
         """Send message through Twilio"""
         try:
-            session = self._sessions.get(device.id)
-            if not session:
+            client = self._sessions.get(device.id)
+            if not client:
                 return False
 
             account_sid = device.config.get('account_sid')
             from_number = device.phone_number
 
-            url = f"https://api.twilio.com/2010-04-01/Accounts/{account_sid}/Messages.json"
+            url = f"{self._api_base(device)}/2010-04-01/Accounts/{account_sid}/Messages.json"
             payload = {
                 'To': to_number,
                 'From': from_number,
                 'Body': text
             }
             
-            async with session.post(url, data=payload) as response:
+            async with client.post(url, data=payload) as response:
                 return response.status == 201
                 
         except Exception as e:
             logger.error(f"Send Twilio message error: {str(e)}")
             return False
 
+    async def _send_nexmo_message(self, device: Device, to_number: str, text: str) -> bool:
+        """Send message through Nexmo"""
+        try:
+            client = self._sessions.get(device.id)
+            if not client:
+                return False
+
+            payload = {
+                'api_key': device.config.get('api_key'),
+                'api_secret': device.config.get('api_secret'),
+                'from': device.phone_number.lstrip('+'),
+                'to': to_number.lstrip('+'),
+                'text': text
+            }
+
+            async with client.post(f"{self._api_base(device)}/sms/json", data=payload) as response:
+                if response.status != 200:
+                    return False
+                data = await response.json()
+                return all(m.get('status') == '0' for m in data.get('messages', [{}]))
+
+        except Exception as e:
+            logger.error(f"Send Nexmo message error: {str(e)}")
+            return False
+
+    async def _send_plivo_message(self, device: Device, to_number: str, text: str) -> bool:
+        """Send message through Plivo"""
+        try:
+            client = self._sessions.get(device.id)
+            if not client:
+                return False
+
+            auth_id = device.config.get('auth_id')
+            url = f"{self._api_base(device)}/v1/Account/{auth_id}/Message/"
+            payload = {
+                'src': device.phone_number,
+                'dst': to_number,
+                'text': text
+            }
+
+            async with client.post(url, json=payload) as response:
+                return response.status == 202
+
+        except Exception as e:
+            logger.error(f"Send Plivo message error: {str(e)}")
+            return False
+
     async def get_signal_strength(self, device: Device) -> Optional[int]:
         """VoIP services don't have signal strength"""
         return None
@@ -180,9 +427,13 @@ class VoipManager(BaseModemManager):
     async def cleanup(self, device: Device):
         """Cleanup VoIP service resources"""
         try:
-            session = self._sessions.pop(device.id, None)
-            if session:
-                await session.close()
+            client = self._sessions.pop(device.id, None)
+            if client:
+                await self.pool.release(client)
+            self._numbers.pop(
+                (device.config.get('service_type'), normalize_number(device.phone_number)), None
+            )
+            self._last_sweep.pop(device.id, None)
             await super().cleanup(device)
         except Exception as e:
             logger.error(f"Cleanup error: {str(e)}")
@@ -202,22 +453,28 @@ class VoipManager(BaseModemManager):
             return None
 
     async def _get_twilio_balance(self, device: Device) -> Optional[float]:
-        """Get Twilio account balance"""
+        """Get Twilio account balance
+
+        Balance is per account, so concurrent and recent requests from any
+        number on the account share a single API call.
+        """
         try:
-            session = self._sessions.get(device.id)
-            if not session:
+            client = self._sessions.get(device.id)
+            if not client:
                 return None
 
             account_sid = device.config.get('account_sid')
-            url = f"https://api.twilio.com/2010-04-01/Accounts/{account_sid}/Balance.json"
-            
-            async with session.get(url) as response:
-                if response.status != 200:
-                    return None
-                    
-                data = await response.json()
-                return float(data.get('balance', 0))
+            url = f"{self._api_base(device)}/2010-04-01/Accounts/{account_sid}/Balance.json"
+
+            async def fetch() -> Optional[float]:
+                async with client.get(url) as response:
+                    if response.status != 200:
+                        return None
+                    data = await response.json()
+                    return float(data.get('balance', 0))
+
+            return await client.coalesce('balance', fetch, ttl=settings.VOIP_ACCOUNT_CACHE_TTL)
                 
         except Exception as e:
             logger.error(f"Get Twilio balance error: {str(e)}")
-            return None
\ No newline at end of file
+            return None
@@ -0,0 +1,245 @@
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from src import serialization
+
+FIELDS = ('id', 'type', 'phone_number', 'sim_iccid', 'signal_strength', 'status',
+          'first_seen', 'last_seen', 'port', 'config')
+# Fields with a secondary index; DeviceRegistry.find on these never scans
+INDEXED = ('type', 'status', 'phone_number', 'sim_iccid', 'port')
+
+class DeviceConfig(dict):
+    """A device's config; changing it in place counts as a change to the device
+
+    Managers record things like `last_check` or `current_bands` straight
+    into device.config, which would otherwise leave the cached JSON stale.
+    """
+
+    __slots__ = ('_owner',)
+
+    def __init__(self, owner: "DeviceEntry", data: Dict[str, Any]):
+        super().__init__(data)
+        self._owner = owner
+
+    def __reduce__(self):
+        # Copies and pickles are plain dicts, detached from the device
+        return (dict, (dict(self),))
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._owner._changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._owner._changed()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._owner._changed()
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        self[key] = default
+        return default
+
+    def pop(self, key, *default):
+        value = super().pop(key, *default)
+        self._owner._changed()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self._owner._changed()
+        return item
+
+    def clear(self):
+        super().clear()
+        self._owner._changed()
+
+class DeviceEntry:
+    """A live device, shared by the supervisor, managers and outbound lanes
+
+    Same attributes as src.models.Device but without validation on
+    construction or assignment; request bodies are validated by the
+    pydantic model before they get here. Assigning an indexed field of a
+    registered entry keeps the registry's indexes current; assigning any
+    field, or changing config in place (see DeviceConfig), drops the cached
+    JSON encoding.
+    """
+
+    __slots__ = FIELDS + ('_registry', '_json')
+
+    def __init__(self, id: str, type: str, phone_number: str, sim_iccid: Optional[str] = None,
+                 signal_strength: Optional[int] = None, status: str = "offline",
+                 first_seen: Optional[datetime] = None, last_seen: Optional[datetime] = None,
+                 port: Optional[str] = None, config: Optional[Dict[str, Any]] = None):
+        object.__setattr__(self, '_registry', None)
+        object.__setattr__(self, '_json', None)
+        now = datetime.utcnow()
+        self.id = id
+        self.type = type
+        self.phone_number = phone_number
+        self.sim_iccid = sim_iccid
+        self.signal_strength = signal_strength
+        self.status = status
+        self.first_seen = first_seen or now
+        self.last_seen = last_seen or now
+        self.port = port
+        self.config = config if config is not None else {}
+
+    @classmethod
+    def from_model(cls, source) -> "DeviceEntry":
+        """Copy a pydantic Device or a database row"""
+        if isinstance(source, cls):
+            return source
+        return cls(**{field: getattr(source, field, None) for field in FIELDS})
+
+    def __setattr__(self, name: str, value):
+        if name == 'config':
+            value = DeviceConfig(self, value or {})
+        object.__setattr__(self, '_json', None)
+        registry = self._registry
+        if registry is None:
+            object.__setattr__(self, name, value)
+            return
+        if name in INDEXED:
+            old = getattr(self, name, None)
+            object.__setattr__(self, name, value)
+            if old != value:
+                registry._reindex(self, name, old, value)
+        else:
+            object.__setattr__(self, name, value)
+        registry.version += 1
+
+    def _changed(self):
+        object.__setattr__(self, '_json', None)
+        if self._registry is not None:
+            self._registry.version += 1
+
+    def dict(self) -> Dict[str, Any]:
+        """Same shape as Device.dict(), for responses and WebSocket events"""
+        data = {field: getattr(self, field) for field in FIELDS}
+        data['config'] = dict(self.config or {})
+        return data
+
+    def json_bytes(self) -> bytes:
+        """dict() as JSON, encoded once until the next assignment"""
+        encoded = self._json
+        if encoded is None:
+            encoded = serialization.dumps(self.dict())
+            object.__setattr__(self, '_json', encoded)
+        return encoded
+
+    def __repr__(self) -> str:
+        return f"DeviceEntry(id={self.id!r}, type={self.type!r}, status={self.status!r})"
+
+class DeviceRegistry:
+    """Devices this worker runs, by id and by every field in INDEXED
+
+    Buckets are insertion-ordered dicts so results come back in the order
+    devices were added. `snapshot_json` serializes the registry once per
+    change rather than once per status request, and only re-encodes the
+    devices that changed.
+    """
+
+    def __init__(self):
+        self._devices: Dict[str, DeviceEntry] = {}
+        self._indexes: Dict[str, Dict[Any, Dict[str, DeviceEntry]]] = {
+            field: {} for field in INDEXED
+        }
+        self.version = 0
+        self._snapshot_json: Optional[bytes] = None
+        self._snapshot_json_version = -1
+
+    def __len__(self) -> int:
+        return len(self._devices)
+
+    def __contains__(self, device_id: str) -> bool:
+        return device_id in self._devices
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._devices)
+
+    def get(self, device_id: str) -> Optional[DeviceEntry]:
+        return self._devices.get(device_id)
+
+    def values(self) -> List[DeviceEntry]:
+        return list(self._devices.values())
+
+    def add(self, device) -> DeviceEntry:
+        """Register a device (any object with Device's fields), replacing one with the same id"""
+        entry = DeviceEntry.from_model(device)
+        if entry._registry is not None and entry._registry is not self:
+            raise ValueError(f"Device {entry.id} belongs to another registry")
+        self.pop(entry.id)
+        self._devices[entry.id] = entry
+        for field in INDEXED:
+            self._bucket(field, getattr(entry, field))[entry.id] = entry
+        object.__setattr__(entry, '_registry', self)
+        self.version += 1
+        return entry
+
+    def pop(self, device_id: str, default=None) -> Optional[DeviceEntry]:
+        entry = self._devices.pop(device_id, None)
+        if entry is None:
+            return default
+        for field in INDEXED:
+            self._discard(field, getattr(entry, field), device_id)
+        object.__setattr__(entry, '_registry', None)
+        self.version += 1
+        return entry
+
+    def find(self, **criteria) -> List[DeviceEntry]:
+        """Devices matching every criterion, e.g. find(type="voip", status="online")"""
+        if not criteria:
+            return self.values()
+        buckets = []
+        for field, value in criteria.items():
+            if field not in self._indexes:
+                raise ValueError(f"Not an indexed device field: {field}")
+            bucket = self._indexes[field].get(value)
+            if not bucket:
+                return []
+            buckets.append(bucket)
+        smallest = min(buckets, key=len)
+        return [
+            entry for device_id, entry in smallest.items()
+            if all(device_id in bucket for bucket in buckets)
+        ]
+
+    def first(self, **criteria) -> Optional[DeviceEntry]:
+        """One device matching the criteria, for unique fields like phone_number"""
+        found = self.find(**criteria)
+        return found[0] if found else None
+
+    def counts(self, field: str) -> Dict[Any, int]:
+        """Number of devices per value of an indexed field"""
+        return {value: len(bucket) for value, bucket in self._indexes[field].items()}
+
+    def snapshot_json(self) -> bytes:
+        """Every device as a JSON array, built from each device's cached encoding"""
+        if self._snapshot_json is None or self._snapshot_json_version != self.version:
+            self._snapshot_json = b"[" + b",".join(
+                entry.json_bytes() for entry in self._devices.values()
+            ) + b"]"
+            self._snapshot_json_version = self.version
+        return self._snapshot_json
+
+    def _bucket(self, field: str, value) -> Dict[str, DeviceEntry]:
+        return self._indexes[field].setdefault(value, {})
+
+    def _discard(self, field: str, value, device_id: str):
+        bucket = self._indexes[field].get(value)
+        if bucket is not None:
+            bucket.pop(device_id, None)
+            if not bucket:
+                del self._indexes[field][value]
+
+    def _reindex(self, entry: DeviceEntry, field: str, old, new):
+        self._discard(field, old, entry.id)
+        self._bucket(field, new)[entry.id] = entry
@@ -0,0 +1,56 @@
+import csv
+import io
+import zlib
+from typing import AsyncIterator, Iterable, List, Type
+
+from pydantic import BaseModel
+
+from src.serialization import dumps, records
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv"
+}
+
+def _ndjson(model: Type[BaseModel], rows: Iterable) -> bytes:
+    # Rows come from the database and already match the model; skip validation
+    return b"".join(dumps(record) + b"\n" for record in records(rows, model))
+
+def _csv(model: Type[BaseModel], rows: Iterable, header: bool) -> str:
+    fields = list(model.__fields__)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(fields)
+    for record in records(rows, model):
+        writer.writerow([
+            value.isoformat() if hasattr(value, "isoformat") else value
+            for value in (record[field] for field in fields)
+        ])
+    return buffer.getvalue()
+
+async def encode(batches: AsyncIterator[List], model: Type[BaseModel],
+                 format: str) -> AsyncIterator[bytes]:
+    """One chunk of NDJSON or CSV per batch of ORM rows"""
+    if format not in FORMATS:
+        raise ValueError(f"Unknown export format: {format}")
+    first = True
+    async for batch in batches:
+        if format == "csv":
+            chunk = _csv(model, batch, header=first).encode()
+        else:
+            chunk = _ndjson(model, batch)
+        first = False
+        yield chunk
+    if first and format == "csv":
+        # Nothing matched; still a valid CSV file
+        yield _csv(model, [], header=True).encode()
+
+async def gzipped(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Compress a byte stream into a single gzip member as it goes"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,277 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Set, Tuple
+
+from src.models import SMS
+from src.database.manager import hour_bucket
+from src.database.models import Message
+from src.config import settings
+from src.metrics import (
+    DB_FLUSH_ROWS,
+    INGEST_TO_FORWARD_SECONDS,
+    SMSHUB_PUSH_ERRORS,
+    SMSHUB_PUSH_SECONDS
+)
+from src.tracing import ACKED, PERSISTED, PUSHED, QUEUED, SMSTrace, tracker
+
+logger = logging.getLogger(__name__)
+
+class MessageIngest:
+    """Single entry point for inbound SMS.
+
+    Device managers (polling) and provider webhooks both submit messages
+    here; worker tasks persist each message and forward it to SMSHUB.
+    Messages carrying a provider id are de-duplicated so a webhook delivery
+    and a later gap-recovery poll never produce two rows: in memory first,
+    then by the message_ids table, which holds across restarts and workers.
+    Each worker takes whatever is queued (up to INGEST_BATCH_SIZE) and
+    writes it in one flush. A batch that can't be stored is queued again
+    after INGEST_REQUEUE_DELAY seconds rather than dropped.
+    """
+
+    def __init__(self, db, smshub, maxsize: int = None, workers: int = None,
+                 dedupe_size: int = None):
+        self.db = db
+        self.smshub = smshub
+        self.maxsize = maxsize or settings.INGEST_QUEUE_SIZE
+        self.worker_count = workers or settings.INGEST_WORKERS
+        self.dedupe_size = dedupe_size or settings.INGEST_DEDUPE_SIZE
+        self.batch_size = settings.INGEST_BATCH_SIZE
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=self.maxsize)
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self._workers: List[asyncio.Task] = []
+        self._requeues: Set[asyncio.Task] = set()
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def seen(self, external_id: str) -> bool:
+        """Check whether a provider message id was already ingested"""
+        return external_id in self._seen
+
+    def _remember(self, external_id: str) -> bool:
+        """Record a provider message id, returning False if already known"""
+        if external_id in self._seen:
+            self._seen.move_to_end(external_id)
+            return False
+        self._seen[external_id] = None
+        if len(self._seen) > self.dedupe_size:
+            self._seen.popitem(last=False)
+        return True
+
+    @staticmethod
+    def _mark_queued(sms: SMS) -> SMS:
+        if sms.trace is None:
+            sms.trace = SMSTrace("unknown")
+        sms.trace.mark(QUEUED)
+        return sms
+
+    def submit(self, sms: SMS) -> bool:
+        """Enqueue an inbound SMS, returning False for duplicates"""
+        if sms.external_id and not self._remember(sms.external_id):
+            return False
+        try:
+            self._queue.put_nowait(self._mark_queued(sms))
+        except asyncio.QueueFull:
+            # Let the provider retry (webhooks) or the next poll pick it up
+            if sms.external_id:
+                self._seen.pop(sms.external_id, None)
+            raise
+        return True
+
+    def submit_many(self, messages: List[SMS]) -> int:
+        """Enqueue several messages, returning how many were accepted"""
+        return sum(1 for sms in messages if self.submit(sms))
+
+    async def put_many(self, messages: List[SMS]) -> int:
+        """Enqueue messages, waiting for queue space
+
+        Used by pollers: the messages are already gone from the device,
+        so back-pressure is preferable to dropping them.
+        """
+        accepted = 0
+        for sms in messages:
+            if sms.external_id and not self._remember(sms.external_id):
+                continue
+            await self._queue.put(self._mark_queued(sms))
+            accepted += 1
+        return accepted
+
+    async def start(self):
+        """Start ingest workers"""
+        if self._workers:
+            return
+        for i in range(self.worker_count):
+            self._workers.append(
+                asyncio.create_task(self._worker(), name=f"ingest-{i}")
+            )
+        if settings.INGEST_RETRY_INTERVAL > 0:
+            self._workers.append(
+                asyncio.create_task(self._retry_failed(), name="ingest-retry")
+            )
+        if settings.INGEST_DEDUPE_RETENTION_DAYS > 0:
+            self._workers.append(
+                asyncio.create_task(self._prune_ids(), name="ingest-prune")
+            )
+
+    async def stop(self):
+        """Drain the queue and stop workers"""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=10)
+        except asyncio.TimeoutError:
+            logger.warning(f"Ingest stopped with {self.depth} messages queued")
+        if self._requeues:
+            logger.warning(f"Ingest stopped with {len(self._requeues)} batches waiting to be stored")
+        tasks = self._workers + list(self._requeues)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+
+    async def _worker(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._process(batch)
+            except Exception as e:
+                logger.error(f"Ingest error for {len(batch)} messages: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _requeue_later(self, batch: List[SMS]):
+        """Queue a batch again after INGEST_REQUEUE_DELAY; its messages exist nowhere else"""
+        # Not stored, so a provider redelivery in the meantime must not count as a duplicate
+        for sms in batch:
+            if sms.external_id:
+                self._seen.pop(sms.external_id, None)
+        task = asyncio.create_task(self._requeue(batch))
+        self._requeues.add(task)
+        task.add_done_callback(self._requeues.discard)
+
+    async def _requeue(self, batch: List[SMS]):
+        await asyncio.sleep(settings.INGEST_REQUEUE_DELAY)
+        await self.put_many(batch)
+
+    async def _process(self, batch: List[SMS]) -> List[Message]:
+        """Persist a batch of messages and forward them to SMSHUB"""
+        rows = [
+            Message(
+                device_id=sms.device_id,
+                from_number=sms.from_number,
+                to_number=sms.to_number,
+                text=sms.text,
+                received_at=sms.received_at,
+                external_id=sms.external_id,
+                status="pending"
+            )
+            for sms in batch
+        ]
+        try:
+            messages = await self.db.add_messages(rows)
+        except Exception:
+            self._requeue_later(batch)
+            raise
+        if len(messages) < len(rows):
+            # Provider ids already stored, e.g. by another worker before a restart
+            added = set(map(id, messages))
+            batch = [sms for sms, row in zip(batch, rows) if id(row) in added]
+            if not batch:
+                return messages
+        persisted = time.monotonic()
+        DB_FLUSH_ROWS.observe(len(messages))
+        for sms in batch:
+            sms.trace.mark(PERSISTED, persisted)
+
+        results = await asyncio.gather(*(
+            self._push(message, sms.trace) for message, sms in zip(messages, batch)
+        ))
+
+        for sms in batch:
+            INGEST_TO_FORWARD_SECONDS.observe(
+                (sms.trace.marks[ACKED] or time.monotonic()) - sms.trace.marks[QUEUED]
+            )
+        tracker.record_many(sms.trace for sms in batch)
+
+        await self._record_results(messages, results, received=True)
+        return messages
+
+    @staticmethod
+    def _counts(messages: List[Message], results: List[bool],
+                received: bool) -> Dict[Tuple[str, datetime], Dict]:
+        """Hourly counter increments, bucketed by when each message was received"""
+        counts = {}
+        for message, ok in zip(messages, results):
+            if not message.device_id:
+                continue
+            received_at = message.received_at or datetime.utcnow()
+            bucket = counts.setdefault((message.device_id, hour_bucket(received_at)), {
+                "received": 0, "delivered": 0, "failed": 0, "last_message": received_at
+            })
+            bucket["received"] += received
+            bucket["delivered" if ok else "failed"] += 1
+            bucket["last_message"] = max(bucket["last_message"], received_at)
+        return counts
+
+    async def _record_results(self, messages: List[Message], results: List[bool],
+                              received: bool = False):
+        delivered = [m.id for m, ok in zip(messages, results) if ok]
+        failed = [m.id for m, ok in zip(messages, results) if not ok]
+        async with self.db.unit_of_work() as session:
+            if delivered:
+                await self.db.update_message_statuses(delivered, "delivered", session=session)
+            if failed:
+                await self.db.schedule_retries(failed, "SMSHUB push failed", session=session)
+            # Same transaction, so counters never drift from the rows they summarise
+            await self.db.add_message_counts(
+                self._counts(messages, results, received), session=session
+            )
+
+    async def _retry_failed(self):
+        """Re-forward messages whose SMSHUB push failed once their backoff expires"""
+        while True:
+            await asyncio.sleep(settings.INGEST_RETRY_INTERVAL)
+            try:
+                messages = await self.db.claim_due_retries(self.batch_size)
+                if not messages:
+                    continue
+                results = await asyncio.gather(*(
+                    self._push(message, SMSTrace("retry")) for message in messages
+                ))
+                await self._record_results(messages, results)
+            except Exception as e:
+                logger.error(f"Ingest retry error: {str(e)}")
+
+    async def _prune_ids(self):
+        """Drop stored provider ids past INGEST_DEDUPE_RETENTION_DAYS, hourly"""
+        while True:
+            await asyncio.sleep(3600)
+            try:
+                before = datetime.utcnow() - timedelta(days=settings.INGEST_DEDUPE_RETENTION_DAYS)
+                await self.db.prune_message_ids(before)
+            except Exception as e:
+                logger.error(f"Message id pruning error: {str(e)}")
+
+    async def _push(self, message: Message, trace: SMSTrace) -> bool:
+        trace.mark(PUSHED)
+        try:
+            delivered = await self.smshub.push_sms(
+                message.id, message.to_number, message.from_number, message.text
+            )
+        except Exception as e:
+            logger.error(f"SMSHUB push error: {str(e)}")
+            SMSHUB_PUSH_ERRORS.labels("error").inc()
+            return False
+        finally:
+            SMSHUB_PUSH_SECONDS.observe(time.monotonic() - trace.marks[PUSHED])
+        if not delivered:
+            SMSHUB_PUSH_ERRORS.labels("rejected").inc()
+            return False
+        trace.mark(ACKED)
+        return True
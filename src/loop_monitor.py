@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Tuple
+
+from src.config import settings
+from src.metrics import EVENT_LOOP_LAG_SECONDS, SLOW_CALLBACK_SECONDS
+
+logger = logging.getLogger(__name__)
+
+Stack = Tuple[str, ...]
+
+class _Stall:
+    """One callback that kept the loop busy past the threshold"""
+
+    __slots__ = ('started', 'wall_started', 'duration', 'stacks')
+
+    def __init__(self, started: float):
+        self.started = started
+        self.wall_started = datetime.utcnow()
+        self.duration = 0.0
+        self.stacks: Counter = Counter()
+
+    def to_dict(self) -> Dict:
+        return {
+            "started_at": self.wall_started.isoformat(),
+            "duration_ms": round(self.duration * 1000, 1),
+            # Most-sampled stack first: that is where the time went
+            "stacks": [
+                {"samples": count, "stack": list(stack)}
+                for stack, count in self.stacks.most_common()
+            ]
+        }
+
+class LoopMonitor:
+    """Watchdog for event-loop lag and callbacks that block the loop
+
+    A ticker on the loop wakes every `interval` seconds and records how late
+    it woke (scheduling lag). A daemon thread watches the ticker's
+    heartbeat; once it is `threshold` seconds overdue the loop is stuck in
+    one callback, and the thread samples that callback's stack until the
+    loop gets going again. Blocking serial/ADB calls made directly on the
+    loop show up here with the offending line on top of the stack.
+    """
+
+    def __init__(self, interval: float = None, threshold: float = None,
+                 history: int = None, sample_interval: float = None):
+        self.interval = interval or settings.LOOP_MONITOR_INTERVAL
+        self.threshold = threshold or settings.LOOP_SLOW_CALLBACK_THRESHOLD
+        self.sample_interval = sample_interval or settings.LOOP_STACK_SAMPLE_INTERVAL
+        self.slow_callbacks: Deque[_Stall] = deque(maxlen=history or settings.LOOP_SLOW_CALLBACK_HISTORY)
+        self.slow_total = 0
+        self._lags: Deque[float] = deque(maxlen=600)
+        self._beat = 0.0
+        self._loop_thread: Optional[int] = None
+        self._ticker: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    async def start(self):
+        if self._ticker:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopping.clear()
+        self._ticker = asyncio.create_task(self._tick(), name="loop-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stopping.set()
+        if self._ticker:
+            self._ticker.cancel()
+            await asyncio.gather(self._ticker, return_exceptions=True)
+            self._ticker = None
+        if self._watchdog:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _tick(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            lag = max(0.0, now - started - self.interval)
+            self._lags.append(lag)
+            EVENT_LOOP_LAG_SECONDS.observe(lag)
+
+    def _sample_stack(self) -> Optional[Stack]:
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return None
+        return tuple(
+            f"{entry.filename}:{entry.lineno} in {entry.name}"
+            for entry in traceback.extract_stack(frame, limit=settings.LOOP_STACK_DEPTH)
+        )
+
+    def _watch(self):
+        stall: Optional[_Stall] = None
+        while not self._stopping.wait(self.sample_interval):
+            beat = self._beat
+            overdue = time.monotonic() - beat - self.interval
+            if overdue >= self.threshold:
+                if stall is None or stall.started != beat:
+                    stall = _Stall(beat)
+                stack = self._sample_stack()
+                if stack:
+                    stall.stacks[stack] += 1
+                stall.duration = overdue
+            elif stall is not None:
+                self._finish(stall)
+                stall = None
+
+    def _finish(self, stall: _Stall):
+        with self._lock:
+            self.slow_callbacks.append(stall)
+            self.slow_total += 1
+        SLOW_CALLBACK_SECONDS.observe(stall.duration)
+        top = stall.stacks.most_common(1)
+        where = top[0][0][-1] if top else "unknown"
+        logger.warning(f"Event loop blocked for {stall.duration * 1000:.0f}ms at {where}")
+
+    def status(self, limit: int = 20) -> Dict:
+        """Recent lag percentiles (ms) and the latest slow callbacks"""
+        lags = sorted(self._lags)
+        pick = lambda p: round(lags[min(len(lags) - 1, int(len(lags) * p))] * 1000, 2) if lags else None
+        with self._lock:
+            recent: List[_Stall] = list(self.slow_callbacks)[-limit:] if limit else []
+            total = self.slow_total
+        return {
+            "running": self._ticker is not None,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "lag_ms": {"p50": pick(0.5), "p99": pick(0.99), "max": pick(1.0)},
+            "slow_callbacks_total": total,
+            "slow_callbacks": [stall.to_dict() for stall in reversed(recent)]
+        }
+
+    def clear(self):
+        with self._lock:
+            self.slow_callbacks.clear()
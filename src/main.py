@@ -1,17 +1,58 @@
-from fastapi import FastAPI, BackgroundTasks, HTTPException, Request, WebSocket, Depends, Security
+import time
+_import_started = time.perf_counter()  # start of the "import" startup phase
+
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Request, WebSocket, WebSocketDisconnect, Depends, Security, Header, Query
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-import serial.tools.list_ports
+import asyncio
+import hmac
 import json
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-import jwt
+import os
+import socket
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from src.config import settings
+from src.config_service import ConfigError, ConfigService
+from src.devices import DeviceEntry, DeviceRegistry
+from src.models import Device, SMS, SendRequest, MessageRecord, LogRecord, ApiKeyRequest, ApiKeyInfo
+from src.database.manager import DatabaseManager
+from src.database.partitions import PartitionManager
+from src.database.search import MATCH_MODES, InvalidCursor
+from src import export, serialization
+from src.serialization import EncodedJSONResponse, FastJSONResponse
+from src.database.models import Device as DeviceRecord
+from src.auth.manager import AuthManager, optional_bearer
+from src.auth.principals import Principal
+from src.smshub_client import SMSHubClient
+from src.ingest import MessageIngest
+from src.webhooks import VoipWebhookHandler, WebhookError
+from src.outbound import OutboundScheduler, NoDeviceAvailable, OutboundQueueFull
+from src.supervisor import DeviceSupervisor
+from src.device_managers import DEVICE_MANAGERS, create_registry, ManagerResources
+from src.sharding import ShardCoordinator, create_lease_store
+from src import metrics
+from src.admission import AdmissionMiddleware, create_client_limiter
+from src.tracing import tracker
+from src.loop_monitor import LoopMonitor
+from src.profiler import ProfilerBusy, dump_tasks, install_task_clock, profiler
+from src.startup import StartupTimer
+
+logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
-app = FastAPI(title="SMS Bridge Dashboard")
+app = FastAPI(title="SMS Bridge Dashboard", default_response_class=FastJSONResponse)
+
+# Admission control; added first so CORS wraps it and 429/503 carry CORS headers
+rate_limiter = create_client_limiter()
+app.add_middleware(
+    AdmissionMiddleware, limiter=rate_limiter,
+    verify=lambda credential: auth.is_valid_credential(credential)
+)
 
 # Configure CORS
 app.add_middleware(
@@ -24,57 +65,290 @@ app.add_middleware(
 
 # Static files and templates
 app.mount("/static", StaticFiles(directory="src/static"), name="static")
-templates = Jinja2Templates(directory="src/templates")
+
+@lru_cache(maxsize=None)
+def get_templates():
+    # Jinja is only needed once a page is rendered
+    from fastapi.templating import Jinja2Templates
+    return Jinja2Templates(directory="src/templates")
+
+startup_timer = StartupTimer(_import_started)
 
 # Initialize components
-active_devices: Dict[str, Device] = {}
-device_managers = {
-    'franklin': FranklinManager(),
-    'sierra': SierraManager(),
-    'huawei': HuaweiManager(),
-    'android': AndroidManager(),
-    'voip': VoipManager()
-}
+db = DatabaseManager(settings.DATABASE_URL)
+partitions = PartitionManager(db.engine)
+smshub = SMSHubClient(settings.SMSHUB_API_KEY, settings.SMSHUB_BASE_URL)
+ingest = MessageIngest(db, smshub)
+
+active_devices = DeviceRegistry()
+config_service = ConfigService(db, active_devices)
+registry = create_registry(ManagerResources(db))
+webhooks = VoipWebhookHandler(
+    lambda: registry.managers('voip'), ingest, settings.VOIP_WEBHOOK_BASE_URL
+)
 
 # Authentication
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
-SECRET_KEY = "your-secret-key"  # Move to environment variables
-ALGORITHM = "HS256"
+auth = AuthManager(db)
+
+def register_device(device) -> DeviceEntry:
+    """Track a device, with its config layered over the defaults and overrides"""
+    entry = active_devices.add(device)
+    config_service.layer(entry)
+    return entry
+
+def unregister_device(device_id: str) -> Optional[DeviceEntry]:
+    config_service.forget(device_id)
+    return active_devices.pop(device_id)
+
+# Sharding: with SHARD_BACKEND set, workers split devices through leases
+async def list_shared_devices() -> List[DeviceRecord]:
+    return [d for d in await db.get_devices() if d.status != "removed"]
+
+async def start_owned_device(device):
+    await initialize_device(register_device(device))
+
+async def stop_owned_device(device):
+    await cleanup_device(unregister_device(device.id) or device)
+
+lease_store = create_lease_store()
+shards: Optional[ShardCoordinator] = None
+if lease_store:
+    shards = ShardCoordinator(
+        lease_store,
+        settings.SHARD_WORKER_ID or f"{socket.gethostname()}-{os.getpid()}",
+        settings.SHARD_WORKER_URL,
+        list_shared_devices,
+        on_acquire=start_owned_device,
+        on_release=stop_owned_device
+    )
+
+# Hop-by-hop headers, and ones aiohttp sets itself, are not replayed
+UNFORWARDED_HEADERS = frozenset({
+    "host", "content-length", "connection", "transfer-encoding", "keep-alive", "x-shard-forwarded"
+})
+
+def forwarded_headers(request: Request) -> Dict[str, str]:
+    """Request headers for a replay on another worker, credentials and signatures included"""
+    headers = {
+        name: value for name, value in request.headers.items()
+        if name not in UNFORWARDED_HEADERS
+    }
+    # Webhook signatures cover the URL the provider called
+    headers.setdefault("x-shard-original-url", str(request.url))
+    return headers
+
+async def route_to_owner(request: Request, device_id: str) -> Optional[Response]:
+    """Forward a device command to the worker that owns the device"""
+    if not shards or shards.owns(device_id) or request.headers.get("x-shard-forwarded"):
+        return None
+    url = await shards.owner_url(device_id)
+    if not url:
+        return None
+    status, body, media_type = await shards.forward(
+        url, request.method, request.url.path,
+        params=dict(request.query_params),
+        body=await request.body(),
+        headers=forwarded_headers(request)
+    )
+    return Response(content=body, status_code=status, media_type=media_type)
+
+@app.post("/token")
+async def login(form: OAuth2PasswordRequestForm = Depends()):
+    """Exchange username and password for a bearer token"""
+    user = await auth.authenticate_user(form.username, form.password)
+    if not user:
+        raise HTTPException(
+            status_code=401, detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return {"access_token": auth.create_access_token(user), "token_type": "bearer"}
+
+@app.get("/api/auth/me")
+async def current_user(principal: Principal = Depends(auth.get_principal)):
+    return principal
+
+@app.post("/api/auth/logout")
+async def logout(principal: Principal = Depends(auth.get_current_user)):
+    """Revoke the presented token on every worker"""
+    await auth.revoke_token(principal)
+    return {"status": "logged_out"}
+
+@app.post("/api/auth/users/{user_id}/deactivate")
+async def deactivate_user(user_id: int, principal: Principal = Depends(auth.require_scope("admin"))):
+    """Disable a user; their existing tokens stop working immediately"""
+    await auth.deactivate_user(user_id)
+    return {"status": "deactivated", "user_id": user_id}
+
+@app.post("/api/auth/api-keys")
+async def create_api_key(request: ApiKeyRequest,
+                         principal: Principal = Depends(auth.require_scope("admin"))):
+    """Issue an API key; the key itself is only ever shown in this response"""
+    record, key = await auth.api_keys.create(
+        request.name, request.scopes, request.rate_limit,
+        owner_id=principal.user_id or None, expires_at=request.expires_at
+    )
+    return {"key": key, **ApiKeyInfo.from_orm(record).dict()}
+
+@app.get("/api/auth/api-keys", dependencies=[Depends(auth.require_scope("admin"))])
+async def list_api_keys():
+    return [ApiKeyInfo.from_orm(record) for record in await auth.api_keys.list()]
+
+@app.delete("/api/auth/api-keys/{prefix}", dependencies=[Depends(auth.require_scope("admin"))])
+async def revoke_api_key(prefix: str):
+    if not await auth.revoke_api_key(prefix):
+        raise HTTPException(status_code=404, detail="API key not found")
+    return {"status": "revoked", "prefix": prefix}
 
 # Device Management Routes
+@app.get("/api/devices")
+async def list_devices(local: bool = False, type: Optional[str] = None, status: Optional[str] = None,
+                       phone_number: Optional[str] = None, iccid: Optional[str] = None):
+    """Devices with live status, from every worker when sharded"""
+    criteria = {
+        field: value for field, value in (
+            ("type", type), ("status", status), ("phone_number", phone_number), ("sim_iccid", iccid)
+        ) if value is not None
+    }
+    if shards and not local:
+        devices = []
+        for worker_devices in (await shards.gather("/api/devices")).values():
+            if isinstance(worker_devices, list):
+                devices.extend(
+                    d for d in worker_devices
+                    if all(d.get(field) == value for field, value in criteria.items())
+                )
+        return devices
+    if criteria:
+        return FastJSONResponse([device.dict() for device in active_devices.find(**criteria)])
+    return EncodedJSONResponse(active_devices.snapshot_json())
+
 @app.post("/api/devices")
-async def add_device(device: Device, background_tasks: BackgroundTasks):
+async def add_device(device: Device, request: Request, background_tasks: BackgroundTasks):
     """Add new device"""
     if device.id in active_devices:
         raise HTTPException(status_code=400, detail="Device already exists")
         
-    manager = device_managers.get(device.type)
-    if not manager:
+    if not registry.supports(device.type):
         raise HTTPException(status_code=400, detail="Invalid device type")
+
+    if shards:
+        if await shards.owner_url(device.id):
+            raise HTTPException(status_code=400, detail="Device already exists")
+        # Persist first so another worker can take over if this one dies
+        await db.add_device(DeviceRecord(**device.dict()))
+        if not await shards.claim(device):
+            raise HTTPException(status_code=409, detail="Device is owned by another worker")
+        return {"status": "success", "device": device}
         
-    active_devices[device.id] = device
-    background_tasks.add_task(initialize_device, device)
+    background_tasks.add_task(initialize_device, register_device(device))
     return {"status": "success", "device": device}
 
 @app.delete("/api/devices/{device_id}")
-async def remove_device(device_id: str):
+async def remove_device(device_id: str, request: Request):
     """Remove device"""
+    forwarded = await route_to_owner(request, device_id)
+    if forwarded:
+        return forwarded
     if device_id not in active_devices:
         raise HTTPException(status_code=404, detail="Device not found")
+
+    if shards:
+        # Mark removed before dropping the lease so nobody re-claims it;
+        # cleanup leaves the removed status in place
+        active_devices.get(device_id).status = "removed"
+        await db.update_device_status(device_id, "removed")
+        await shards.release(device_id)
+        return {"status": "success"}
         
-    device = active_devices.pop(device_id)
+    device = unregister_device(device_id)
     await cleanup_device(device)
     return {"status": "success"}
 
+@app.post("/api/devices/{device_id}/expect-sms")
+async def expect_sms(device_id: str, request: Request, seconds: Optional[int] = None):
+    """Poll a device at the fast rate while an activation code is pending"""
+    forwarded = await route_to_owner(request, device_id)
+    if forwarded:
+        return forwarded
+    if device_id not in active_devices:
+        raise HTTPException(status_code=404, detail="Device not found")
+    supervisor.mark_active(device_id, seconds)
+    return {"status": "success"}
+
+@app.get("/api/devices/polling")
+async def polling_status(local: bool = False):
+    """Per-device poll interval and restart state"""
+    if shards and not local:
+        status = {}
+        for worker_id, worker_status in (await shards.gather("/api/devices/polling")).items():
+            for device_id, state in worker_status.items():
+                if isinstance(state, dict):
+                    status[device_id] = {**state, "worker": worker_id}
+        return status
+    return supervisor.status()
+
+@app.get("/api/cluster")
+async def cluster_status():
+    """Live workers and the devices each one owns"""
+    if not shards:
+        return {"sharding": False, "devices": list(active_devices)}
+    owners = await shards.store.owners()
+    workers = await shards.store.workers()
+    return {
+        "sharding": True,
+        "worker_id": shards.worker_id,
+        "workers": {
+            worker_id: {
+                "url": url,
+                "devices": sorted(d for d, owner in owners.items() if owner == worker_id)
+            }
+            for worker_id, url in workers.items()
+        }
+    }
+
 # Batch Operations
+async def forward_batch(request: Request, device_ids: List[str], op_type: str) -> Dict[str, dict]:
+    """Run the batch for devices owned by other workers on their owners"""
+    if not shards or request.headers.get("x-shard-forwarded"):
+        return {}
+    by_owner: Dict[str, List[str]] = {}
+    for device_id in device_ids:
+        if shards.owns(device_id):
+            continue
+        url = await shards.owner_url(device_id)
+        if url:
+            by_owner.setdefault(url, []).append(device_id)
+
+    results = {}
+    headers = forwarded_headers(request)
+    headers["content-type"] = "application/json"
+    for url, owned in by_owner.items():
+        try:
+            status, body, _ = await shards.forward(
+                url, "POST", request.url.path, headers=headers,
+                body=serialization.dumps({"devices": owned, "type": op_type})
+            )
+            if status != 200:
+                raise RuntimeError(f"Owner returned {status}")
+            for result in json.loads(body)["results"]:
+                results[result["device_id"]] = result
+        except Exception as e:
+            for device_id in owned:
+                results[device_id] = {"device_id": device_id, "status": "error", "message": str(e)}
+    return results
+
 @app.post("/api/batch")
-async def batch_operation(operation: dict):
+async def batch_operation(operation: dict, request: Request):
     """Execute batch operation on multiple devices"""
     devices = operation.get("devices", [])
     op_type = operation.get("type")
+    remote = await forward_batch(request, devices, op_type)
     
     results = []
     for device_id in devices:
+        if device_id in remote:
+            results.append(remote[device_id])
+            continue
         try:
             device = active_devices.get(device_id)
             if device:
@@ -87,6 +361,51 @@ async def batch_operation(operation: dict):
             
     return {"results": results}
 
+async def execute_operation(device: DeviceEntry, op_type: str):
+    """Run one batch operation against a device"""
+    if op_type == "restart":
+        await supervisor.stop_device(device.id)
+        await outbound.remove_device(device.id)
+        await registry.manager_for(device).cleanup(device)
+        supervisor.start(device)
+        return "restarting"
+    if op_type == "signal":
+        return await registry.manager_for(device).get_signal_strength(device)
+    raise ValueError(f"Unsupported operation: {op_type}")
+
+# Provider Webhooks
+async def route_webhook(request: Request, provider: str, params: Dict[str, str]) -> Optional[Response]:
+    """Forward a webhook to the worker running the device its number belongs to"""
+    if not shards or request.headers.get("x-shard-forwarded"):
+        return None
+    for device in await list_shared_devices():
+        if device.type == "voip" and webhooks.matches(provider, device, params):
+            return await route_to_owner(request, device.id)
+    return None
+
+@app.post("/api/webhooks/voip/{provider}")
+async def voip_webhook(provider: str, request: Request):
+    """Inbound SMS callback from a VoIP provider (Twilio, Nexmo, Plivo)"""
+    await request.body()  # cached, so the request can still be forwarded after parsing
+    if request.headers.get("content-type", "").startswith("application/json"):
+        params = {k: str(v) for k, v in (await request.json()).items()}
+    else:
+        params = dict(await request.form()) or dict(request.query_params)
+    request_url = str(request.url)
+    if request.headers.get("x-shard-forwarded"):
+        request_url = request.headers.get("x-shard-original-url", request_url)
+    url = webhooks.public_url(request.url.path, request.url.query, request_url)
+    try:
+        handled = webhooks.handle(provider, url, params, request.headers)
+    except WebhookError as e:
+        if e.status_code == 404:
+            # The number may belong to a device another worker runs
+            forwarded = await route_webhook(request, provider, params)
+            if forwarded:
+                return forwarded
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return Response(content=handled.ack_body, media_type=handled.ack_media_type)
+
 # WebSocket Connection Manager
 class ConnectionManager:
     def __init__(self):
@@ -95,50 +414,333 @@ class ConnectionManager:
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
         self.active_connections.append(websocket)
+        metrics.WEBSOCKET_CLIENTS.set(len(self.active_connections))
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        if websocket in self.active_connections:
+            self.active_connections.remove(websocket)
+        metrics.WEBSOCKET_CLIENTS.set(len(self.active_connections))
 
     async def broadcast(self, message: dict):
-        for connection in self.active_connections:
+        await self.broadcast_encoded(serialization.dumps(message))
+
+    async def broadcast_encoded(self, data: bytes):
+        """Send JSON that is already encoded; encoding once serves every client"""
+        started = time.monotonic()
+        text = data.decode()
+        for connection in list(self.active_connections):
             try:
-                await connection.send_json(message)
-            except:
-                await self.disconnect(connection)
+                await connection.send_text(text)
+            except Exception:
+                self.disconnect(connection)
+        metrics.WEBSOCKET_FANOUT_SECONDS.observe(time.monotonic() - started)
 
 manager = ConnectionManager()
 
+async def broadcast_device_update(device: DeviceEntry):
+    # Reuses the device's cached encoding, shared with GET /api/devices
+    await manager.broadcast_encoded(
+        b'{"type":"device_updated","device":' + device.json_bytes() + b'}'
+    )
+
+supervisor = DeviceSupervisor(
+    registry.manager_for,
+    ingest,
+    on_update=broadcast_device_update
+)
+
+outbound = OutboundScheduler(
+    lambda: active_devices.find(status="online"),
+    active_devices.get,
+    registry.manager_for,
+    notify=lambda report: manager.broadcast(report),
+    # Replies and delivery reports tend to follow a send
+    on_dispatch=supervisor.mark_active
+)
+
+async def broadcast_config_change(change):
+    for device_id in change.devices:
+        device = active_devices.get(device_id)
+        if device:
+            await broadcast_device_update(device)
+
+# Derived state (poll schedules, send rate limiters) follows reloaded settings
+config_service.add_listener(supervisor.reconfigure)
+config_service.add_listener(outbound.reconfigure)
+config_service.add_listener(broadcast_config_change)
+
+metrics.track_queue("ingest", lambda: ingest.depth)
+metrics.track_queue("outbound", lambda: outbound.pending)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/api/analytics/latency")
+async def latency_analytics(device_type: Optional[str] = None):
+    """Inbound SMS latency percentiles (ms) per device type and pipeline stage"""
+    return tracker.percentiles(device_type)
+
+@app.get("/api/analytics/messages")
+async def message_analytics(hours: int = 24, device_id: Optional[str] = None):
+    """Received/delivered/failed counts and failure rate per device from the hourly counters"""
+    if device_id:
+        return {device_id: await db.get_message_summary(device_id, hours)}
+    return await db.get_message_summaries(hours)
+
+# Admin
+async def require_admin(token: Optional[str] = Depends(optional_bearer),
+                        x_api_key: Optional[str] = Header(None),
+                        x_admin_key: Optional[str] = Header(None)):
+    """Guard for diagnostics routes: X-Admin-Key, an admin user or an admin API key"""
+    if settings.ADMIN_API_KEY and x_admin_key and hmac.compare_digest(
+        x_admin_key, settings.ADMIN_API_KEY
+    ):
+        return
+    principal = await auth.get_principal(token, x_api_key)
+    if not principal.allows("admin"):
+        raise HTTPException(status_code=403, detail="Admin required")
+
+loop_monitor = LoopMonitor()
+
+@app.get("/api/admin/loop", dependencies=[Depends(require_admin)])
+async def loop_status(limit: int = 20):
+    """Event-loop lag and stack samples of recent slow callbacks"""
+    return loop_monitor.status(limit)
+
+@app.delete("/api/admin/loop/slow-callbacks", dependencies=[Depends(require_admin)])
+async def clear_slow_callbacks():
+    loop_monitor.clear()
+    return {"status": "success"}
+
+@app.get("/api/admin/profile", dependencies=[Depends(require_admin)])
+async def profile(seconds: float = 10, interval_ms: Optional[float] = None,
+                  all_threads: bool = False, format: str = "json"):
+    """Sample stacks for a while; format=collapsed returns flamegraph input"""
+    try:
+        result = await profiler.profile(
+            seconds, interval_ms / 1000 if interval_ms else None, all_threads
+        )
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if format == "collapsed":
+        return PlainTextResponse(result["collapsed"] + "\n")
+    return result
+
+@app.get("/api/admin/tasks", dependencies=[Depends(require_admin)])
+async def task_dump():
+    """Running asyncio tasks with their age and current await point"""
+    return dump_tasks()
+
+@app.get("/api/admin/startup", dependencies=[Depends(require_admin)])
+async def startup_report():
+    """How long the last startup took, per phase"""
+    return startup_timer.report()
+
+@app.get("/api/admin/config", dependencies=[Depends(require_admin)])
+async def get_config():
+    """Settings that can change without a restart, as in effect now"""
+    return config_service.current()
+
+@app.put("/api/admin/config", dependencies=[Depends(require_admin)])
+async def update_config(values: Dict[str, Any]):
+    """Change reloadable settings on every worker"""
+    try:
+        change = await config_service.update(values)
+    except ConfigError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"changed": sorted(change.settings) if change else []}
+
+@app.get("/api/admin/devices/{device_id}/config", dependencies=[Depends(require_admin)])
+async def get_device_config(device_id: str, request: Request):
+    """A device's effective config and the overrides layered into it"""
+    forwarded = await route_to_owner(request, device_id)
+    if forwarded:
+        return forwarded
+    device = active_devices.get(device_id)
+    if not device:
+        raise HTTPException(status_code=404, detail="Device not found")
+    return {"config": device.config, "overrides": settings.DEVICE_OVERRIDES.get(device_id, {})}
+
+@app.put("/api/admin/devices/{device_id}/config", dependencies=[Depends(require_admin)])
+async def set_device_config(device_id: str, overrides: Dict[str, Any], request: Request):
+    """Replace a device's overrides (poll_interval, send_rate, ...); {} clears them"""
+    # Applied on the owner right away; other workers pick it up on their next reload
+    forwarded = await route_to_owner(request, device_id)
+    if forwarded:
+        return forwarded
+    try:
+        await config_service.set_device_overrides(device_id, overrides)
+    except ConfigError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"overrides": settings.DEVICE_OVERRIDES.get(device_id, {})}
+
+# Search
+def day_range(start: Optional[date], end: Optional[date]):
+    """Inclusive calendar days to a [since, until) datetime range"""
+    since = datetime.combine(start, datetime.min.time()) if start else None
+    until = datetime.combine(end + timedelta(days=1), datetime.min.time()) if end else None
+    return since, until
+
+@app.get("/api/messages/filter")
+async def filter_messages(
+    device: Optional[str] = None,
+    sender: Optional[str] = None,
+    status: Optional[str] = None,
+    start_date: Optional[date] = Query(None, alias="startDate"),
+    end_date: Optional[date] = Query(None, alias="endDate"),
+    search: Optional[str] = None,
+    match: str = Query("words", regex=f"^({'|'.join(MATCH_MODES)})$"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None
+):
+    """Stored messages, newest first, paged with an opaque cursor"""
+    since, until = day_range(start_date, end_date)
+    try:
+        page = await db.search_messages(
+            device_id=device, from_number=sender, status=status, since=since, until=until,
+            search=search, match=match, limit=limit, cursor=cursor
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse({
+        "messages": serialization.records(page.items, MessageRecord),
+        "pagination": {"limit": limit, "count": len(page.items), "next_cursor": page.next_cursor}
+    })
+
+@app.get("/api/logs")
+async def search_logs(
+    level: Optional[str] = None,
+    source: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    search: Optional[str] = None,
+    match: str = Query("words", regex=f"^({'|'.join(MATCH_MODES)})$"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None
+):
+    """System logs, newest first, paged with an opaque cursor"""
+    try:
+        page = await db.get_logs(
+            level=level, search=search, limit=limit, source=source,
+            since=since, until=until, match=match, cursor=cursor
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse({
+        "logs": serialization.records(page.items, LogRecord),
+        "pagination": {"limit": limit, "count": len(page.items), "next_cursor": page.next_cursor}
+    })
+
+# Export
+def export_response(batches, model, name: str, format: str, gzip: bool) -> StreamingResponse:
+    """Stream rows as a download without holding them in memory"""
+    body = export.encode(batches, model, format)
+    filename = f"{name}-{datetime.utcnow():%Y%m%dT%H%M%S}.{format}"
+    media_type = export.FORMATS[format]
+    if gzip:
+        body = export.gzipped(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        body, media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.get("/api/messages/export", dependencies=[Depends(require_admin)])
+async def export_messages(
+    device: Optional[str] = None,
+    sender: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    search: Optional[str] = None,
+    match: str = Query("words", regex=f"^({'|'.join(MATCH_MODES)})$"),
+    format: str = Query("ndjson", regex=f"^({'|'.join(export.FORMATS)})$"),
+    gzip: bool = False
+):
+    """Matching messages, oldest first, as NDJSON or CSV"""
+    batches = db.stream_messages(
+        device_id=device, from_number=sender, status=status, since=since, until=until,
+        search=search, match=match
+    )
+    return export_response(batches, MessageRecord, "messages", format, gzip)
+
+@app.get("/api/logs/export", dependencies=[Depends(require_admin)])
+async def export_logs(
+    level: Optional[str] = None,
+    source: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    search: Optional[str] = None,
+    match: str = Query("words", regex=f"^({'|'.join(MATCH_MODES)})$"),
+    format: str = Query("ndjson", regex=f"^({'|'.join(export.FORMATS)})$"),
+    gzip: bool = False
+):
+    """Matching logs, oldest first, as NDJSON or CSV"""
+    batches = db.stream_logs(
+        level=level, source=source, since=since, until=until, search=search, match=match
+    )
+    return export_response(batches, LogRecord, "logs", format, gzip)
+
+# Outbound Messages
+@app.post("/api/messages/send")
+async def send_message(request: SendRequest, http_request: Request):
+    """Queue an outbound SMS; delivery is reported over the WebSocket"""
+    if request.device_id:
+        forwarded = await route_to_owner(http_request, request.device_id)
+        if forwarded:
+            return forwarded
+    if request.device_id and request.device_id not in active_devices:
+        raise HTTPException(status_code=404, detail="Device not found")
+    try:
+        message = outbound.submit(request)
+    except NoDeviceAvailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except OutboundQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {"status": "queued", "message": message}
+
+@app.get("/api/messages/send/{message_id}")
+async def get_send_status(message_id: str):
+    """Delivery status of a queued outbound SMS"""
+    message = outbound.get(message_id)
+    if not message:
+        raise HTTPException(status_code=404, detail="Message not found")
+    return message
+
 # WebSocket endpoint for real-time updates
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
     try:
+        # Updates are pushed by broadcasts; just wait for the client to leave
         while True:
-            updates = await get_status_updates()
-            await websocket.send_json(updates)
-            await asyncio.sleep(1)
+            await websocket.receive_text()
     except WebSocketDisconnect:
         manager.disconnect(websocket)
 
 # Background Tasks
-async def initialize_device(device: Device):
-    """Initialize new device"""
+async def initialize_device(device: DeviceEntry):
+    """Hand a new device to the supervisor, which initializes and polls it"""
     try:
-        device_manager = device_managers[device.type]
-        await device_manager.initialize(device)
+        supervisor.start(device)
         await manager.broadcast({
             "type": "device_added",
             "device": device.dict()
         })
     except Exception as e:
         logger.error(f"Device initialization error: {str(e)}")
-        active_devices.pop(device.id, None)
+        unregister_device(device.id)
 
-async def cleanup_device(device: Device):
+async def cleanup_device(device: DeviceEntry):
     """Cleanup device resources"""
     try:
-        device_manager = device_managers[device.type]
-        await device_manager.cleanup(device)
+        await supervisor.stop_device(device.id)
+        await outbound.remove_device(device.id)
+        await registry.manager_for(device).cleanup(device)
         await manager.broadcast({
             "type": "device_removed",
             "device_id": device.id
@@ -156,17 +758,47 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 # Startup and Shutdown Events
+async def load_devices():
+    """Start the saved devices this worker is responsible for"""
+    devices = [device for device in await db.get_devices() if registry.owns(device.id)]
+    # Import the manager modules in use now rather than in the first poll
+    for device_type in {device.type for device in devices}:
+        if device_type in DEVICE_MANAGERS:
+            try:
+                DEVICE_MANAGERS.load(device_type)
+            except Exception as e:
+                logger.error(f"Could not load the {device_type} manager: {str(e)}")
+    for device in devices:
+        await initialize_device(register_device(device))
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize system on startup"""
     try:
-        await db.initialize()
-        await smshub_client.initialize()
-        # Load saved devices
-        devices = await db.get_devices()
-        for device in devices:
-            active_devices[device.id] = device
-            await initialize_device(device)
+        install_task_clock()
+        if settings.LOOP_MONITOR_ENABLED:
+            await loop_monitor.start()
+        with startup_timer.phase("database"):
+            await db.initialize()
+        with startup_timer.phase("config"):
+            # Before any device is registered, so their configs get layered once
+            await config_service.start()
+        with startup_timer.phase("partitions"):
+            # Today's partitions must exist before the first insert
+            await partitions.start()
+        with startup_timer.phase("auth"):
+            await auth.start()
+        with startup_timer.phase("services"):
+            await registry.start()
+            await ingest.start()
+        if shards:
+            with startup_timer.phase("shards"):
+                # Devices are claimed through leases, now and on every heartbeat
+                await shards.start()
+        else:
+            with startup_timer.phase("devices"):
+                await load_devices()
+        startup_timer.finish()
     except Exception as e:
         logger.error(f"Startup error: {str(e)}")
         raise
@@ -175,8 +807,25 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown"""
     try:
+        await outbound.stop()
+        await config_service.stop()
+        if shards:
+            # Hand devices over to the other workers right away
+            await shards.stop()
+            await lease_store.close()
         for device in list(active_devices.values()):
             await cleanup_device(device)
+        await ingest.stop()
+        await registry.stop()
+        await smshub.close()
+        await auth.stop()
+        if rate_limiter:
+            await rate_limiter.close()
+        await partitions.stop()
         await db.cleanup()
+        await loop_monitor.stop()
     except Exception as e:
-        logger.error(f"Shutdown error: {str(e)}")
\ No newline at end of file
+        logger.error(f"Shutdown error: {str(e)}")
+
+# Everything above ran at import time
+startup_timer.record("import", time.perf_counter() - _import_started)
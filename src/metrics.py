@@ -0,0 +1,135 @@
+import re
+from functools import lru_cache
+from typing import Dict, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest
+)
+
+# Latency buckets in seconds
+FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+IO_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500)
+
+class BoundMetric:
+    """Caches label children so hot paths skip prometheus' labels() lookup
+
+    `labels()` on a prometheus metric builds a dict and takes a lock on
+    every call; here the child is looked up by its label tuple instead and
+    only created on first use.
+    """
+
+    __slots__ = ('metric', '_children')
+
+    def __init__(self, metric):
+        self.metric = metric
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self.metric.labels(*values)
+        return child
+
+    def forget(self, index: int, value: str):
+        """Drop every child whose label at `index` equals value"""
+        for values in [v for v in self._children if v[index] == value]:
+            del self._children[values]
+            self.metric.remove(*values)
+
+AT_COMMAND_SECONDS = BoundMetric(Histogram(
+    "smsbridge_at_command_seconds",
+    "AT command round-trip time",
+    ["device", "command"],
+    buckets=IO_BUCKETS
+))
+POLL_SECONDS = BoundMetric(Histogram(
+    "smsbridge_poll_seconds",
+    "Duration of one message poll cycle",
+    ["device"],
+    buckets=IO_BUCKETS
+))
+INGEST_TO_FORWARD_SECONDS = Histogram(
+    "smsbridge_ingest_to_forward_seconds",
+    "Time from an SMS entering ingest until its SMSHUB push finished",
+    buckets=IO_BUCKETS
+)
+SMSHUB_PUSH_SECONDS = Histogram(
+    "smsbridge_smshub_push_seconds",
+    "SMSHUB push request latency",
+    buckets=IO_BUCKETS
+)
+SMSHUB_PUSH_ERRORS = BoundMetric(Counter(
+    "smsbridge_smshub_push_errors",
+    "SMSHUB pushes that failed",
+    ["reason"]
+))
+DB_FLUSH_ROWS = Histogram(
+    "smsbridge_db_flush_rows",
+    "Messages written per database flush",
+    buckets=SIZE_BUCKETS
+)
+WEBSOCKET_FANOUT_SECONDS = Histogram(
+    "smsbridge_websocket_fanout_seconds",
+    "Time to broadcast one event to every WebSocket client",
+    buckets=FAST_BUCKETS
+)
+WEBSOCKET_CLIENTS = Gauge(
+    "smsbridge_websocket_clients",
+    "Connected WebSocket clients"
+)
+QUEUE_DEPTH = Gauge(
+    "smsbridge_queue_depth",
+    "Items waiting in internal queues",
+    ["queue"]
+)
+API_KEY_REQUESTS = BoundMetric(Counter(
+    "smsbridge_api_key_requests",
+    "Requests authenticated with an API key, by key prefix",
+    ["key", "outcome"]
+))
+ADMISSION_REJECTED = BoundMetric(Counter(
+    "smsbridge_admission_rejected",
+    "API requests refused by admission control",
+    ["route_class", "reason"]
+))
+ADMISSION_IN_FLIGHT = Gauge(
+    "smsbridge_admission_in_flight",
+    "API requests currently running, per admission class",
+    ["route_class"]
+)
+STARTUP_SECONDS = Gauge(
+    "smsbridge_startup_seconds",
+    "Duration of each phase of the last startup",
+    ["phase"]
+)
+
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "smsbridge_event_loop_lag_seconds",
+    "How late the event loop ran a scheduled wake-up",
+    buckets=FAST_BUCKETS
+)
+SLOW_CALLBACK_SECONDS = Histogram(
+    "smsbridge_slow_callback_seconds",
+    "Callbacks that blocked the event loop past the slow threshold",
+    buckets=IO_BUCKETS
+)
+
+def track_queue(name: str, depth):
+    """Report a queue's depth at scrape time instead of on every put/get"""
+    QUEUE_DEPTH.labels(name).set_function(depth)
+
+@lru_cache(maxsize=256)
+def command_name(command: str) -> str:
+    """Command type of an AT command line, e.g. 'AT+CMGL="ALL"' -> 'CMGL'"""
+    match = re.match(r'AT[+^$]?([A-Z]+)', command.upper())
+    return match.group(1) if match else "AT"
+
+def render(registry: CollectorRegistry = REGISTRY) -> Tuple[bytes, str]:
+    return generate_latest(registry), CONTENT_TYPE_LATEST
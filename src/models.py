@@ -1,6 +1,6 @@
 from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel
+from typing import Optional, Dict, Any, List
+from pydantic import BaseModel, Extra, Field
 
 class Device(BaseModel):
     id: str
@@ -11,12 +11,96 @@ class Device(BaseModel):
     status: str  # online, offline, error
     first_seen: datetime
     last_seen: datetime
+    port: Optional[str] = None
+    config: Dict[str, Any] = {}
+
+    class Config:
+        orm_mode = True
+
+class DeviceOverrides(BaseModel):
+    """Per-device settings; manager-specific keys (ip, baudrate, ...) pass through"""
+    poll_interval: Optional[float] = Field(None, gt=0)  # idle poll interval, else MESSAGE_CHECK_INTERVAL
+    poll_interval_fast: Optional[float] = Field(None, gt=0)  # else MESSAGE_CHECK_INTERVAL_FAST
+    signal_interval: Optional[float] = Field(None, gt=0)  # else SIGNAL_CHECK_INTERVAL
+    send_rate: Optional[float] = Field(None, gt=0)  # else OUTBOUND_RATE_PER_DEVICE
+    send_burst: Optional[int] = Field(None, ge=1)  # else OUTBOUND_BURST_PER_DEVICE
+    timeout: Optional[float] = Field(None, gt=0)
+
+    class Config:
+        extra = Extra.allow
 
 class SMS(BaseModel):
-    id: int
+    id: Optional[int] = None
     device_id: str
     from_number: str
     to_number: str
     text: str
     received_at: datetime
-    delivered: bool 
\ No newline at end of file
+    delivered: bool
+    external_id: Optional[str] = None  # provider message SID, used for de-duplication
+    trace: Optional[Any] = Field(None, exclude=True)  # src.tracing.SMSTrace, in-process only
+
+class MessageRecord(BaseModel):
+    """A stored inbound message, as returned by search"""
+    id: int
+    device_id: Optional[str]
+    from_number: str
+    to_number: str
+    text: str
+    received_at: datetime
+    forwarded_at: Optional[datetime]
+    status: str
+    delivery_attempts: Optional[int]
+    error_message: Optional[str]
+
+    class Config:
+        orm_mode = True
+
+class LogRecord(BaseModel):
+    id: int
+    timestamp: datetime
+    level: str
+    message: str
+    source: Optional[str]
+    details: Optional[Dict[str, Any]]
+
+    class Config:
+        orm_mode = True
+
+class SendRequest(BaseModel):
+    to_number: str
+    text: str
+    device_id: Optional[str] = None  # pin to a device; otherwise one is chosen
+
+class OutboundMessage(BaseModel):
+    id: str
+    to_number: str
+    text: str
+    device_id: Optional[str] = None  # pinned device, if any
+    sent_via: Optional[str] = None
+    status: str = "queued"  # queued, sending, sent, failed
+    attempts: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+    sent_at: Optional[datetime] = None
+
+class ApiKeyRequest(BaseModel):
+    name: str
+    scopes: List[str] = []  # only "admin" (or "*" for everything) is checked
+    rate_limit: Optional[float] = Field(None, gt=0)  # requests per second
+    expires_at: Optional[datetime] = None
+
+class ApiKeyInfo(BaseModel):
+    """An API key without its secret"""
+    prefix: str
+    name: str
+    scopes: List[str]
+    rate_limit: Optional[float]
+    is_active: bool
+    created_at: datetime
+    expires_at: Optional[datetime]
+    last_used_at: Optional[datetime]
+    usage_count: int
+
+    class Config:
+        orm_mode = True
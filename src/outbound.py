@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set
+
+from src.config import settings
+from src.models import Device, OutboundMessage, SendRequest
+from src.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+class NoDeviceAvailable(Exception):
+    """Raised when no online device can take an outbound message"""
+
+class OutboundQueueFull(Exception):
+    """Raised when too many sends are already pending"""
+
+class _DeviceLane:
+    """Per-device send queue drained by a single worker
+
+    One worker per device sends one message at a time, in order, while
+    lanes for different devices run in parallel. The manager's device_lock
+    keeps each send's AT dialog apart from the supervisor's polls.
+    """
+
+    __slots__ = ('device_id', 'bucket', 'queue', 'task', 'inflight', 'failures', 'current')
+
+    def __init__(self, device_id: str, rate: float, burst: float):
+        self.device_id = device_id
+        self.bucket = TokenBucket(rate, burst)
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+        self.inflight = 0
+        self.failures = 0  # consecutive failures, used to steer traffic away
+        self.current: Optional[OutboundMessage] = None  # message being sent
+
+    @property
+    def load(self) -> int:
+        return self.queue.qsize() + self.inflight
+
+    def score(self) -> float:
+        """Expected wait for a new message; lower is better"""
+        return (self.load + 1) / self.bucket.rate * (1 + self.failures)
+
+class OutboundScheduler:
+    """Queues outbound SMS and spreads them across devices
+
+    Messages pinned to a device go to that device's lane; otherwise the
+    least-loaded healthy online device is chosen. Each lane is throttled
+    by its own token bucket so no single SIM exceeds carrier limits.
+    Delivery results are reported through `notify` and `get`.
+    """
+
+    def __init__(self, list_devices: Callable[[], Iterable[Device]],
+                 get_device: Callable[[str], Optional[Device]],
+                 get_manager: Callable[[Device], object],
+                 notify: Optional[Callable[[dict], Awaitable]] = None,
+                 on_dispatch: Optional[Callable[[str], None]] = None):
+        self.list_devices = list_devices
+        self.get_device = get_device
+        self.get_manager = get_manager
+        self.notify = notify
+        self.on_dispatch = on_dispatch
+        self._lanes: Dict[str, _DeviceLane] = {}
+        self._messages: "OrderedDict[str, OutboundMessage]" = OrderedDict()
+        self._tried: Dict[str, Set[str]] = {}
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    # A zero or negative per-device value (from discovery or an old config)
+    # falls back to the global default rather than stalling the lane
+    @staticmethod
+    def _rate(device: Device) -> float:
+        rate = device.config.get('send_rate')
+        return rate if rate and rate > 0 else settings.OUTBOUND_RATE_PER_DEVICE
+
+    @staticmethod
+    def _burst(device: Device) -> float:
+        burst = device.config.get('send_burst')
+        return burst if burst and burst > 0 else settings.OUTBOUND_BURST_PER_DEVICE
+
+    def _lane(self, device: Device) -> _DeviceLane:
+        lane = self._lanes.get(device.id)
+        if lane is None:
+            lane = _DeviceLane(device.id, self._rate(device), self._burst(device))
+            self._lanes[device.id] = lane
+        if lane.task is None or lane.task.done():
+            lane.task = asyncio.create_task(self._run_lane(lane), name=f"outbound-{device.id}")
+        return lane
+
+    async def reconfigure(self, change=None):
+        """Apply changed send rates to existing lanes, keeping their balance"""
+        for device_id, lane in self._lanes.items():
+            device = self.get_device(device_id)
+            if device is not None:
+                lane.bucket.update(self._rate(device), self._burst(device))
+
+    def select_device(self, exclude: Iterable[str] = ()) -> Optional[Device]:
+        """Pick the online device expected to send soonest"""
+        excluded = set(exclude)
+        best, best_key = None, None
+        for device in self.list_devices():
+            if device.status != "online" or device.id in excluded:
+                continue
+            lane = self._lanes.get(device.id)
+            score = lane.score() if lane else 1 / self._rate(device)
+            key = (score, -(device.signal_strength or 0))
+            if best_key is None or key < best_key:
+                best, best_key = device, key
+        return best
+
+    def submit(self, request: SendRequest) -> OutboundMessage:
+        """Queue a message and return its tracking record"""
+        if self._pending >= settings.OUTBOUND_MAX_PENDING:
+            raise OutboundQueueFull("Outbound queue is full")
+
+        if request.device_id:
+            device = self.get_device(request.device_id)
+            if device is None or device.status != "online":
+                raise NoDeviceAvailable(f"Device {request.device_id} is not online")
+        else:
+            device = self.select_device()
+            if device is None:
+                raise NoDeviceAvailable("No online device available")
+
+        message = OutboundMessage(
+            id=uuid.uuid4().hex,
+            to_number=request.to_number,
+            text=request.text,
+            device_id=request.device_id,
+            created_at=datetime.utcnow()
+        )
+        self._remember(message)
+        self._pending += 1
+        self._dispatch(device, message)
+        return message
+
+    def _dispatch(self, device: Device, message: OutboundMessage):
+        self._lane(device).queue.put_nowait(message)
+        if self.on_dispatch:
+            self.on_dispatch(device.id)
+
+    def get(self, message_id: str) -> Optional[OutboundMessage]:
+        return self._messages.get(message_id)
+
+    def _remember(self, message: OutboundMessage):
+        self._messages[message.id] = message
+        while len(self._messages) > settings.OUTBOUND_HISTORY_SIZE:
+            old_id, old = self._messages.popitem(last=False)
+            if old.status in ("queued", "sending"):
+                # Never evict in-flight records
+                self._messages[old_id] = old
+                break
+
+    async def _run_lane(self, lane: _DeviceLane):
+        while True:
+            message = await lane.queue.get()
+            lane.current = message
+            lane.inflight += 1
+            try:
+                await lane.bucket.acquire()
+                await self._deliver(lane, message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbound worker error on {lane.device_id}: {str(e)}")
+            finally:
+                lane.current = None
+                lane.inflight -= 1
+                lane.queue.task_done()
+
+    async def _deliver(self, lane: _DeviceLane, message: OutboundMessage):
+        device = self.get_device(lane.device_id)
+        message.attempts += 1
+        message.status = "sending"
+        sent = False
+        if device is not None and device.status == "online":
+            try:
+                manager = self.get_manager(device)
+                sent = await asyncio.wait_for(
+                    manager.send_message(device, message.to_number, message.text),
+                    timeout=settings.SMS_SEND_TIMEOUT + 5
+                )
+                message.error = None if sent else "Device rejected message"
+            except asyncio.TimeoutError:
+                message.error = "Send timed out"
+            except Exception as e:
+                message.error = str(e)
+        else:
+            message.error = "Device offline"
+
+        if sent:
+            lane.failures = 0
+            await self._finish(message, "sent", lane.device_id)
+            return
+
+        lane.failures += 1
+        tried = self._tried.setdefault(message.id, set())
+        tried.add(lane.device_id)
+        if message.attempts < settings.MAX_RETRY_ATTEMPTS:
+            retry_device = device if message.device_id else self.select_device(exclude=tried)
+            if retry_device is not None and retry_device.status == "online":
+                message.status = "queued"
+                self._dispatch(retry_device, message)
+                return
+
+        await self._finish(message, "failed", lane.device_id)
+
+    async def _finish(self, message: OutboundMessage, status: str, device_id: str):
+        message.status = status
+        message.sent_via = device_id
+        if status == "sent":
+            message.sent_at = datetime.utcnow()
+        self._pending -= 1
+        self._tried.pop(message.id, None)
+
+        if self.notify:
+            try:
+                await self.notify({
+                    "type": "message_sent" if status == "sent" else "message_failed",
+                    "message": message.dict()
+                })
+            except Exception as e:
+                logger.error(f"Delivery report error: {str(e)}")
+
+    async def remove_device(self, device_id: str):
+        """Stop a removed device's lane and fail the messages left on it"""
+        lane = self._lanes.pop(device_id, None)
+        if lane is None:
+            return
+        # Grab the in-flight message before cancelling clears it
+        left = [lane.current] if lane.current else []
+        if lane.task:
+            lane.task.cancel()
+            await asyncio.gather(lane.task, return_exceptions=True)
+        while not lane.queue.empty():
+            left.append(lane.queue.get_nowait())
+        for message in left:
+            if message.status in ("queued", "sending"):
+                message.error = "Device removed"
+                await self._finish(message, "failed", device_id)
+
+    async def stop(self):
+        """Cancel lane workers; queued messages are dropped"""
+        tasks = [lane.task for lane in self._lanes.values() if lane.task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._lanes.clear()
@@ -0,0 +1,160 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+from typing import Dict, List, Optional
+
+from src.config import settings
+
+_task_created: "weakref.WeakKeyDictionary[asyncio.Task, float]" = weakref.WeakKeyDictionary()
+
+class ProfilerBusy(Exception):
+    """Another profile is already running in this process"""
+
+def install_task_clock(loop: Optional[asyncio.AbstractEventLoop] = None):
+    """Record when tasks are created so the task dump can show their age"""
+    loop = loop or asyncio.get_running_loop()
+    previous = loop.get_task_factory()
+    if getattr(previous, "task_clock", False):
+        return
+
+    def factory(loop, coro, **kwargs):
+        if previous is not None:
+            task = previous(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        _task_created[task] = time.monotonic()
+        return task
+
+    factory.task_clock = True
+    loop.set_task_factory(factory)
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _where(frame) -> str:
+    return f"{frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+
+def _is_idle(frame) -> bool:
+    """The loop thread is parked in the selector waiting for I/O"""
+    return frame.f_code.co_name in ("select", "poll") and frame.f_code.co_filename.endswith("selectors.py")
+
+class SamplingProfiler:
+    """Time-boxed stack sampler for a live process
+
+    A thread samples every thread's stack each `interval` seconds. Stacks
+    from the event loop thread are rooted at the asyncio task that was
+    running, so time splits by device loop rather than all landing in
+    `run_forever`. Output is collapsed stacks ("a;b;c count"), which
+    flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    async def profile(self, seconds: float, interval: float = None,
+                      all_threads: bool = False) -> Dict:
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already running")
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                None, self._sample, loop, threading.get_ident(),
+                min(seconds, settings.PROFILER_MAX_SECONDS),
+                interval or settings.PROFILER_INTERVAL, all_threads
+            )
+        finally:
+            self._lock.release()
+
+    def _sample(self, loop, loop_thread: int, seconds: float, interval: float,
+                all_threads: bool) -> Dict:
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        current_tasks = getattr(asyncio.tasks, "_current_tasks", {})
+        stacks: Counter = Counter()
+        samples = idle = 0
+        started = time.monotonic()
+        deadline = started + seconds
+
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                if thread_id == loop_thread:
+                    samples += 1
+                    if _is_idle(frame):
+                        idle += 1
+                        continue
+                    task = current_tasks.get(loop)
+                    root = f"task:{task.get_name()}" if task else "loop:callback"
+                elif all_threads:
+                    root = f"thread:{names.get(thread_id, thread_id)}"
+                else:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(root)
+                stacks[";".join(reversed(labels))] += 1
+            time.sleep(interval)
+
+        elapsed = time.monotonic() - started
+        self_time = Counter()
+        for stack, count in stacks.items():
+            self_time[stack.rsplit(";", 1)[-1]] += count
+        return {
+            "duration_s": round(elapsed, 2),
+            "interval_ms": interval * 1000,
+            "loop_samples": samples,
+            "loop_busy_ratio": round(1 - idle / samples, 3) if samples else None,
+            "top": [{"frame": frame, "samples": count} for frame, count in self_time.most_common(20)],
+            "collapsed": "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+        }
+
+def _await_chain(task: asyncio.Task) -> List:
+    """Frames from the task's coroutine down to where it is suspended"""
+    frames = []
+    awaitable = task.get_coro()
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None) \
+            or getattr(awaitable, "ag_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None) \
+            or getattr(awaitable, "ag_await", None)
+    return frames
+
+def _waiting_on(task: asyncio.Task) -> Optional[str]:
+    waiter = getattr(task, "_fut_waiter", None)
+    if waiter is None:
+        return None
+    if isinstance(waiter, asyncio.Task):
+        return f"Task {waiter.get_name()}"
+    return type(waiter).__name__
+
+def dump_tasks() -> List[Dict]:
+    """Every running asyncio task with its age and current await point, oldest first"""
+    now = time.monotonic()
+    tasks = []
+    for task in asyncio.all_tasks():
+        frames = _await_chain(task)
+        created = _task_created.get(task)
+        coro = task.get_coro()
+        tasks.append({
+            "name": task.get_name(),
+            "coroutine": getattr(coro, "__qualname__", type(coro).__name__),
+            "age_s": round(now - created, 1) if created is not None else None,
+            "await_point": _where(frames[-1]) if frames else None,
+            "awaiting": _waiting_on(task),
+            "stack": [_where(frame) for frame in frames]
+        })
+    tasks.sort(key=lambda t: -(t["age_s"] or 0))
+    return tasks
+
+profiler = SamplingProfiler()
@@ -0,0 +1,72 @@
+import asyncio
+import time
+from typing import Optional
+
+class TokenBucket:
+    """Token bucket rate limiter
+
+    `acquire` reserves tokens up front and lets the balance go negative,
+    so concurrent callers queue behind each other in arrival order instead
+    of waking together and racing for the same refill.
+    """
+
+    __slots__ = ('rate', 'capacity', '_tokens', '_updated', '_blocked_until')
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1.0))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    @property
+    def tokens(self) -> float:
+        self._refill(time.monotonic())
+        return self._tokens
+
+    def delay(self, tokens: float = 1.0) -> float:
+        """Seconds until `tokens` could be taken without waiting"""
+        now = time.monotonic()
+        self._refill(now)
+        deficit = tokens - self._tokens
+        wait = deficit / self.rate if deficit > 0 and self.rate > 0 else 0.0
+        return max(wait, self._blocked_until - now, 0.0)
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take tokens if available right now"""
+        now = time.monotonic()
+        self._refill(now)
+        if now < self._blocked_until or self._tokens < tokens:
+            return False
+        self._tokens -= tokens
+        return True
+
+    async def acquire(self, tokens: float = 1.0):
+        """Take tokens, sleeping until the reservation is covered"""
+        now = time.monotonic()
+        self._refill(now)
+        self._tokens -= tokens
+        wait = -self._tokens / self.rate if self._tokens < 0 and self.rate > 0 else 0.0
+        wait = max(wait, self._blocked_until - now)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def block_for(self, seconds: float):
+        """Stop handing out tokens for a while (e.g. honoring Retry-After)"""
+        now = time.monotonic()
+        self._refill(now)
+        self._blocked_until = max(self._blocked_until, now + seconds)
+        self._tokens = min(self._tokens, 0.0)
+
+    def update(self, rate: float, capacity: Optional[float] = None):
+        """Change the rate in place, keeping the current balance"""
+        self._refill(time.monotonic())
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1.0))
+        self._tokens = min(self._tokens, self.capacity)
@@ -0,0 +1,84 @@
+import json
+import logging
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, List, Type
+from uuid import UUID
+
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("orjson", "msgspec", "json")
+
+def _default(value: Any) -> Any:
+    """Types the JSON encoders don't know natively"""
+    if isinstance(value, BaseModel):
+        return value.dict()
+    if hasattr(value, "dict"):  # DeviceEntry and friends
+        return value.dict()
+    if isinstance(value, (datetime, date, dt_time)):
+        return value.isoformat()
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(value, default=_default, separators=(",", ":"), ensure_ascii=False).encode()
+
+def _load(backend: str) -> Callable[[Any], bytes]:
+    if backend == "orjson":
+        import orjson
+        return lambda value: orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    if backend == "msgspec":
+        import msgspec
+        return msgspec.json.Encoder(enc_hook=_default).encode
+    if backend == "json":
+        return _json_dumps
+    raise ValueError(f"Unsupported JSON backend: {backend}")
+
+def select_backend(name: str = None):
+    """Encoder for JSON_BACKEND; "auto" takes the fastest one installed"""
+    name = name or settings.JSON_BACKEND
+    for backend in (BACKENDS if name == "auto" else (name,)):
+        try:
+            return backend, _load(backend)
+        except ImportError:
+            if name != "auto":
+                logger.error(f"JSON backend {backend} is not installed, using json")
+    return "json", _json_dumps
+
+backend, dumps = select_backend()
+
+def record(row: Any, model: Type[BaseModel]) -> Dict[str, Any]:
+    """The model's fields read off an ORM row, skipping pydantic validation"""
+    return {field: getattr(row, field) for field in model.__fields__}
+
+def records(rows: Iterable, model: Type[BaseModel]) -> List[Dict[str, Any]]:
+    fields = list(model.__fields__)
+    return [{field: getattr(row, field) for field in fields} for row in rows]
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered by the selected backend
+
+    Returning one of these from a route also skips FastAPI's
+    jsonable_encoder pass, so content should already be plain data
+    (dicts, lists, datetimes); models are handled but not validated.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+class EncodedJSONResponse(JSONResponse):
+    """Bytes that are already JSON, sent as they are"""
+
+    def render(self, content: bytes) -> bytes:
+        return content
@@ -0,0 +1,361 @@
+from abc import ABC, abstractmethod
+import asyncio
+import logging
+import time
+import zlib
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+class LeaseStore(ABC):
+    """Device ownership leases shared by all bridge workers
+
+    A lease maps a device id to the worker that owns it and expires unless
+    the owner renews it. Workers also publish a heartbeat with the URL other
+    workers use to reach them.
+    """
+
+    @abstractmethod
+    async def acquire(self, device_id: str, owner: str, ttl: float) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def renew(self, device_ids: Iterable[str], owner: str, ttl: float) -> List[str]:
+        """Extend leases still held by owner, returning the ones kept"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def release(self, device_id: str, owner: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def owners(self) -> Dict[str, str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def heartbeat(self, worker_id: str, url: str, ttl: float):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def workers(self) -> Dict[str, str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def remove_worker(self, worker_id: str):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+class MemoryLeaseStore(LeaseStore):
+    """In-process lease store, for single-process deployments and tests"""
+
+    def __init__(self):
+        self._leases: Dict[str, Tuple[str, float]] = {}
+        self._workers: Dict[str, Tuple[str, float]] = {}
+
+    @staticmethod
+    def _live(entries: Dict[str, Tuple[str, float]]) -> Dict[str, str]:
+        now = time.monotonic()
+        return {key: value for key, (value, expires) in entries.items() if expires > now}
+
+    async def acquire(self, device_id: str, owner: str, ttl: float) -> bool:
+        current = self._live(self._leases).get(device_id)
+        if current not in (None, owner):
+            return False
+        self._leases[device_id] = (owner, time.monotonic() + ttl)
+        return True
+
+    async def renew(self, device_ids: Iterable[str], owner: str, ttl: float) -> List[str]:
+        live = self._live(self._leases)
+        kept = [device_id for device_id in device_ids if live.get(device_id) == owner]
+        for device_id in kept:
+            self._leases[device_id] = (owner, time.monotonic() + ttl)
+        return kept
+
+    async def release(self, device_id: str, owner: str):
+        if self._live(self._leases).get(device_id) == owner:
+            del self._leases[device_id]
+
+    async def owners(self) -> Dict[str, str]:
+        return self._live(self._leases)
+
+    async def heartbeat(self, worker_id: str, url: str, ttl: float):
+        self._workers[worker_id] = (url, time.monotonic() + ttl)
+
+    async def workers(self) -> Dict[str, str]:
+        return self._live(self._workers)
+
+    async def remove_worker(self, worker_id: str):
+        self._workers.pop(worker_id, None)
+
+class RedisLeaseStore(LeaseStore):
+    """Leases as Redis keys with a PX expiry
+
+    Renew and release are compare-and-set Lua scripts so a worker can never
+    extend or drop a lease another worker took over after it expired.
+    """
+
+    RENEW = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('pexpire', KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+
+    RELEASE = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, url: str = None, prefix: str = None, client=None):
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.from_url(url or settings.REDIS_URL, decode_responses=True)
+        self.redis = client
+        self.prefix = prefix or settings.SHARD_KEY_PREFIX
+        self._renew = self.redis.register_script(self.RENEW)
+        self._release = self.redis.register_script(self.RELEASE)
+
+    def _lease_key(self, device_id: str) -> str:
+        return f"{self.prefix}lease:{device_id}"
+
+    def _worker_key(self, worker_id: str) -> str:
+        return f"{self.prefix}worker:{worker_id}"
+
+    async def acquire(self, device_id: str, owner: str, ttl: float) -> bool:
+        key = self._lease_key(device_id)
+        if await self.redis.set(key, owner, nx=True, px=int(ttl * 1000)):
+            return True
+        # Already ours (e.g. re-claim after a restart within the TTL)
+        return bool(await self._renew(keys=[key], args=[owner, int(ttl * 1000)]))
+
+    async def renew(self, device_ids: Iterable[str], owner: str, ttl: float) -> List[str]:
+        device_ids = list(device_ids)
+        if not device_ids:
+            return []
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for device_id in device_ids:
+                await self._renew(
+                    keys=[self._lease_key(device_id)],
+                    args=[owner, int(ttl * 1000)],
+                    client=pipe
+                )
+            results = await pipe.execute()
+        return [device_id for device_id, kept in zip(device_ids, results) if kept]
+
+    async def release(self, device_id: str, owner: str):
+        await self._release(keys=[self._lease_key(device_id)], args=[owner])
+
+    async def _scan(self, kind: str) -> Dict[str, str]:
+        pattern = f"{self.prefix}{kind}:"
+        keys = [key async for key in self.redis.scan_iter(match=f"{pattern}*", count=500)]
+        if not keys:
+            return {}
+        values = await self.redis.mget(keys)
+        return {
+            key[len(pattern):]: value
+            for key, value in zip(keys, values)
+            if value is not None
+        }
+
+    async def owners(self) -> Dict[str, str]:
+        return await self._scan("lease")
+
+    async def heartbeat(self, worker_id: str, url: str, ttl: float):
+        await self.redis.set(self._worker_key(worker_id), url, px=int(ttl * 1000))
+
+    async def workers(self) -> Dict[str, str]:
+        return await self._scan("worker")
+
+    async def remove_worker(self, worker_id: str):
+        await self.redis.delete(self._worker_key(worker_id))
+
+    async def close(self):
+        await self.redis.aclose()
+
+def create_lease_store(backend: str = None) -> Optional[LeaseStore]:
+    """Lease store for SHARD_BACKEND, or None when sharding is disabled"""
+    backend = backend if backend is not None else settings.SHARD_BACKEND
+    if not backend:
+        return None
+    if backend == "memory":
+        return MemoryLeaseStore()
+    if backend == "redis":
+        return RedisLeaseStore()
+    raise ValueError(f"Unsupported shard backend: {backend}")
+
+class ShardCoordinator:
+    """Claims, renews and hands over device ownership for one worker
+
+    Every SHARD_RENEW_INTERVAL seconds the worker renews its heartbeat and
+    leases, drops devices whose lease it lost, and claims unowned devices.
+    Devices are spread with rendezvous hashing over the live workers, so
+    a worker only claims the devices that prefer it, unless the preferred
+    worker is gone; when a worker dies its devices fail over to the
+    survivors once the leases expire, and when a worker joins the owners
+    hand over the devices that now prefer it.
+    """
+
+    def __init__(self, store: LeaseStore, worker_id: str, url: str,
+                 list_devices: Callable[[], Awaitable[Iterable[Any]]],
+                 on_acquire: Callable[[Any], Awaitable],
+                 on_release: Callable[[Any], Awaitable],
+                 ttl: float = None, renew_interval: float = None):
+        self.store = store
+        self.worker_id = worker_id
+        self.url = url.rstrip("/")
+        self.list_devices = list_devices
+        self.on_acquire = on_acquire
+        self.on_release = on_release
+        self.ttl = ttl or settings.SHARD_LEASE_TTL
+        self.renew_interval = renew_interval or settings.SHARD_RENEW_INTERVAL
+        self._owned: Dict[str, Any] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def owned(self) -> List[str]:
+        return list(self._owned)
+
+    def owns(self, device_id: str) -> bool:
+        return device_id in self._owned
+
+    @staticmethod
+    def preferred_worker(device_id: str, workers: Iterable[str]) -> Optional[str]:
+        """Rendezvous hash: the live worker with the highest score wins"""
+        return max(
+            workers,
+            key=lambda worker: zlib.crc32(f"{worker}:{device_id}".encode()),
+            default=None
+        )
+
+    async def start(self):
+        await self.tick()
+        self._task = asyncio.create_task(self._run(), name=f"shard-{self.worker_id}")
+
+    async def stop(self):
+        """Stop renewing and release every lease so survivors take over at once"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.store.remove_worker(self.worker_id)
+        except Exception as e:
+            logger.error(f"Worker deregistration error: {str(e)}")
+        for device_id in list(self._owned):
+            await self.release(device_id)
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+    async def claim(self, device) -> bool:
+        """Take ownership of a device if nobody else holds it"""
+        if device.id in self._owned:
+            return True
+        if not await self.store.acquire(device.id, self.worker_id, self.ttl):
+            return False
+        self._owned[device.id] = device
+        try:
+            await self.on_acquire(device)
+        except Exception as e:
+            logger.error(f"Failed to start claimed device {device.id}: {str(e)}")
+            await self.release(device.id)
+            return False
+        logger.info(f"Worker {self.worker_id} claimed device {device.id}")
+        return True
+
+    async def release(self, device_id: str):
+        """Stop a device locally and give up its lease"""
+        device = self._owned.pop(device_id, None)
+        if device is None:
+            return
+        try:
+            await self.on_release(device)
+        except Exception as e:
+            logger.error(f"Failed to stop released device {device_id}: {str(e)}")
+        try:
+            await self.store.release(device_id, self.worker_id)
+        except Exception as e:
+            logger.error(f"Lease release error for {device_id}: {str(e)}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.renew_interval)
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Shard heartbeat error: {str(e)}")
+
+    async def tick(self):
+        """One heartbeat: renew, drop lost leases, rebalance and claim"""
+        await self.store.heartbeat(self.worker_id, self.url, self.ttl)
+        kept = set(await self.store.renew(self._owned, self.worker_id, self.ttl))
+        for device_id in [d for d in self._owned if d not in kept]:
+            # Lease expired (e.g. we stalled past the TTL); someone else may run it now
+            logger.warning(f"Worker {self.worker_id} lost lease for {device_id}")
+            device = self._owned.pop(device_id)
+            await self.on_release(device)
+
+        workers = list(await self.store.workers())
+        owners = await self.store.owners()
+        for device_id in list(self._owned):
+            preferred = self.preferred_worker(device_id, workers)
+            if preferred and preferred != self.worker_id:
+                await self.release(device_id)
+
+        for device in await self.list_devices():
+            if device.id in owners or device.id in self._owned:
+                continue
+            if self.preferred_worker(device.id, workers) == self.worker_id:
+                await self.claim(device)
+
+    async def owner_url(self, device_id: str) -> Optional[str]:
+        """Base URL of the worker currently owning a device"""
+        if device_id in self._owned:
+            return self.url
+        owner = (await self.store.owners()).get(device_id)
+        if owner is None:
+            return None
+        return (await self.store.workers()).get(owner)
+
+    def _client(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=settings.SHARD_FORWARD_TIMEOUT),
+                headers={"X-Shard-Forwarded": self.worker_id}
+            )
+        return self._session
+
+    async def forward(self, url: str, method: str, path: str,
+                      params: Dict[str, str] = None, body: bytes = None,
+                      headers: Dict[str, str] = None) -> Tuple[int, bytes, str]:
+        """Replay an API request on another worker"""
+        async with self._client().request(
+            method, f"{url}{path}", params=params, data=body, headers=headers
+        ) as response:
+            return response.status, await response.read(), response.content_type
+
+    async def gather(self, path: str) -> Dict[str, Any]:
+        """GET a path on every live worker, keyed by worker id"""
+        workers = await self.store.workers()
+
+        async def fetch(worker_id: str, url: str):
+            try:
+                async with self._client().get(f"{url}{path}", params={"local": "1"}) as response:
+                    return worker_id, await response.json()
+            except Exception as e:
+                logger.error(f"Status fetch from {worker_id} failed: {str(e)}")
+                return worker_id, {"error": str(e)}
+
+        results = await asyncio.gather(*(fetch(w, u) for w, u in workers.items()))
+        return dict(results)
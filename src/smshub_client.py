@@ -12,10 +12,8 @@ class SMSHubClient:
     async def session(self):
         if self._session is None:
             self._session = aiohttp.ClientSession(
-                headers={
-                    'User-Agent': 'SMSBridge/1.0',
-                    'Content-Encoding': 'gzip'
-                }
+                # Bodies are sent uncompressed, so no Content-Encoding header
+                headers={'User-Agent': 'SMSBridge/1.0'}
             )
         return self._session
 
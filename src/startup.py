@@ -0,0 +1,48 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from src.metrics import STARTUP_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class StartupTimer:
+    """Wall-clock time of each startup phase
+
+    Phases are recorded in the order they ran. Together with the import
+    phase they show where a restart spends its time, which is how long
+    devices go unpolled during a deploy or after a crash.
+    """
+
+    def __init__(self, started: Optional[float] = None):
+        self.started = started if started is not None else time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.finished: Optional[float] = None
+
+    def record(self, name: str, seconds: float):
+        self.phases[name] = seconds
+        STARTUP_SECONDS.labels(name).set(seconds)
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def finish(self):
+        self.finished = time.perf_counter()
+        total = self.finished - self.started
+        STARTUP_SECONDS.labels("total").set(total)
+        logger.info(
+            f"Startup took {total * 1000:.0f} ms: "
+            + ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.phases.items())
+        )
+
+    def report(self) -> Dict:
+        return {
+            "total_ms": round((self.finished - self.started) * 1000, 1) if self.finished else None,
+            "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()}
+        }
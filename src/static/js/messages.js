@@ -48,20 +48,47 @@ function debounce(func, wait) {
     };
 }
 
-async function applyFilters() {
+// Cursors of the pages before the current one, for "Previous"
+let pageCursors = [];
+let currentCursor = null;
+let nextCursor = null;
+
+function applyFilters() {
+    pageCursors = [];
+    return loadPage(null);
+}
+
+function changePage(direction) {
+    if (direction > 0 && nextCursor) {
+        pageCursors.push(currentCursor);
+        return loadPage(nextCursor);
+    }
+    if (direction < 0 && pageCursors.length) {
+        return loadPage(pageCursors.pop());
+    }
+}
+
+async function loadPage(cursor) {
     const filters = {
         device: document.getElementById('deviceFilter').value,
         status: document.getElementById('statusFilter').value,
         startDate: document.getElementById('startDate').value,
         endDate: document.getElementById('endDate').value,
-        search: document.getElementById('searchFilter').value
+        search: document.getElementById('searchFilter').value,
+        cursor: cursor || ''
     };
+    // Empty values would fail date validation and match nothing
+    const params = new URLSearchParams(
+        Object.entries(filters).filter(([, value]) => value !== '')
+    );
 
     try {
-        const response = await fetch('/api/messages/filter?' + new URLSearchParams(filters));
+        const response = await fetch('/api/messages/filter?' + params);
         if (!response.ok) throw new Error('Failed to filter messages');
         
         const data = await response.json();
+        currentCursor = cursor;
+        nextCursor = data.pagination.next_cursor;
         updateMessageTable(data.messages);
         updatePagination(data.pagination);
         
@@ -251,13 +278,20 @@ function addNewMessage(message) {
     tbody.insertBefore(tr, tbody.firstChild);
 }
 
+function updateMessageTable(messages) {
+    document.querySelector('table tbody').innerHTML = '';
+    // addNewMessage prepends, so add oldest first
+    messages.slice().reverse().forEach(addNewMessage);
+}
+
 function updatePagination(pagination) {
-    // Update pagination UI
-    document.querySelector('.pagination-info').textContent = 
-        `Showing ${pagination.start} to ${pagination.end} of ${pagination.total} messages`;
+    // Keyset paging: no total count, just whether there is more
+    const start = pageCursors.length * pagination.limit + 1;
+    document.querySelector('.pagination-info').textContent = pagination.count
+        ? `Showing ${start} to ${start + pagination.count - 1}`
+        : 'No messages';
         
     // Update buttons
-    document.querySelector('.pagination-prev').disabled = pagination.current === 1;
-    document.querySelector('.pagination-next').disabled = 
-        pagination.current === pagination.total_pages;
+    document.querySelector('.pagination-prev').disabled = pageCursors.length === 0;
+    document.querySelector('.pagination-next').disabled = !pagination.next_cursor;
 } 
\ No newline at end of file
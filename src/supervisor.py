@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import random
+import time
+import zlib
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+from src.config import settings
+from src.metrics import AT_COMMAND_SECONDS, POLL_SECONDS
+from src.models import Device
+from src.tracing import PARSED, SMSTrace
+
+logger = logging.getLogger(__name__)
+
+# Per-device overrides (see DeviceOverrides) win over the global settings
+def fast_interval(device: Device) -> float:
+    return device.config.get('poll_interval_fast', settings.MESSAGE_CHECK_INTERVAL_FAST)
+
+def idle_interval(device: Device) -> float:
+    return device.config.get('poll_interval', settings.MESSAGE_CHECK_INTERVAL)
+
+def signal_interval(device: Device) -> float:
+    return device.config.get('signal_interval', settings.SIGNAL_CHECK_INTERVAL)
+
+class _DeviceState:
+    """Scheduling state for one supervised device"""
+
+    __slots__ = ('device', 'task', 'interval', 'hot_until', 'next_signal',
+                 'failures', 'restarts', 'wake', 'poll_seconds')
+
+    def __init__(self, device: Device):
+        self.device = device
+        self.task: Optional[asyncio.Task] = None
+        self.interval = fast_interval(device)
+        self.hot_until = 0.0
+        self.next_signal = 0.0
+        self.failures = 0
+        self.restarts = 0
+        self.wake = asyncio.Event()
+        self.poll_seconds = POLL_SECONDS.labels(device.id)
+
+class DeviceSupervisor:
+    """Owns one poll task per device
+
+    Poll intervals adapt per device: after activity (new messages, an
+    outbound send or an expected activation code) the device is polled
+    every MESSAGE_CHECK_INTERVAL_FAST seconds, then the interval backs
+    off towards MESSAGE_CHECK_INTERVAL while it stays idle. Loops start
+    at a per-device offset and jitter every sleep so a rack of modems
+    doesn't poll in lockstep. Devices that fail repeatedly are torn down
+    and re-initialized with exponential backoff. Interval settings are read
+    per poll, from the device's config first, so they can change at runtime.
+    """
+
+    def __init__(self, get_manager: Callable[[Device], object], ingest,
+                 on_update: Optional[Callable[[Device], Awaitable]] = None):
+        self.get_manager = get_manager
+        self.ingest = ingest
+        self.on_update = on_update
+        self._states: Dict[str, _DeviceState] = {}
+
+    def __contains__(self, device_id: str) -> bool:
+        return device_id in self._states
+
+    def start(self, device: Device):
+        """Begin supervising a device (initializes it first)"""
+        state = self._states.get(device.id)
+        if state and state.task and not state.task.done():
+            return
+        state = _DeviceState(device)
+        self._states[device.id] = state
+        state.task = asyncio.create_task(self._run(state), name=f"supervisor-{device.id}")
+
+    async def stop_device(self, device_id: str):
+        """Stop supervising a device; the caller cleans up the manager side"""
+        state = self._states.pop(device_id, None)
+        if state and state.task:
+            state.task.cancel()
+            await asyncio.gather(state.task, return_exceptions=True)
+        POLL_SECONDS.forget(0, device_id)
+        AT_COMMAND_SECONDS.forget(0, device_id)
+
+    async def stop(self):
+        for device_id in list(self._states):
+            await self.stop_device(device_id)
+
+    def mark_active(self, device_id: str, seconds: Optional[float] = None):
+        """Poll a device at the fast rate for a while (e.g. pending activation)"""
+        state = self._states.get(device_id)
+        if not state:
+            return
+        state.hot_until = max(
+            state.hot_until,
+            time.monotonic() + (seconds or settings.POLL_HOT_WINDOW)
+        )
+        state.interval = fast_interval(state.device)
+        state.wake.set()
+
+    async def reconfigure(self, change=None):
+        """Bring poll and signal schedules within changed interval settings
+
+        Sleeps in progress are not cut short, so a change doesn't make the
+        whole rack poll at the same instant.
+        """
+        now = time.monotonic()
+        for state in self._states.values():
+            device = state.device
+            state.interval = min(max(state.interval, fast_interval(device)), idle_interval(device))
+            state.next_signal = min(state.next_signal, now + signal_interval(device))
+
+    def status(self) -> Dict[str, Dict]:
+        """Current scheduling state per device"""
+        now = time.monotonic()
+        return {
+            device_id: {
+                "interval": round(state.interval, 2),
+                "hot": state.hot_until > now,
+                "failures": state.failures,
+                "restarts": state.restarts
+            }
+            for device_id, state in self._states.items()
+        }
+
+    @staticmethod
+    def _offset(device_id: str, interval: float) -> float:
+        """Stable per-device start offset spreading loops over one interval"""
+        return (zlib.crc32(device_id.encode()) % 1000) / 1000 * interval
+
+    @staticmethod
+    def _jitter(interval: float) -> float:
+        return interval * random.uniform(0.9, 1.1)
+
+    def _next_interval(self, state: _DeviceState, got_messages: bool) -> float:
+        now = time.monotonic()
+        if got_messages:
+            state.hot_until = max(state.hot_until, now + settings.POLL_HOT_WINDOW)
+        if got_messages or state.hot_until > now:
+            state.interval = fast_interval(state.device)
+        else:
+            state.interval = min(
+                state.interval * settings.POLL_BACKOFF_FACTOR,
+                idle_interval(state.device)
+            )
+        return state.interval
+
+    async def _sleep(self, state: _DeviceState, seconds: float):
+        """Sleep, waking early if the device is marked active"""
+        state.wake.clear()
+        try:
+            await asyncio.wait_for(state.wake.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self, state: _DeviceState):
+        device = state.device
+        manager = self.get_manager(device)
+        await asyncio.sleep(self._offset(device.id, idle_interval(device)))
+
+        while True:
+            if not await self._initialize(state, manager):
+                continue
+            try:
+                await self._poll_loop(state, manager)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Supervisor loop error for {device.id}: {str(e)}")
+
+            # Too many failures: tear down and re-initialize after a backoff
+            state.restarts += 1
+            device.status = "error"
+            await self._notify(device)
+            await self._cleanup(device, manager)
+            await asyncio.sleep(self._backoff(state))
+
+    async def _cleanup(self, device: Device, manager):
+        try:
+            await manager.cleanup(device)
+        except Exception as e:
+            logger.error(f"Cleanup before restart failed for {device.id}: {str(e)}")
+
+    def _backoff(self, state: _DeviceState) -> float:
+        delay = settings.DEVICE_SCAN_INTERVAL * (2 ** min(state.restarts, 10))
+        return self._jitter(min(delay, settings.SUPERVISOR_MAX_BACKOFF))
+
+    async def _initialize(self, state: _DeviceState, manager) -> bool:
+        device = state.device
+        try:
+            initialized = await manager.initialize(device)
+        except Exception as e:
+            logger.error(f"Initialization error for {device.id}: {str(e)}")
+            initialized = False
+
+        if initialized:
+            state.failures = 0
+            state.interval = fast_interval(device)
+            device.status = "online"
+            device.last_seen = datetime.utcnow()
+            await self._notify(device)
+            return True
+
+        # Release whatever the failed attempt opened (ports, provider clients)
+        await self._cleanup(device, manager)
+        state.restarts += 1
+        device.status = "error"
+        await self._notify(device)
+        await asyncio.sleep(self._backoff(state))
+        return False
+
+    async def _poll_loop(self, state: _DeviceState, manager):
+        device = state.device
+        while state.failures < settings.SUPERVISOR_MAX_FAILURES:
+            started = time.monotonic()
+            got_messages = False
+            try:
+                messages = await manager.check_messages(device)
+                if messages:
+                    got_messages = True
+                    parsed = time.monotonic()
+                    for sms in messages:
+                        sms.trace = SMSTrace(device.type, started)
+                        sms.trace.mark(PARSED, parsed)
+                    await self.ingest.put_many(messages)
+
+                if started >= state.next_signal:
+                    signal = await manager.get_signal_strength(device)
+                    state.next_signal = started + signal_interval(device)
+                    if signal is not None:
+                        device.signal_strength = int(signal)
+                        await self._notify(device)
+
+                state.failures = 0
+                state.restarts = 0
+                device.last_seen = datetime.utcnow()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                state.failures += 1
+                logger.error(f"Poll error for {device.id} ({state.failures}): {str(e)}")
+
+            interval = self._next_interval(state, got_messages)
+            elapsed = time.monotonic() - started
+            state.poll_seconds.observe(elapsed)
+            await self._sleep(state, max(self._jitter(interval) - elapsed, 0))
+
+    async def _notify(self, device: Device):
+        if self.on_update:
+            try:
+                await self.on_update(device)
+            except Exception as e:
+                logger.error(f"Device update callback error: {str(e)}")
@@ -0,0 +1,120 @@
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+from src.config import settings
+
+# Stages an inbound SMS passes through, in order
+DETECTED, PARSED, QUEUED, PERSISTED, PUSHED, ACKED = range(6)
+STAGES = ("detected", "parsed", "queued", "persisted", "pushed", "acked")
+
+# Reported segments: each stage is measured from the previous one
+SEGMENTS = STAGES[1:] + ("total",)
+PERCENTILES = (50, 90, 99)
+
+class SMSTrace:
+    """Monotonic timestamps of one SMS at each pipeline stage"""
+
+    __slots__ = ('device_type', 'marks')
+
+    def __init__(self, device_type: str, detected: Optional[float] = None):
+        self.device_type = device_type
+        self.marks = array('d', bytes(8 * len(STAGES)))
+        self.marks[DETECTED] = detected or time.monotonic()
+
+    def mark(self, stage: int, at: Optional[float] = None):
+        self.marks[stage] = at or time.monotonic()
+
+    def durations(self) -> Dict[str, float]:
+        """Seconds spent reaching each stage from the previous one"""
+        result = {}
+        previous = self.marks[DETECTED]
+        for stage in range(PARSED, len(STAGES)):
+            mark = self.marks[stage]
+            if not mark:
+                continue
+            result[STAGES[stage]] = mark - previous
+            previous = mark
+        if self.marks[ACKED]:
+            result["total"] = self.marks[ACKED] - self.marks[DETECTED]
+        return result
+
+class _Ring:
+    """Fixed-size float buffer keeping the most recent samples"""
+
+    __slots__ = ('values', 'index', 'count')
+
+    def __init__(self, size: int):
+        self.values = array('f', bytes(4 * size))
+        self.index = 0
+        self.count = 0
+
+    def add(self, value: float):
+        self.values[self.index] = value
+        self.index = (self.index + 1) % len(self.values)
+        self.count = min(self.count + 1, len(self.values))
+
+    def samples(self) -> List[float]:
+        return sorted(self.values[:self.count])
+
+class LatencyTracker:
+    """Per device type and segment latency samples for finished traces
+
+    Each (device type, segment) keeps the last TRACE_BUFFER_SIZE samples in
+    a float32 ring buffer; percentiles are computed when requested.
+    """
+
+    def __init__(self, size: int = None):
+        self.size = size or settings.TRACE_BUFFER_SIZE
+        self._rings: Dict[str, Dict[str, _Ring]] = {}
+        self.failed: Dict[str, int] = {}
+
+    def reset(self):
+        self._rings.clear()
+        self.failed.clear()
+
+    def _rings_for(self, device_type: str) -> Dict[str, _Ring]:
+        rings = self._rings.get(device_type)
+        if rings is None:
+            rings = self._rings[device_type] = {
+                segment: _Ring(self.size) for segment in SEGMENTS
+            }
+        return rings
+
+    def record(self, trace: SMSTrace):
+        rings = self._rings_for(trace.device_type)
+        for segment, seconds in trace.durations().items():
+            rings[segment].add(seconds)
+        if not trace.marks[ACKED]:
+            self.failed[trace.device_type] = self.failed.get(trace.device_type, 0) + 1
+
+    def record_many(self, traces: Iterable[Optional[SMSTrace]]):
+        for trace in traces:
+            if trace is not None:
+                self.record(trace)
+
+    @staticmethod
+    def _summary(samples: List[float]) -> Dict[str, float]:
+        summary = {"count": len(samples)}
+        if samples:
+            for p in PERCENTILES:
+                index = min(len(samples) - 1, int(len(samples) * p / 100))
+                summary[f"p{p}"] = round(samples[index] * 1000, 1)
+            summary["max"] = round(samples[-1] * 1000, 1)
+        return summary
+
+    def percentiles(self, device_type: Optional[str] = None) -> Dict[str, Dict]:
+        """Latency in milliseconds per device type and segment"""
+        return {
+            kind: {
+                "segments": {
+                    segment: self._summary(ring.samples())
+                    for segment, ring in rings.items()
+                },
+                "failed": self.failed.get(kind, 0)
+            }
+            for kind, rings in self._rings.items()
+            if device_type is None or kind == device_type
+        }
+
+tracker = LatencyTracker()
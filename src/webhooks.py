@@ -0,0 +1,212 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Iterable, Mapping, Optional
+
+from src.models import Device, SMS
+from src.tracing import PARSED, SMSTrace
+
+logger = logging.getLogger(__name__)
+
+class WebhookError(Exception):
+    """Raised when an inbound webhook can't be accepted"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+class WebhookProvider:
+    """Provider-specific parsing and signature verification"""
+
+    name: str = None
+    # Field names in the provider's inbound payload
+    id_field: str = None
+    from_field: str = None
+    to_field: str = None
+    text_field: str = None
+
+    # Response body the provider expects on success
+    ack_body: str = ""
+    ack_media_type: str = "text/plain"
+
+    def secret(self, device: Device) -> Optional[str]:
+        """Signing secret configured for the device's account"""
+        return device.config.get('webhook_secret') or device.config.get('auth_token')
+
+    def verify(self, url: str, params: Mapping[str, str],
+               headers: Mapping[str, str], secret: str) -> bool:
+        raise NotImplementedError
+
+    def received_at(self, params: Mapping[str, str]) -> datetime:
+        return datetime.utcnow()
+
+    def parse(self, device: Device, params: Mapping[str, str]) -> SMS:
+        try:
+            return SMS(
+                device_id=device.id,
+                from_number=params[self.from_field],
+                to_number=params[self.to_field],
+                text=params.get(self.text_field, ""),
+                received_at=self.received_at(params),
+                delivered=False,
+                external_id=f"{self.name}:{params[self.id_field]}"
+            )
+        except KeyError as e:
+            raise WebhookError(400, f"Missing field {e.args[0]}")
+
+class TwilioWebhook(WebhookProvider):
+    """Twilio Messaging webhook (X-Twilio-Signature, HMAC-SHA1)"""
+
+    name = 'twilio'
+    id_field = 'MessageSid'
+    from_field = 'From'
+    to_field = 'To'
+    text_field = 'Body'
+    # Empty TwiML so Twilio doesn't send an auto-reply
+    ack_body = '<?xml version="1.0" encoding="UTF-8"?><Response></Response>'
+    ack_media_type = "application/xml"
+
+    @staticmethod
+    def signature(url: str, params: Mapping[str, str], secret: str) -> str:
+        data = url + ''.join(f"{key}{params[key]}" for key in sorted(params))
+        digest = hmac.new(secret.encode(), data.encode(), hashlib.sha1).digest()
+        return base64.b64encode(digest).decode()
+
+    def verify(self, url, params, headers, secret) -> bool:
+        provided = headers.get('x-twilio-signature', '')
+        return hmac.compare_digest(provided, self.signature(url, params, secret))
+
+class NexmoWebhook(WebhookProvider):
+    """Vonage/Nexmo inbound SMS webhook (signed with the `sig` parameter)"""
+
+    name = 'nexmo'
+    id_field = 'messageId'
+    from_field = 'msisdn'
+    to_field = 'to'
+    text_field = 'text'
+
+    def secret(self, device: Device) -> Optional[str]:
+        return device.config.get('signature_secret') or device.config.get('api_secret')
+
+    @staticmethod
+    def signature(params: Mapping[str, str], secret: str) -> str:
+        data = ''.join(
+            f"&{key}={params[key]}" for key in sorted(params) if key != 'sig'
+        )
+        return hashlib.md5((data + secret).encode()).hexdigest()
+
+    def verify(self, url, params, headers, secret) -> bool:
+        provided = params.get('sig', '').lower()
+        return hmac.compare_digest(provided, self.signature(params, secret))
+
+    def received_at(self, params) -> datetime:
+        timestamp = params.get('message-timestamp')
+        if timestamp:
+            try:
+                return datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
+            except ValueError:
+                pass
+        return datetime.utcnow()
+
+class PlivoWebhook(WebhookProvider):
+    """Plivo message webhook (X-Plivo-Signature-V2, HMAC-SHA256)"""
+
+    name = 'plivo'
+    id_field = 'MessageUUID'
+    from_field = 'From'
+    to_field = 'To'
+    text_field = 'Text'
+
+    @staticmethod
+    def signature(url: str, nonce: str, secret: str) -> str:
+        base_url = url.split('?', 1)[0]
+        digest = hmac.new(
+            secret.encode(), (base_url + nonce).encode(), hashlib.sha256
+        ).digest()
+        return base64.b64encode(digest).decode()
+
+    def verify(self, url, params, headers, secret) -> bool:
+        provided = headers.get('x-plivo-signature-v2', '')
+        nonce = headers.get('x-plivo-signature-v2-nonce', '')
+        return hmac.compare_digest(provided, self.signature(url, nonce, secret))
+
+WEBHOOK_PROVIDERS: Dict[str, WebhookProvider] = {
+    'twilio': TwilioWebhook(),
+    'nexmo': NexmoWebhook(),
+    'plivo': PlivoWebhook()
+}
+
+def normalize_number(number: Optional[str]) -> str:
+    """Digits of a phone number: Twilio sends +15550001111, Nexmo 15550001111"""
+    return ''.join(ch for ch in (number or '') if ch.isdigit())
+
+def parse_twilio_date(value: str) -> datetime:
+    """Parse Twilio's RFC 2822 dates into naive UTC datetimes"""
+    parsed = parsedate_to_datetime(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.replace(tzinfo=None) - parsed.utcoffset()
+    return parsed
+
+class VoipWebhookHandler:
+    """Turns provider webhook calls into ingest submissions"""
+
+    def __init__(self, voip_managers: Callable[[], Iterable], ingest, base_url: str = ""):
+        self.voip_managers = voip_managers
+        self.ingest = ingest
+        self.base_url = base_url.rstrip('/')
+
+    def public_url(self, path: str, query: str, request_url: str) -> str:
+        """URL the provider signed; differs from request_url behind a proxy"""
+        if not self.base_url:
+            return request_url
+        return f"{self.base_url}{path}" + (f"?{query}" if query else "")
+
+    def matches(self, provider_name: str, device, params: Mapping[str, str]) -> bool:
+        """Whether a webhook is addressed to a device, e.g. one another worker runs"""
+        provider = WEBHOOK_PROVIDERS.get(provider_name)
+        if not provider or (device.config or {}).get('service_type') != provider.name:
+            return False
+        to_number = normalize_number(params.get(provider.to_field))
+        return bool(to_number) and to_number == normalize_number(device.phone_number)
+
+    def find_device(self, provider: str, to_number: Optional[str]) -> Optional[Device]:
+        """Search every VoIP manager instance (shard) on this worker for the number"""
+        for manager in self.voip_managers():
+            device = manager.find_device(provider, to_number)
+            if device:
+                return device
+        return None
+
+    def handle(self, provider_name: str, url: str, params: Mapping[str, str],
+               headers: Mapping[str, str]) -> WebhookProvider:
+        """Verify and enqueue an inbound message, returning the provider"""
+        trace = SMSTrace("voip")
+        provider = WEBHOOK_PROVIDERS.get(provider_name)
+        if not provider:
+            raise WebhookError(404, f"Unknown provider: {provider_name}")
+
+        to_number = params.get(provider.to_field)
+        device = self.find_device(provider.name, to_number)
+        if not device:
+            raise WebhookError(404, f"No device for number {to_number}")
+
+        secret = provider.secret(device)
+        if not secret or not provider.verify(url, params, headers, secret):
+            logger.warning(f"Rejected {provider.name} webhook for {device.id}: bad signature")
+            raise WebhookError(403, "Invalid signature")
+
+        sms = provider.parse(device, params)
+        sms.trace = trace
+        trace.mark(PARSED)
+        try:
+            if not self.ingest.submit(sms):
+                logger.debug(f"Duplicate {provider.name} message {sms.external_id}")
+        except asyncio.QueueFull:
+            # Queue full: a non-2xx makes the provider retry later
+            raise WebhookError(503, "Ingest queue full")
+        return provider
@@ -0,0 +1,13 @@
+"""Shared builders for the test modules"""
+from datetime import datetime
+
+from src.models import Device
+
+def make_device(device_id: str = "dev1", device_type: str = "huawei", status: str = "offline",
+                **fields) -> Device:
+    """A Device for tests; the phone number ends in the digits of the id (dev-0002 -> +15550000002)"""
+    digits = ''.join(ch for ch in device_id if ch.isdigit())[-7:]
+    fields.setdefault("phone_number", f"+1555{digits:0>7}")
+    now = datetime.utcnow()
+    return Device(id=device_id, type=device_type, status=status,
+                  first_seen=now, last_seen=now, **fields)
@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+import pytest
+
+from src.admission import (
+    AdmissionMiddleware, MemoryClientLimiter, RedisClientLimiter, client_key, route_class
+)
+
+LIMITS = {
+    "control": {"rate": 1, "burst": 2, "concurrency": 1},
+    "api": {"rate": 100, "burst": 100, "concurrency": 100}
+}
+
+def http_scope(method, path, headers=(), client=("10.0.0.1", 5000)):
+    return {"type": "http", "method": method, "path": path, "headers": list(headers), "client": client}
+
+async def call(app, scope):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    start = sent[0]
+    return start["status"], dict(start["headers"]), json.loads(sent[1]["body"] or b"null")
+
+def make_app(release: asyncio.Event = None):
+    async def app(scope, receive, send):
+        if release:
+            await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+    return app
+
+@pytest.fixture(params=["memory", "redis"])
+async def limiter(request):
+    if request.param == "memory":
+        yield MemoryClientLimiter()
+        return
+    fakeredis = pytest.importorskip("fakeredis")
+    limiter = RedisClientLimiter(client=fakeredis.FakeAsyncRedis(decode_responses=True), prefix="test:")
+    yield limiter
+    await limiter.close()
+
+class TestClassification:
+    def test_route_classes(self):
+        assert route_class("POST", "/api/batch") == "control"
+        assert route_class("DELETE", "/api/devices/modem-1") == "control"
+        assert route_class("GET", "/api/devices") == "api"
+        assert route_class("POST", "/api/webhooks/voip/twilio") is None
+        assert route_class("GET", "/api/admin/loop") is None
+        assert route_class("GET", "/metrics") is None
+
+    def test_client_key_prefers_verified_credentials_over_address(self):
+        genuine = {"smsb_abc123_secret", "jwt.token.here"}.__contains__
+        key = http_scope("GET", "/api/x", [(b"x-api-key", b"smsb_abc123_secret")])
+        token = http_scope("GET", "/api/x", [(b"authorization", b"Bearer jwt.token.here")])
+        assert client_key(key, verify=genuine) == "key:abc123"
+        assert client_key(token, verify=genuine).startswith("token:")
+        # Made-up credentials don't buy a fresh bucket
+        forged = http_scope("GET", "/api/x", [(b"x-api-key", b"smsb_abc123_guess")])
+        assert client_key(forged, verify=genuine) == "ip:10.0.0.1"
+        assert client_key(key) == "ip:10.0.0.1"
+        forwarded = http_scope("GET", "/api/x", [(b"x-forwarded-for", b"203.0.113.9, 10.0.0.2")])
+        assert client_key(forwarded) == "ip:10.0.0.1"
+        assert client_key(forwarded, trust_forwarded=True) == "ip:203.0.113.9"
+
+@pytest.mark.asyncio
+class TestAdmission:
+    async def test_rate_limit_is_per_client_and_class(self, limiter):
+        app = AdmissionMiddleware(make_app(), limiter=limiter, limits=LIMITS)
+
+        statuses = [(await call(app, http_scope("POST", "/api/batch")))[0] for _ in range(3)]
+        assert statuses == [200, 200, 429]
+
+        status, headers, body = await call(app, http_scope("POST", "/api/batch"))
+        assert status == 429 and int(headers[b"retry-after"]) >= 1
+        # Another client, and reads by the same client, are unaffected
+        assert (await call(app, http_scope("POST", "/api/batch", client=("10.0.0.2", 1))))[0] == 200
+        assert (await call(app, http_scope("GET", "/api/devices")))[0] == 200
+
+    async def test_concurrency_limit_sheds_with_503(self):
+        release = asyncio.Event()
+        app = AdmissionMiddleware(make_app(release), limits=LIMITS)
+
+        running = asyncio.create_task(call(app, http_scope("POST", "/api/batch")))
+        await asyncio.sleep(0)
+        assert app.in_flight["control"] == 1
+
+        status, headers, body = await call(app, http_scope("POST", "/api/batch"))
+        assert status == 503 and body == {"detail": "Server busy, retry shortly"}
+
+        release.set()
+        assert (await running)[0] == 200
+        assert app.in_flight["control"] == 0
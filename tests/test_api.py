@@ -1,6 +1,8 @@
+from types import SimpleNamespace
+
 import pytest
 from fastapi.testclient import TestClient
-from src.main import app
+from src.main import app, auth
 from src.models import Device, SMS
 
 @pytest.fixture
@@ -117,4 +119,16 @@ def test_message_endpoints(client):
     }
     
     response = client.get("/api/messages/filter", params=filters)
-    assert response.status_code == 200 
\ No newline at end of file
+    assert response.status_code == 200
+
+
+def test_admin_routes_require_admin_credentials(client):
+    assert client.get("/api/admin/loop").status_code == 401
+
+    user = auth.create_access_token(SimpleNamespace(id=1, username="user", is_admin=False))
+    response = client.get("/api/admin/loop", headers={"Authorization": f"Bearer {user}"})
+    assert response.status_code == 403
+
+    admin = auth.create_access_token(SimpleNamespace(id=2, username="admin", is_admin=True))
+    response = client.get("/api/admin/loop", headers={"Authorization": f"Bearer {admin}"})
+    assert response.status_code == 200
@@ -0,0 +1,237 @@
+import time
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import jwt
+import pytest
+from fastapi import HTTPException
+
+from src.auth.api_keys import ApiKeyError, ApiKeyRateLimited, ApiKeyStore, hash_key
+from src.auth.manager import AuthManager
+from src.auth.principals import PrincipalCache, Principal
+
+class FakeBus:
+    def __init__(self):
+        self.published = []
+        self.callback = None
+
+    async def publish(self, event):
+        self.published.append(event)
+
+    async def subscribe(self, callback):
+        self.callback = callback
+
+    async def close(self):
+        pass
+
+def make_user(user_id=1, is_admin=False):
+    return SimpleNamespace(id=user_id, username=f"user{user_id}", is_admin=is_admin)
+
+@pytest.fixture
+def decodes(monkeypatch):
+    calls = []
+    decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(jwt, "decode", counting_decode)
+    return calls
+
+@pytest.mark.asyncio
+class TestAuth:
+    async def test_token_is_verified_once_then_served_from_cache(self, decodes):
+        auth = AuthManager(db=None, bus=FakeBus())
+        token = auth.create_access_token(make_user(is_admin=True))
+
+        first = auth.verify_token(token)
+        second = auth.verify_token(token)
+
+        assert first == second
+        assert (first.user_id, first.username, first.is_admin) == (1, "user1", True)
+        assert len(decodes) == 1
+
+    async def test_tampered_token_misses_the_cache(self):
+        auth = AuthManager(db=None, bus=FakeBus())
+        token = auth.create_access_token(make_user())
+        auth.verify_token(token)
+
+        claims = jwt.decode(token, options={"verify_signature": False})
+        forged = jwt.encode({**claims, "adm": True}, "not-the-secret", algorithm="HS256")
+        with pytest.raises(HTTPException) as error:
+            auth.verify_token(forged)
+        assert error.value.status_code == 401
+
+    async def test_logout_revokes_token_and_publishes(self):
+        bus = FakeBus()
+        auth = AuthManager(db=None, bus=bus)
+        token = auth.create_access_token(make_user())
+
+        await auth.revoke_token(auth.verify_token(token))
+
+        with pytest.raises(HTTPException):
+            auth.verify_token(token)
+        assert bus.published[0]["jti"]
+
+    async def test_user_revocation_from_another_worker(self):
+        bus = FakeBus()
+        auth = AuthManager(db=None, bus=bus)
+        await auth.start()
+        token = auth.create_access_token(make_user(user_id=7))
+        auth.verify_token(token)
+
+        bus.callback({"user_id": 7, "at": time.time()})
+
+        assert len(auth.cache) == 0
+        with pytest.raises(HTTPException):
+            auth.verify_token(token)
+        # Tokens issued after the revocation (e.g. after reactivation) work
+        time.sleep(0.001)
+        assert auth.verify_token(auth.create_access_token(make_user(user_id=7))).user_id == 7
+
+class TestPrincipalCache:
+    def principal(self, jti, expires_at=2e9):
+        return Principal(1, "user1", False, jti, 0.0, expires_at)
+
+    def test_lru_eviction_and_ttl(self):
+        cache = PrincipalCache(maxsize=2, ttl=60)
+        cache.put("a", self.principal("a"), now=1000)
+        cache.put("b", self.principal("b"), now=1000)
+        cache.get("a", now=1001)
+        cache.put("c", self.principal("c"), now=1001)
+
+        assert cache.get("b", now=1002) is None
+        assert cache.get("a", now=1002) is not None
+        assert cache.get("a", now=1061) is None
+
+    def test_entry_never_outlives_token(self):
+        cache = PrincipalCache(maxsize=10, ttl=600)
+        cache.put("a", self.principal("a", expires_at=1010), now=1000)
+        assert cache.get("a", now=1011) is None
+
+class FakeKeyDB:
+    """async_session/unit_of_work over a dict of ApiKey rows"""
+
+    def __init__(self):
+        self.keys = {}
+        self.lookups = 0
+        self.usage_updates = []
+
+    @asynccontextmanager
+    async def async_session(self):
+        yield self
+
+    unit_of_work = async_session
+
+    def add(self, record):
+        record.id = len(self.keys) + 1
+        self.keys[record.prefix] = record
+
+    async def flush(self):
+        pass
+
+    async def execute(self, statement, params=None):
+        if params is not None:
+            self.usage_updates.extend(params)
+            return None
+        if statement.is_dml:
+            values = statement.compile().params
+            if statement.table.name == "api_keys" and "owner_id_1" in values:
+                for record in self.keys.values():
+                    if record.owner_id == values["owner_id_1"]:
+                        record.is_active = values["is_active"]
+            return None
+        self.lookups += 1
+        prefix = statement.whereclause.clauses[0].right.value
+        record = self.keys.get(prefix)
+        if record is not None and record.is_active is False:
+            record = None
+        return SimpleNamespace(scalar_one_or_none=lambda: record)
+
+@pytest.mark.asyncio
+class TestApiKeys:
+    async def test_key_is_stored_hashed_and_cached_after_first_lookup(self):
+        db = FakeKeyDB()
+        store = ApiKeyStore(db)
+        record, key = await store.create("smshub", ["messages:read"])
+
+        assert key.startswith(f"smsb_{record.prefix}_")
+        assert record.key_hash == hash_key(key) and key not in record.key_hash
+
+        principal = await store.verify(key)
+        await store.verify(key)
+        assert db.lookups == 1
+        assert principal.allows("messages:read")
+        assert not principal.allows("admin")
+
+    async def test_wrong_secret_and_unknown_prefix_are_refused(self):
+        db = FakeKeyDB()
+        store = ApiKeyStore(db)
+        record, key = await store.create("automation")
+
+        with pytest.raises(ApiKeyError):
+            await store.verify(key[:-4] + "AAAA")
+        for _ in range(3):
+            with pytest.raises(ApiKeyError):
+                await store.verify("smsb_unknown_secret")
+        # Unknown prefixes are negatively cached
+        assert db.lookups == 2
+
+    async def test_per_key_rate_limit_and_usage_flush(self):
+        db = FakeKeyDB()
+        store = ApiKeyStore(db)
+        record, key = await store.create("bulk", rate_limit=2)
+
+        await store.verify(key)
+        await store.verify(key)
+        with pytest.raises(ApiKeyRateLimited) as error:
+            await store.verify(key)
+        assert error.value.retry_after > 0
+
+        await store.flush_usage()
+        assert [(u["key_id"], u["count"]) for u in db.usage_updates] == [(record.id, 2)]
+
+    async def test_deactivating_a_user_disables_their_keys(self):
+        db = FakeKeyDB()
+        bus = FakeBus()
+        auth = AuthManager(db=db, bus=bus)
+        _, own_key = await auth.api_keys.create("theirs", owner_id=7)
+        _, other_key = await auth.api_keys.create("other", owner_id=8)
+        await auth.verify_api_key(own_key)
+        await auth.verify_api_key(other_key)
+
+        await auth.deactivate_user(7)
+
+        with pytest.raises(HTTPException) as error:
+            await auth.verify_api_key(own_key)
+        assert error.value.status_code == 401
+        assert (await auth.verify_api_key(other_key)).user_id == 8
+        assert bus.published[0]["user_id"] == 7
+
+    async def test_other_workers_drop_cached_keys_of_a_deactivated_user(self):
+        db = FakeKeyDB()
+        bus = FakeBus()
+        auth = AuthManager(db=db, bus=bus)
+        await auth.start()
+        _, key = await auth.api_keys.create("theirs", owner_id=7)
+        await auth.verify_api_key(key)
+
+        # Another worker committed the deactivation, then published it
+        next(iter(db.keys.values())).is_active = False
+        bus.callback({"user_id": 7, "at": time.time()})
+
+        with pytest.raises(HTTPException):
+            await auth.verify_api_key(key)
+
+    async def test_only_verified_credentials_identify_a_client(self):
+        auth = AuthManager(db=FakeKeyDB(), bus=FakeBus())
+        _, key = await auth.api_keys.create("automation")
+        token = auth.create_access_token(make_user())
+
+        assert not auth.is_valid_credential(key)
+        await auth.verify_api_key(key)
+        assert auth.is_valid_credential(key)
+        assert not auth.is_valid_credential(key[:-4] + "AAAA")
+        assert auth.is_valid_credential(token)
+        assert not auth.is_valid_credential(token + "x")
@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+
+from helpers import make_device
+from benchmarks.adb import FakeAdbDevice
+from benchmarks.ledger import Ledger
+from benchmarks.modem import SimulatedModem
+from benchmarks.scenarios import run_scenario
+from src.device_managers.android import AndroidManager
+from src.device_managers.huawei import HuaweiManager
+
+@pytest.mark.asyncio
+class TestSimulators:
+    async def test_modem_simulator_speaks_at_over_pty(self):
+        ledger = Ledger()
+        modem = SimulatedModem(ledger, latency=0.001)
+        modem.start()
+        manager = HuaweiManager(None)
+        device = make_device("bench-huawei", "huawei", port=modem.port)
+        try:
+            assert await manager._open_port(device)
+            assert "+CREG: 0,1" in await manager._send_at_command(device, "AT+CREG?")
+
+            modem.deliver("BENCH-1")
+            modem.deliver("BENCH-2")
+            messages = await manager.check_messages(device)
+
+            assert [m.text for m in messages] == ["BENCH-1", "BENCH-2"]
+            assert modem.inbox == {}
+            assert await manager.send_message(device, "+15559998888", "hi")
+        finally:
+            await manager._close_port(device)
+            await modem.stop()
+
+    async def test_fake_adb_device(self):
+        phone = FakeAdbDevice(Ledger(), latency=0)
+        await phone.start()
+        manager = AndroidManager(None)
+        device = make_device("bench-android", "android", config={'ip': '127.0.0.1', 'port': phone.port})
+        try:
+            assert await manager._initialize_modem(device)
+            phone.deliver()
+            messages = await manager.check_messages(device)
+
+            assert [m.text for m in messages] == ["BENCH-1"]
+            assert phone.inbox == {}
+            assert await manager.get_signal_strength(device)
+        finally:
+            await manager._run_blocking(manager._adb_connections.pop(device.id).close)
+            await phone.stop()
+
+    async def test_scenario_reports_json_ready_results(self, monkeypatch):
+        from src.config import settings
+        monkeypatch.setattr(settings, "MESSAGE_CHECK_INTERVAL", 0.2)
+        monkeypatch.setattr(settings, "MESSAGE_CHECK_INTERVAL_FAST", 0.05)
+        options = {
+            "rate": 5, "device_latency": 0.001, "smshub_latency": 0.001,
+            "urc": False, "warmup": 5, "drain": 5
+        }
+
+        result = await run_scenario("franklin", 2, 1.0, options)
+
+        assert result["online"] == 2
+        assert result["generated"] > 0
+        assert result["delivered"] == result["generated"]
+        assert result["latency_ms"]["p50"] is not None
+
+def test_soak_trend_helpers():
+    from benchmarks.soak import growth_per_hour, parse_duration
+
+    assert parse_duration("90") == 90
+    assert parse_duration("30m") == 1800
+    assert parse_duration("6h") == 21600
+
+    samples = [{"elapsed_s": t, "rss_mb": 100 + t / 60} for t in (0, 600, 1200, 1800)]
+    assert growth_per_hour(samples, "rss_mb") == 60
+    assert growth_per_hour(samples[:1], "rss_mb") is None
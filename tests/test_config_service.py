@@ -0,0 +1,141 @@
+import json
+import os
+import pytest
+
+from helpers import make_device
+from src.config import settings
+from src.config_service import RELOADABLE, ConfigError, ConfigService, validate
+from src.devices import DeviceRegistry
+from src.models import SendRequest
+from src.outbound import OutboundScheduler
+from src.supervisor import DeviceSupervisor
+
+class FakeSettingsDB:
+    def __init__(self):
+        self.rows = {}
+
+    async def get_settings(self):
+        return dict(self.rows)
+
+    async def update_settings(self, values):
+        self.rows.update(values)
+
+@pytest.fixture(autouse=True)
+def restore_settings():
+    saved = {name: getattr(settings, name) for name in RELOADABLE}
+    yield
+    for name, value in saved.items():
+        setattr(settings, name, value)
+
+@pytest.fixture
+def config_file(tmp_path):
+    path = tmp_path / "config.json"
+
+    def write(values):
+        path.write_text(json.dumps(values))
+        # Same-second rewrites must still look like a change
+        mtime = os.stat(path).st_mtime + write.bumps
+        write.bumps += 1
+        os.utime(path, (mtime, mtime))
+    write.bumps = 1
+    write.path = str(path)
+    return write
+
+def test_validate_coerces_and_rejects():
+    assert validate({"MESSAGE_CHECK_INTERVAL": "20"}) == {"MESSAGE_CHECK_INTERVAL": 20}
+    with pytest.raises(ConfigError):
+        validate({"MESSAGE_CHECK_INTERVAL": 0})
+    with pytest.raises(ConfigError):
+        validate({"DATABASE_URL": "postgresql://elsewhere"})
+    with pytest.raises(ConfigError):
+        validate({"ADMISSION_LIMITS": {"api": {"rate": 5}}})
+    with pytest.raises(ConfigError):
+        validate({"DEVICE_OVERRIDES": {"dev-1": {"send_rate": -1}}})
+    with pytest.raises(ConfigError):
+        validate({"DEFAULT_DEVICE_CONFIGS": {"voip": {"send_burst": 0}}})
+    for factor in (0, 0.5):
+        with pytest.raises(ConfigError):
+            validate({"POLL_BACKOFF_FACTOR": factor})
+    assert validate({"POLL_BACKOFF_FACTOR": 1}) == {"POLL_BACKOFF_FACTOR": 1}
+
+@pytest.mark.asyncio
+class TestConfigService:
+    async def test_file_changes_are_applied_and_announced(self, config_file):
+        changes = []
+
+        async def listener(change):
+            changes.append(change)
+
+        config_file({"MESSAGE_CHECK_INTERVAL": 30, "DB_POOL_SIZE": 99})
+        service = ConfigService(FakeSettingsDB(), DeviceRegistry(), config_file.path)
+        service.add_listener(listener)
+        await service.reload()
+
+        assert settings.MESSAGE_CHECK_INTERVAL == 30
+        assert settings.DB_POOL_SIZE != 99  # needs a restart, left alone
+        assert changes[-1].settings == {"MESSAGE_CHECK_INTERVAL": 30}
+        assert await service.reload() is None
+
+        # Dropping a key reverts to the default; a bad file changes nothing
+        config_file({})
+        await service.reload()
+        assert settings.MESSAGE_CHECK_INTERVAL == 10
+        config_file({"MESSAGE_CHECK_INTERVAL": "soon"})
+        assert await service.reload() is None
+        assert settings.MESSAGE_CHECK_INTERVAL == 10
+
+    async def test_database_wins_over_file(self, config_file):
+        db = FakeSettingsDB()
+        config_file({"OUTBOUND_RATE_PER_DEVICE": 1.0})
+        service = ConfigService(db, DeviceRegistry(), config_file.path)
+
+        await service.update({"OUTBOUND_RATE_PER_DEVICE": 2.0})
+
+        assert db.rows == {"OUTBOUND_RATE_PER_DEVICE": 2.0}
+        assert settings.OUTBOUND_RATE_PER_DEVICE == 2.0
+        with pytest.raises(ConfigError):
+            await service.update({"OUTBOUND_RATE_PER_DEVICE": "fast"})
+
+    async def test_device_config_layers(self, config_file):
+        devices = DeviceRegistry()
+        service = ConfigService(FakeSettingsDB(), devices, config_file.path)
+        entry = devices.add(make_device("dev-1", status="online", config={"baudrate": 9600}))
+        service.layer(entry)
+
+        assert entry.config["baudrate"] == 9600  # own config over type defaults
+        assert entry.config["init_commands"][0] == "AT"
+
+        entry.config["current_bands"] = "LTE"  # set by the manager at runtime
+        change = await service.set_device_overrides("dev-1", {"baudrate": 115200, "poll_interval": 2})
+        assert change.devices == {"dev-1"}
+        assert entry.config["baudrate"] == 115200
+        assert entry.config["poll_interval"] == 2.0
+        assert entry.config["current_bands"] == "LTE"
+
+        await service.set_device_overrides("dev-1", {})
+        assert entry.config["baudrate"] == 9600
+        assert "poll_interval" not in entry.config
+        assert entry.config["current_bands"] == "LTE"
+
+    async def test_running_components_follow_changes(self, config_file):
+        devices = DeviceRegistry()
+        service = ConfigService(FakeSettingsDB(), devices, config_file.path)
+        entry = devices.add(make_device("dev-1", status="online"))
+        service.layer(entry)
+        supervisor = DeviceSupervisor(lambda device: None, None)
+        outbound = OutboundScheduler(devices.values, devices.get, lambda device: None)
+        service.add_listener(supervisor.reconfigure)
+        service.add_listener(outbound.reconfigure)
+
+        outbound.submit(SendRequest(to_number="+1555", text="hi"))
+        lane = outbound._lanes["dev-1"]
+        supervisor._states["dev-1"] = state = type("State", (), {
+            "device": entry, "interval": 10.0, "next_signal": float("inf")
+        })()
+
+        await service.set_device_overrides("dev-1", {"send_rate": 4, "send_burst": 8, "poll_interval": 3})
+
+        assert (lane.bucket.rate, lane.bucket.capacity) == (4.0, 8.0)
+        assert state.interval == 3.0
+        assert state.next_signal != float("inf")
+        await outbound.stop()
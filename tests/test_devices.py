@@ -0,0 +1,86 @@
+import json
+import pytest
+
+from helpers import make_device
+from src.devices import DeviceEntry, DeviceRegistry
+
+class TestDeviceRegistry:
+    def test_add_copies_model_without_validation(self):
+        registry = DeviceRegistry()
+        device = make_device("dev-0001", sim_iccid="8901", port="/dev/ttyUSB0")
+        entry = registry.add(device)
+
+        assert isinstance(entry, DeviceEntry)
+        assert registry.get("dev-0001") is entry
+        assert entry.dict() == device.dict()
+        with pytest.raises(AttributeError):
+            entry.unknown = 1
+
+    def test_find_by_indexed_fields(self):
+        registry = DeviceRegistry()
+        registry.add(make_device("dev-0001", status="online", sim_iccid="8901"))
+        registry.add(make_device("dev-0002", status="offline"))
+        registry.add(make_device("dev-0003", device_type="voip", status="online"))
+
+        assert [d.id for d in registry.find(status="online")] == ["dev-0001", "dev-0003"]
+        assert [d.id for d in registry.find(type="huawei", status="online")] == ["dev-0001"]
+        assert registry.first(sim_iccid="8901").id == "dev-0001"
+        assert registry.first(phone_number="+15550000002").id == "dev-0002"
+        assert registry.find(type="android") == []
+        with pytest.raises(ValueError):
+            registry.find(signal_strength=80)
+
+    def test_assignment_reindexes(self):
+        registry = DeviceRegistry()
+        entry = registry.add(make_device("dev-0001"))
+
+        entry.status = "online"
+        entry.sim_iccid = "8901"
+
+        assert registry.find(status="offline") == []
+        assert registry.find(status="online") == [entry]
+        assert registry.first(sim_iccid="8901") is entry
+        assert registry.counts("status") == {"online": 1}
+
+    def test_pop_detaches_entry(self):
+        registry = DeviceRegistry()
+        entry = registry.add(make_device("dev-0001"))
+
+        assert registry.pop("dev-0001") is entry
+        assert registry.pop("dev-0001") is None
+        entry.status = "online"
+        assert "dev-0001" not in registry
+        assert registry.find(status="online") == []
+        assert registry.counts("type") == {}
+
+    def test_snapshot_json_reuses_unchanged_devices(self):
+        registry = DeviceRegistry()
+        first_entry = registry.add(make_device("dev-0001"))
+        second_entry = registry.add(make_device("dev-0002"))
+
+        body = registry.snapshot_json()
+        assert registry.snapshot_json() is body
+        cached = first_entry.json_bytes()
+
+        second_entry.signal_strength = 70
+        devices = json.loads(registry.snapshot_json())
+        assert first_entry.json_bytes() is cached
+        assert [d["id"] for d in devices] == ["dev-0001", "dev-0002"]
+        assert devices[1]["signal_strength"] == 70
+        assert devices[0]["first_seen"] == first_entry.first_seen.isoformat()
+
+    def test_in_place_config_changes_refresh_the_encoding(self):
+        registry = DeviceRegistry()
+        entry = registry.add(make_device("dev-0001", config={"webhook": True}))
+        body = registry.snapshot_json()
+
+        # What managers do after a sweep or a band change
+        entry.config["last_check"] = "2026-10-19T12:00:00"
+        assert json.loads(entry.json_bytes())["config"]["last_check"] == "2026-10-19T12:00:00"
+        assert registry.snapshot_json() is not body
+
+        entry.config.update(model="E3372")
+        entry.config.pop("webhook")
+        assert json.loads(registry.snapshot_json())[0]["config"] == {
+            "last_check": "2026-10-19T12:00:00", "model": "E3372"
+        }
@@ -0,0 +1,52 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from src import export
+from src.models import LogRecord
+
+def log(i):
+    return SimpleNamespace(
+        id=i, timestamp=datetime(2026, 10, 19, 12, 0, i), level="error",
+        message=f'line {i}, with "quotes"', source="ingest", details=None
+    )
+
+async def batches(*sizes):
+    start = 0
+    for size in sizes:
+        yield [log(i) for i in range(start, start + size)]
+        start += size
+
+async def collect(chunks):
+    return b"".join([chunk async for chunk in chunks])
+
+@pytest.mark.asyncio
+class TestExport:
+    async def test_ndjson_one_object_per_line(self):
+        body = await collect(export.encode(batches(2, 1), LogRecord, "ndjson"))
+
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        assert [row["id"] for row in rows] == [0, 1, 2]
+        assert rows[0]["timestamp"] == "2026-10-19T12:00:00"
+
+    async def test_csv_has_one_header_across_batches(self):
+        body = await collect(export.encode(batches(2, 2), LogRecord, "csv"))
+
+        rows = list(csv.reader(io.StringIO(body.decode())))
+        assert rows[0] == list(LogRecord.__fields__)
+        assert len(rows) == 5
+        assert rows[1][3] == 'line 0, with "quotes"'
+
+    async def test_empty_csv_is_just_the_header(self):
+        body = await collect(export.encode(batches(), LogRecord, "csv"))
+        assert body.decode().strip() == ",".join(LogRecord.__fields__)
+
+    async def test_gzip_round_trip(self):
+        plain = await collect(export.encode(batches(3, 3), LogRecord, "ndjson"))
+        compressed = await collect(export.gzipped(export.encode(batches(3, 3), LogRecord, "ndjson")))
+        assert gzip.decompress(compressed) == plain
@@ -0,0 +1,40 @@
+import asyncio
+import time
+import pytest
+
+from src.loop_monitor import LoopMonitor
+
+def blocking_driver_call():
+    time.sleep(0.3)
+
+@pytest.mark.asyncio
+class TestLoopMonitor:
+    @pytest.fixture
+    async def monitor(self):
+        monitor = LoopMonitor(interval=0.02, threshold=0.1, history=10, sample_interval=0.01)
+        await monitor.start()
+        yield monitor
+        await monitor.stop()
+
+    async def test_quiet_loop_has_no_slow_callbacks(self, monitor):
+        await asyncio.sleep(0.2)
+
+        status = monitor.status()
+        assert status["running"]
+        assert status["lag_ms"]["p50"] is not None
+        assert status["slow_callbacks_total"] == 0
+
+    async def test_blocking_call_is_caught_with_its_stack(self, monitor):
+        await asyncio.sleep(0.05)
+        blocking_driver_call()
+        await asyncio.sleep(0.1)
+
+        status = monitor.status()
+        assert status["slow_callbacks_total"] == 1
+        stall = status["slow_callbacks"][0]
+        assert stall["duration_ms"] >= 150
+        assert "in blocking_driver_call" in stall["stacks"][0]["stack"][-1]
+        assert status["lag_ms"]["max"] >= 150
+
+        monitor.clear()
+        assert monitor.status()["slow_callbacks"] == []
@@ -0,0 +1,120 @@
+import asyncio
+import pytest
+from contextlib import asynccontextmanager
+from datetime import datetime
+from types import SimpleNamespace
+
+from prometheus_client import CollectorRegistry, Histogram
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from src import metrics
+from src.database.manager import DatabaseManager
+from src.ingest import MessageIngest
+from src.models import SMS
+
+def sample(name, labels=None):
+    return metrics.REGISTRY.get_sample_value(name, labels or {}) or 0
+
+class FakeDB:
+    def __init__(self):
+        self.flushes = []
+        self.statuses = {}
+        self.transactions = 0
+        self.counts = []
+
+    @asynccontextmanager
+    async def unit_of_work(self):
+        self.transactions += 1
+        yield self
+
+    async def add_messages(self, messages):
+        self.flushes.append(len(messages))
+        for i, message in enumerate(messages):
+            message.id = sum(self.flushes) - len(messages) + i + 1
+        return messages
+
+    async def update_message_statuses(self, message_ids, status, session=None):
+        assert session is self
+        for message_id in message_ids:
+            self.statuses[message_id] = status
+
+    async def schedule_retries(self, message_ids, error=None, session=None):
+        await self.update_message_statuses(message_ids, "failed", session)
+
+    async def add_message_counts(self, counts, session=None):
+        assert session is self
+        self.counts.append(counts)
+
+class FakeSMSHub:
+    async def push_sms(self, sms_id, phone, phone_from, text):
+        if text == "boom":
+            raise IOError("connection reset")
+        return text != "reject"
+
+def make_sms(text):
+    return SMS(
+        device_id="dev1", from_number="+1999", to_number="+15550001111",
+        text=text, received_at=datetime.utcnow(), delivered=False
+    )
+
+@pytest.mark.asyncio
+class TestMetrics:
+    async def test_command_name(self):
+        assert metrics.command_name('AT+CMGL="ALL"') == "CMGL"
+        assert metrics.command_name("AT^SYSINFO") == "SYSINFO"
+        assert metrics.command_name("AT") == "AT"
+
+    async def test_bound_children_are_reused_and_forgotten(self):
+        histogram = Histogram("test_seconds", "test", ["device", "command"],
+                              registry=CollectorRegistry())
+        bound = metrics.BoundMetric(histogram)
+
+        assert bound.labels("dev1", "CSQ") is bound.labels("dev1", "CSQ")
+        bound.labels("dev2", "CSQ").observe(0.1)
+        bound.forget(0, "dev1")
+
+        assert list(bound._children) == [("dev2", "CSQ")]
+
+    async def test_ingest_flushes_in_batches_and_records_latency(self):
+        db = FakeDB()
+        ingest = MessageIngest(db, FakeSMSHub(), workers=1)
+        flushed = sample("smsbridge_db_flush_rows_count")
+        errors = sample("smsbridge_smshub_push_errors_total", {"reason": "error"})
+        rejected = sample("smsbridge_smshub_push_errors_total", {"reason": "rejected"})
+        forwarded = sample("smsbridge_ingest_to_forward_seconds_count")
+
+        ingest.submit_many([make_sms("ok"), make_sms("boom"), make_sms("reject")])
+        await ingest.start()
+        await ingest.stop()
+
+        assert db.flushes == [3]
+        assert db.statuses == {1: "delivered", 2: "failed", 3: "failed"}
+        assert db.transactions == 1
+        [counts] = db.counts
+        assert [sum(b[k] for b in counts.values()) for k in ("received", "delivered", "failed")] == [3, 1, 2]
+        assert sample("smsbridge_db_flush_rows_count") == flushed + 1
+        assert sample("smsbridge_smshub_push_errors_total", {"reason": "error"}) == errors + 1
+        assert sample("smsbridge_smshub_push_errors_total", {"reason": "rejected"}) == rejected + 1
+        assert sample("smsbridge_ingest_to_forward_seconds_count") == forwarded + 3
+
+    async def test_queue_depth_is_read_at_scrape_time(self):
+        ingest = MessageIngest(FakeDB(), FakeSMSHub())
+        metrics.track_queue("test", lambda: ingest.depth)
+        ingest.submit(make_sms("ok"))
+
+        assert sample("smsbridge_queue_depth", {"queue": "test"}) == 1
+        body, content_type = metrics.render()
+        assert b'smsbridge_queue_depth{queue="test"} 1.0' in body
+
+def test_slow_query_timer_survives_failed_statements():
+    manager = DatabaseManager.__new__(DatabaseManager)
+    manager.engine = SimpleNamespace(sync_engine=create_engine("sqlite://"))
+    manager._log_slow_queries(threshold=10)
+
+    with manager.engine.sync_engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM missing_table"))
+        conn.rollback()
+        conn.execute(text("SELECT 1"))
+        assert conn.info["query_started"] == []
@@ -0,0 +1,207 @@
+import asyncio
+import threading
+import time
+import pytest
+
+from helpers import make_device
+from src.device_managers.android import AndroidManager
+from src.device_managers.huawei import HuaweiManager
+from src.models import SendRequest
+from src.outbound import OutboundScheduler, NoDeviceAvailable
+
+def outbound_device(device_id, status="online", **config):
+    return make_device(device_id, status=status, signal_strength=80,
+                       config={'send_rate': 100, 'send_burst': 100, **config})
+
+class FakeManager:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.sent = []
+
+    async def send_message(self, device, to_number, text):
+        await asyncio.sleep(0.01)
+        if device.id in self.failing:
+            return False
+        self.sent.append((device.id, to_number))
+        return True
+
+class FakeAdb:
+    """AdbDeviceTcp stand-in that notices two shell calls at once"""
+
+    def __init__(self):
+        self.active = 0
+        self.overlapped = False
+        self._lock = threading.Lock()
+
+    def shell(self, command):
+        with self._lock:
+            self.active += 1
+            self.overlapped |= self.active > 1
+        time.sleep(0.01)
+        with self._lock:
+            self.active -= 1
+        return "Broadcast completed" if command.startswith("am broadcast") else ""
+
+class FakeModemPort:
+    """Serial port answering CMGL, CMGS and the message body like a modem"""
+
+    def __init__(self):
+        self.writes = []
+        self.pending = b""
+
+    @property
+    def in_waiting(self):
+        return len(self.pending)
+
+    def read(self, size):
+        data, self.pending = self.pending[:size], self.pending[size:]
+        return data
+
+    def reset_input_buffer(self):
+        self.pending = b""
+
+    def write(self, data):
+        self.writes.append(data)
+        if data.startswith(b"AT+CMGS"):
+            self.pending += b"\r\n> "
+        elif data.endswith(b"\x1a"):
+            self.pending += b"\r\n+CMGS: 7\r\n\r\nOK\r\n"
+        else:
+            self.pending += b"\r\nOK\r\n"
+        return len(data)
+
+def make_scheduler(devices, manager, reports=None):
+    by_id = {d.id: d for d in devices}
+
+    async def notify(report):
+        if reports is not None:
+            reports.append(report)
+
+    return OutboundScheduler(
+        lambda: by_id.values(), by_id.get, lambda device: manager, notify=notify
+    )
+
+async def drain(scheduler, timeout=5):
+    deadline = time.monotonic() + timeout
+    while scheduler.pending and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+
+@pytest.mark.asyncio
+class TestOutboundScheduler:
+    async def test_spreads_unpinned_sends_across_devices(self):
+        devices = [outbound_device(f"dev{i}") for i in range(4)]
+        manager = FakeManager()
+        scheduler = make_scheduler(devices, manager)
+
+        for i in range(40):
+            scheduler.submit(SendRequest(to_number=f"+1999{i:07d}", text="hi"))
+        await drain(scheduler)
+
+        per_device = {d.id: sum(1 for s in manager.sent if s[0] == d.id) for d in devices}
+        assert sum(per_device.values()) == 40
+        assert all(count == 10 for count in per_device.values())
+        await scheduler.stop()
+
+    async def test_pinned_device_and_offline_devices(self):
+        devices = [outbound_device("dev1"), outbound_device("dev2"), outbound_device("dev3", status="offline")]
+        manager = FakeManager()
+        scheduler = make_scheduler(devices, manager)
+
+        message = scheduler.submit(SendRequest(to_number="+19990000001", text="hi", device_id="dev2"))
+        await drain(scheduler)
+
+        assert scheduler.get(message.id).sent_via == "dev2"
+        with pytest.raises(NoDeviceAvailable):
+            scheduler.submit(SendRequest(to_number="+19990000001", text="hi", device_id="dev3"))
+        await scheduler.stop()
+
+    async def test_per_device_rate_limit(self):
+        devices = [outbound_device("dev1", send_rate=20, send_burst=1)]
+        scheduler = make_scheduler(devices, FakeManager())
+
+        started = time.monotonic()
+        for _ in range(5):
+            scheduler.submit(SendRequest(to_number="+19990000001", text="hi"))
+        await drain(scheduler)
+
+        # 1 burst token then 4 more at 20/s
+        assert time.monotonic() - started >= 0.2
+        await scheduler.stop()
+
+    async def test_zero_send_rate_falls_back_to_default(self):
+        devices = [outbound_device("dev1", send_rate=0, send_burst=0)]
+        manager = FakeManager()
+        scheduler = make_scheduler(devices, manager)
+
+        assert scheduler.select_device() is devices[0]
+        scheduler.submit(SendRequest(to_number="+19990000001", text="hi"))
+        await drain(scheduler)
+
+        assert manager.sent == [("dev1", "+19990000001")]
+        await scheduler.stop()
+
+    async def test_removed_device_lane_is_stopped(self):
+        devices = [outbound_device("dev1", send_rate=1, send_burst=1)]
+        reports = []
+        scheduler = make_scheduler(devices, FakeManager(), reports)
+
+        messages = [scheduler.submit(SendRequest(to_number="+19990000001", text="hi")) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        lane_task = scheduler._lanes["dev1"].task
+        await scheduler.remove_device("dev1")
+
+        assert "dev1" not in scheduler._lanes
+        assert lane_task.cancelled()
+        assert scheduler.pending == 0
+        assert [scheduler.get(m.id).status for m in messages] == ["sent", "failed", "failed"]
+        assert reports[-1]["message"]["error"] == "Device removed"
+
+    async def test_failed_send_is_rerouted_and_reported(self):
+        devices = [outbound_device("dev1"), outbound_device("dev2")]
+        manager = FakeManager(failing={"dev1"})
+        reports = []
+        scheduler = make_scheduler(devices, manager, reports)
+        devices[1].signal_strength = 10  # dev1 is chosen first
+
+        message = scheduler.submit(SendRequest(to_number="+19990000001", text="hi"))
+        await drain(scheduler)
+
+        record = scheduler.get(message.id)
+        assert record.status == "sent"
+        assert record.sent_via == "dev2"
+        assert record.attempts == 2
+        assert reports[-1]["type"] == "message_sent"
+        await scheduler.stop()
+
+    async def test_send_and_poll_share_the_modem(self):
+        device = outbound_device("dev1")
+        manager = HuaweiManager(None)
+        port = manager._ports[device.id] = FakeModemPort()
+        scheduler = make_scheduler([device], manager)
+
+        async def poll():
+            for _ in range(5):
+                await manager.check_messages(device)
+                await asyncio.sleep(0)
+
+        message = scheduler.submit(SendRequest(to_number="+19990000001", text="hi"))
+        await asyncio.gather(poll(), drain(scheduler))
+
+        assert scheduler.get(message.id).status == "sent"
+        # Nothing got between the CMGS command and its message body
+        start = next(i for i, data in enumerate(port.writes) if data.startswith(b"AT+CMGS"))
+        assert port.writes[start + 1] == b"hi\x1a"
+        await scheduler.stop()
+
+    async def test_android_send_and_poll_never_share_the_connection(self):
+        device = outbound_device("dev1")
+        manager = AndroidManager(None)
+        adb = manager._adb_connections[device.id] = FakeAdb()
+
+        await asyncio.gather(
+            *(manager.check_messages(device) for _ in range(3)),
+            *(manager.send_message(device, "+19990000001", "hi") for _ in range(3)),
+            *(manager.get_signal_strength(device) for _ in range(3))
+        )
+
+        assert not adb.overlapped
@@ -0,0 +1,133 @@
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import pytest
+
+from src.config import settings
+from src.database.partitions import (
+    PartitionManager, default_partition, partition_name, period_start, upper_bound
+)
+
+TABLES = {
+    "messages": {"interval": "day", "retention_days": 30},
+    "device_stats": {"interval": "week", "retention_days": 90}
+}
+
+class TestPartitionPlanning:
+    def setup_method(self):
+        self.manager = PartitionManager(None, tables=TABLES, premake=2)
+        self.now = datetime(2026, 10, 21, 15, 30)  # a Wednesday
+
+    def test_period_start(self):
+        assert period_start(self.now, "day") == datetime(2026, 10, 21)
+        assert period_start(self.now, "week") == datetime(2026, 10, 19)
+        with pytest.raises(ValueError):
+            period_start(self.now, "month")
+
+    def test_planned_covers_current_and_premade(self):
+        planned = self.manager.planned("device_stats", self.now)
+        assert [name for name, _, _ in planned] == [
+            "device_stats_p20261019", "device_stats_p20261026", "device_stats_p20261102"
+        ]
+        # Contiguous ranges
+        for (_, _, end), (_, start, _) in zip(planned, planned[1:]):
+            assert end == start
+
+    def test_upper_bound(self):
+        assert upper_bound(
+            "FOR VALUES FROM ('2026-10-19 00:00:00') TO ('2026-10-20 00:00:00')"
+        ) == datetime(2026, 10, 20)
+        assert upper_bound("FOR VALUES FROM (MINVALUE) TO ('2026-10-19 00:00:00')") == datetime(2026, 10, 19)
+        assert upper_bound("DEFAULT") is None
+
+    def test_expired_only_when_whole_partition_is_past_retention(self):
+        bound = "FOR VALUES FROM ('{}') TO ('{}')"
+        partitions = {
+            partition_name("messages", datetime(2026, 9, 20)): bound.format("2026-09-20", "2026-09-21"),
+            partition_name("messages", datetime(2026, 9, 21)): bound.format("2026-09-21", "2026-09-22"),
+            "messages_history": "FOR VALUES FROM (MINVALUE) TO ('2026-09-20 00:00:00')",
+            partition_name("messages", datetime(2026, 10, 21)): bound.format("2026-10-21", "2026-10-22")
+        }
+        # Cutoff is 2026-09-21 15:30: the 21st still holds rows inside retention
+        assert self.manager.expired("messages", partitions, self.now) == [
+            "messages_history", "messages_p20260920"
+        ]
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+
+    def all(self):
+        return self.value
+
+    def scalar(self):
+        return self.value
+
+    scalar_one = scalar
+
+class FakeConnection:
+    """Answers the catalog queries and records every statement"""
+
+    def __init__(self, existing=(), stray=()):
+        self.existing = list(existing)
+        self.stray = set(stray)  # partition starts with rows waiting in the default
+        self.statements = []
+
+    async def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        self.statements.append(sql)
+        if "pg_inherits" in sql:
+            return FakeResult(self.existing)
+        if "pg_partitioned_table" in sql:
+            return FakeResult("received_at")
+        if sql.startswith("SELECT EXISTS"):
+            return FakeResult(params["start"] in self.stray)
+        return FakeResult(None)
+
+class FakeEngine:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @asynccontextmanager
+    async def begin(self):
+        yield self.conn
+
+@pytest.mark.asyncio
+class TestPartitionMaintenance:
+    async def test_default_partition_catches_and_hands_over_rows(self):
+        now = datetime(2026, 10, 21, 15, 30)
+        conn = FakeConnection(stray={datetime(2026, 10, 22)})
+        manager = PartitionManager(FakeEngine(conn), tables=TABLES, premake=1)
+
+        report = await manager._maintain_table(conn, "messages", now)
+
+        assert report["created"] == ["messages_p20261021", "messages_p20261022"]
+        assert 'CREATE TABLE IF NOT EXISTS "messages_default" PARTITION OF "messages" DEFAULT' in conn.statements
+        # Rows already in the default for the 22nd move into the new partition
+        detach = conn.statements.index('ALTER TABLE "messages" DETACH PARTITION "messages_default"')
+        assert conn.statements[detach + 1].startswith('CREATE TABLE "messages_p20261022"')
+        assert conn.statements[detach + 2].startswith('INSERT INTO "messages" SELECT * FROM "messages_default"')
+        assert conn.statements[detach + 4] == 'ALTER TABLE "messages" ATTACH PARTITION "messages_default" DEFAULT'
+        # Expired rows are trimmed from the default, which is never dropped
+        assert conn.statements[-1].startswith('DELETE FROM "messages_default" WHERE "received_at" < ')
+
+    async def test_existing_default_is_kept(self):
+        conn = FakeConnection(existing=[(default_partition("messages"), "DEFAULT")])
+        manager = PartitionManager(FakeEngine(conn), tables=TABLES, premake=0)
+
+        report = await manager._maintain_table(conn, "messages", datetime(2026, 10, 21))
+
+        assert report == {"created": ["messages_p20261021"], "dropped": []}
+        assert not any("DEFAULT" in sql and "CREATE" in sql for sql in conn.statements)
+
+    async def test_startup_survives_a_failed_pass(self, monkeypatch):
+        class BrokenEngine:
+            def connect(self):
+                raise ConnectionError("database unavailable")
+
+        monkeypatch.setattr(settings, "PARTITION_MAINTENANCE_INTERVAL", 0)
+        manager = PartitionManager(BrokenEngine(), tables=TABLES)
+
+        await manager.start()
+
+        assert manager._task is None
@@ -0,0 +1,60 @@
+import asyncio
+import time
+import pytest
+
+from src.profiler import ProfilerBusy, SamplingProfiler, dump_tasks, install_task_clock
+
+def crunch(seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        sum(range(1000))
+
+async def busy_device_loop():
+    for _ in range(6):
+        crunch(0.03)
+        await asyncio.sleep(0.01)
+
+@pytest.mark.asyncio
+class TestProfiler:
+    async def test_samples_are_rooted_at_the_running_task(self):
+        profiler = SamplingProfiler()
+        worker = asyncio.create_task(busy_device_loop(), name="supervisor-dev1")
+
+        result = await profiler.profile(0.25, interval=0.002)
+        await worker
+
+        assert result["loop_samples"] > 0
+        assert result["loop_busy_ratio"] > 0
+        lines = result["collapsed"].splitlines()
+        assert any(
+            line.startswith("task:supervisor-dev1;") and "crunch (test_profiler.py" in line
+            for line in lines
+        )
+
+    async def test_one_profile_at_a_time(self):
+        profiler = SamplingProfiler()
+        first = asyncio.create_task(profiler.profile(0.1))
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(ProfilerBusy):
+            await profiler.profile(0.1)
+        await first
+
+    async def test_task_dump_shows_age_and_await_point(self):
+        install_task_clock()
+        event = asyncio.Event()
+
+        async def waiter():
+            await event.wait()
+
+        task = asyncio.create_task(waiter(), name="waiter")
+        await asyncio.sleep(0.05)
+
+        entry = next(t for t in dump_tasks() if t["name"] == "waiter")
+        event.set()
+        await task
+
+        assert entry["age_s"] >= 0
+        assert entry["coroutine"].endswith("waiter")
+        assert "in wait" in entry["await_point"]
+        assert entry["awaiting"] == "Future"
@@ -0,0 +1,146 @@
+import asyncio
+import time
+import pytest
+from aiohttp import web
+
+from helpers import make_device
+from src.device_managers.provider_pool import CoalescedCallCancelled, ProviderClient, ProviderClientPool
+from src.device_managers.voip import VoipManager
+from src.rate_limit import TokenBucket
+
+ACCOUNT_SID = "ACshared"
+
+@pytest.fixture
+async def provider_server():
+    """Local Twilio stand-in that counts calls and can return 429"""
+    state = {'account': 0, 'balance': 0, 'throttle': 0, 'reject': False}
+
+    async def account(request):
+        state['account'] += 1
+        if state['reject']:
+            return web.json_response({'message': "Authenticate"}, status=401)
+        return web.json_response({'sid': ACCOUNT_SID})
+
+    async def balance(request):
+        state['balance'] += 1
+        await asyncio.sleep(0.05)
+        return web.json_response({'balance': "12.50"})
+
+    async def messages(request):
+        if state['throttle']:
+            state['throttle'] -= 1
+            return web.Response(status=429, headers={'Retry-After': '0.2'})
+        return web.json_response({'sid': "SM1"}, status=201)
+
+    app = web.Application()
+    base = f"/2010-04-01/Accounts/{ACCOUNT_SID}"
+    app.router.add_get(f"{base}.json", account)
+    app.router.add_get(f"{base}/Balance.json", balance)
+    app.router.add_post(f"{base}/Messages.json", messages)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    yield f"http://127.0.0.1:{port}", state
+
+    await runner.cleanup()
+
+def make_voip_device(index, api_base):
+    return make_device(f"voip_{index}", "voip", status="online", config={
+        'service_type': 'twilio',
+        'account_sid': ACCOUNT_SID,
+        'auth_token': "token",
+        'api_base': api_base
+    })
+
+@pytest.mark.asyncio
+class TestProviderClientPool:
+    async def test_devices_share_one_client_per_account(self, provider_server):
+        api_base, state = provider_server
+        pool = ProviderClientPool()
+        manager = VoipManager(None, pool=pool)
+        devices = [make_voip_device(i, api_base) for i in range(20)]
+
+        results = await asyncio.gather(*(manager._initialize_modem(d) for d in devices))
+
+        assert all(results)
+        assert len(pool) == 1
+        assert state['account'] == 1
+
+        for device in devices:
+            await manager.cleanup(device)
+        assert len(pool) == 0
+
+    async def test_failed_auth_releases_client(self, provider_server):
+        api_base, state = provider_server
+        state['reject'] = True
+        pool = ProviderClientPool()
+        manager = VoipManager(None, pool=pool)
+        device = make_voip_device(1, api_base)
+
+        # The supervisor retries initialization; no attempt may keep a reference
+        for _ in range(3):
+            assert not await manager._initialize_modem(device)
+        assert len(pool) == 0
+        assert device.id not in manager._sessions
+
+    async def test_balance_is_coalesced(self, provider_server):
+        api_base, state = provider_server
+        manager = VoipManager(None, pool=ProviderClientPool())
+        devices = [make_voip_device(i, api_base) for i in range(5)]
+        for device in devices:
+            await manager._initialize_modem(device)
+
+        balances = await asyncio.gather(*(manager.get_account_balance(d) for d in devices))
+
+        assert balances == [12.5] * 5
+        assert state['balance'] == 1
+        await manager.pool.close()
+
+    async def test_cancelled_leader_releases_followers(self):
+        client = ProviderClient('twilio', ACCOUNT_SID, rate=10)
+        started = asyncio.Event()
+
+        async def fetch():
+            started.set()
+            await asyncio.sleep(10)
+
+        leader = asyncio.create_task(client.coalesce('balance', fetch))
+        await started.wait()
+        follower = asyncio.create_task(client.coalesce('balance', fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        with pytest.raises(CoalescedCallCancelled):
+            await asyncio.wait_for(follower, timeout=1)
+        assert leader.cancelled()
+        assert not client._inflight
+        await client.close()
+
+    async def test_retry_after_is_honored(self, provider_server):
+        api_base, state = provider_server
+        manager = VoipManager(None, pool=ProviderClientPool())
+        device = make_voip_device(1, api_base)
+        await manager._initialize_modem(device)
+        state['throttle'] = 1
+
+        started = time.monotonic()
+        assert await manager.send_message(device, "+15559998888", "hello") is True
+        assert time.monotonic() - started >= 0.2
+        await manager.pool.close()
+
+class TestTokenBucket:
+    def test_try_acquire_respects_capacity(self):
+        bucket = TokenBucket(rate=1, capacity=2)
+        assert bucket.try_acquire()
+        assert bucket.try_acquire()
+        assert not bucket.try_acquire()
+
+    def test_block_for_pauses_bucket(self):
+        bucket = TokenBucket(rate=100)
+        bucket.block_for(5)
+        assert not bucket.try_acquire()
+        assert bucket.delay() > 4
@@ -0,0 +1,104 @@
+import pytest
+
+from helpers import make_device
+from src.device_managers import DEVICE_MANAGERS, MANAGER_PATHS, LazyManagerClasses
+from src.config import settings
+from src.device_managers.registry import ManagerRegistry, ManagerResources
+
+@pytest.fixture
+async def resources():
+    resources = ManagerResources(db=None)
+    yield resources
+    await resources.close()
+
+@pytest.mark.asyncio
+class TestManagerRegistry:
+    async def test_managers_are_shared_per_type(self, resources):
+        registry = ManagerRegistry(resources, DEVICE_MANAGERS, shards={})
+
+        first = registry.manager_for(make_device("a"))
+        second = registry.manager_for(make_device("b"))
+
+        assert first is second
+        assert first.resources is resources
+        assert registry.get('voip').pool is resources.provider_pool
+        assert not registry.supports('nokia')
+
+    async def test_devices_spread_over_shards(self, resources):
+        registry = ManagerRegistry(resources, DEVICE_MANAGERS, shards={'huawei': 4})
+
+        shards = {registry.shard_for(make_device(f"dev{i}")) for i in range(100)}
+        managers = {id(registry.manager_for(make_device(f"dev{i}"))) for i in range(100)}
+
+        assert shards == {0, 1, 2, 3}
+        assert len(managers) == 4
+        assert len(registry.managers('huawei')) == 4
+
+    async def test_workers_partition_devices(self, resources):
+        workers = [
+            ManagerRegistry(resources, DEVICE_MANAGERS, worker_index=i, worker_count=3)
+            for i in range(3)
+        ]
+        for i in range(100):
+            owners = [w for w in workers if w.owns(f"dev{i}")]
+            assert len(owners) == 1
+
+    async def test_leases_replace_the_static_split(self, resources, monkeypatch):
+        monkeypatch.setattr(settings, "SHARD_BACKEND", "memory")
+        registry = ManagerRegistry(resources, DEVICE_MANAGERS, worker_index=2, worker_count=3)
+
+        assert all(registry.owns(f"dev{i}") for i in range(100))
+
+    async def test_lifecycle_hooks(self, resources):
+        registry = ManagerRegistry(resources, DEVICE_MANAGERS)
+        events = []
+
+        async def started(manager):
+            events.append(('started', type(manager).__name__))
+
+        async def stopped(manager):
+            events.append(('stopped', type(manager).__name__))
+
+        registry.add_hook('started', started)
+        registry.add_hook('stopped', stopped)
+        registry.get('sierra')
+        await registry.start()
+        await registry.stop()
+
+        assert events == [('started', 'SierraManager'), ('stopped', 'SierraManager')]
+
+def test_manager_modules_load_on_first_lookup():
+    classes = LazyManagerClasses({'huawei': MANAGER_PATHS['huawei'], 'voip': MANAGER_PATHS['voip']})
+
+    assert 'voip' in classes and 'android' not in classes
+    assert classes._loaded == {}
+    assert classes['huawei'].__name__ == 'HuaweiManager'
+    assert list(classes._loaded) == ['huawei']
+    assert classes.load('voip') is classes['voip']
+    assert list(classes._loaded) == ['huawei', 'voip']
+    with pytest.raises(KeyError):
+        classes['android']
+
+def test_android_manager_defers_adb_keys():
+    manager = DEVICE_MANAGERS['android'](db=None)
+    assert manager.signer is None
+
+class StatusLog:
+    def __init__(self):
+        self.statuses = []
+
+    async def update_device_status(self, device_id, status):
+        self.statuses.append((device_id, status))
+
+@pytest.mark.asyncio
+async def test_cleanup_keeps_removed_status():
+    db = StatusLog()
+    manager = DEVICE_MANAGERS['huawei'](db)
+    running, removed = make_device("dev1"), make_device("dev2")
+    removed.status = "removed"
+
+    await manager.cleanup(running)
+    await manager.cleanup(removed)
+
+    # A removed device stays removed, so the shard coordinator won't re-claim it
+    assert db.statuses == [("dev1", "offline")]
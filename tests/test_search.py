@@ -0,0 +1,46 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from src.database.models import Message
+from src.database.search import (
+    InvalidCursor, decode_cursor, encode_cursor, keyset, paginate, text_match
+)
+
+def compile_sql(query):
+    return str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+class TestSearch:
+    def test_cursor_round_trip(self):
+        at = datetime(2026, 10, 19, 12, 30, 15, 123456)
+        assert decode_cursor(encode_cursor(at, 42)) == (at, 42)
+
+    def test_invalid_cursor(self):
+        with pytest.raises(InvalidCursor):
+            decode_cursor("not-a-cursor")
+
+    def test_paginate_sets_cursor_only_when_more_rows(self):
+        rows = [SimpleNamespace(id=i, received_at=datetime(2026, 10, 19, 12, i)) for i in (3, 2, 1)]
+
+        page = paginate(rows, 2, "received_at")
+        assert [r.id for r in page.items] == [3, 2]
+        assert decode_cursor(page.next_cursor) == (rows[1].received_at, 2)
+        assert paginate(rows, 3, "received_at").next_cursor is None
+
+    def test_keyset_continues_after_cursor(self):
+        cursor = encode_cursor(datetime(2026, 10, 19), 7)
+        sql = compile_sql(keyset(select(Message), Message.received_at, Message.id, cursor))
+
+        assert "(messages.received_at, messages.id) < ('2026-10-19 00:00:00', 7)" in sql
+        assert sql.endswith("ORDER BY messages.received_at DESC, messages.id DESC")
+
+    def test_match_expressions_use_indexed_forms(self):
+        words = compile_sql(select(Message.id).where(text_match(Message.text, "code 1234")))
+        assert "to_tsvector('simple', messages.text) @@ websearch_to_tsquery('simple', 'code 1234')" in words
+
+        substring = text_match(Message.text, "50%_off", "substring").compile(dialect=postgresql.dialect())
+        assert "ILIKE" in str(substring)
+        assert list(substring.params.values()) == ["%50\\%\\_off%"]
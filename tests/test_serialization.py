@@ -0,0 +1,45 @@
+import json
+import pytest
+from datetime import datetime
+
+from src import serialization
+from src.models import LogRecord, OutboundMessage
+
+class Row:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+@pytest.mark.parametrize("backend", ["orjson", "json"])
+def test_backends_agree(backend):
+    name, dumps = serialization.select_backend(backend)
+    assert name == backend
+    now = datetime(2026, 10, 19, 12, 30, 0, 123456)
+    message = OutboundMessage(id="abc", to_number="+1555", text="héllo", created_at=now)
+    value = {"when": now, "message": message, "tags": {"a"}, 1: None}
+
+    assert json.loads(dumps(value)) == {
+        "when": "2026-10-19T12:30:00.123456",
+        "message": json.loads(message.json()),
+        "tags": ["a"],
+        "1": None
+    }
+
+def test_missing_backend_falls_back_to_json():
+    name, dumps = serialization.select_backend("msgspec")
+    assert name in ("msgspec", "json")
+    assert json.loads(dumps({"a": 1})) == {"a": 1}
+
+def test_records_skip_validation():
+    now = datetime.utcnow()
+    row = Row(id=1, timestamp=now, level="INFO", message="up", source=None, details={}, extra=True)
+
+    assert serialization.records([row], LogRecord) == [
+        {"id": 1, "timestamp": now, "level": "INFO", "message": "up", "source": None, "details": {}}
+    ]
+
+def test_responses_render_with_backend():
+    now = datetime(2026, 10, 19)
+    response = serialization.FastJSONResponse({"at": now})
+    assert json.loads(response.body) == {"at": "2026-10-19T00:00:00"}
+    assert response.media_type == "application/json"
+    assert serialization.EncodedJSONResponse(b'[1,2]').body == b'[1,2]'
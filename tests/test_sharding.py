@@ -0,0 +1,94 @@
+import asyncio
+import pytest
+
+from helpers import make_device
+from src.sharding import MemoryLeaseStore, RedisLeaseStore, ShardCoordinator
+
+DEVICES = [make_device(f"dev{i}") for i in range(40)]
+
+class Worker:
+    """One bridge worker: a coordinator plus the devices it runs"""
+
+    def __init__(self, store, worker_id, ttl=0.3):
+        self.running = set()
+        self.coordinator = ShardCoordinator(
+            store, worker_id, f"http://{worker_id}",
+            self.list_devices, self.start_device, self.stop_device,
+            ttl=ttl, renew_interval=0.05
+        )
+
+    async def list_devices(self):
+        return DEVICES
+
+    async def start_device(self, device):
+        self.running.add(device.id)
+
+    async def stop_device(self, device):
+        self.running.discard(device.id)
+
+async def settle(workers, rounds=3):
+    for _ in range(rounds):
+        for worker in workers:
+            await worker.coordinator.tick()
+
+@pytest.fixture(params=["memory", "redis"])
+async def store(request):
+    if request.param == "memory":
+        yield MemoryLeaseStore()
+        return
+    fakeredis = pytest.importorskip("fakeredis")
+    store = RedisLeaseStore(client=fakeredis.FakeAsyncRedis(decode_responses=True), prefix="test:")
+    yield store
+    await store.close()
+
+@pytest.mark.asyncio
+class TestShardCoordinator:
+    async def test_devices_split_across_workers(self, store):
+        workers = [Worker(store, f"w{i}") for i in range(3)]
+        await settle(workers)
+
+        owned = [worker.running for worker in workers]
+        assert set().union(*owned) == {d.id for d in DEVICES}
+        assert sum(len(o) for o in owned) == len(DEVICES)
+        assert all(len(o) > 0 for o in owned)
+
+    async def test_lease_cannot_be_taken_while_held(self, store):
+        assert await store.acquire("dev0", "w0", 10)
+        assert not await store.acquire("dev0", "w1", 10)
+        assert await store.renew(["dev0"], "w1", 10) == []
+        await store.release("dev0", "w1")
+        assert (await store.owners())["dev0"] == "w0"
+
+    async def test_devices_fail_over_when_worker_dies(self, store):
+        workers = [Worker(store, f"w{i}") for i in range(2)]
+        await settle(workers)
+        dead, survivor = workers
+
+        # The dead worker stops renewing; wait for its leases to expire
+        await asyncio.sleep(0.4)
+        await settle([survivor])
+
+        assert survivor.running == {d.id for d in DEVICES}
+        assert await survivor.coordinator.owner_url("dev0") == "http://w1"
+
+    async def test_graceful_stop_hands_devices_over(self, store):
+        workers = [Worker(store, f"w{i}", ttl=30) for i in range(2)]
+        await settle(workers)
+
+        await workers[0].coordinator.stop()
+        await settle(workers[1:])
+
+        assert workers[0].running == set()
+        assert workers[1].running == {d.id for d in DEVICES}
+
+    async def test_new_worker_receives_its_share(self, store):
+        first = Worker(store, "w0", ttl=30)
+        await settle([first])
+        assert len(first.running) == len(DEVICES)
+
+        second = Worker(store, "w1", ttl=30)
+        await settle([first, second])
+
+        assert second.running
+        assert first.running.isdisjoint(second.running)
+        assert len(first.running) + len(second.running) == len(DEVICES)
@@ -0,0 +1,17 @@
+from src.startup import StartupTimer
+
+def test_phases_are_reported_in_order():
+    timer = StartupTimer(started=0.0)
+    timer.record("import", 0.25)
+    with timer.phase("database"):
+        pass
+    with timer.phase("devices"):
+        pass
+
+    assert timer.report()["total_ms"] is None
+    timer.finish()
+    report = timer.report()
+
+    assert list(report["phases_ms"]) == ["import", "database", "devices"]
+    assert report["phases_ms"]["import"] == 250.0
+    assert report["total_ms"] > 0
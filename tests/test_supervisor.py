@@ -0,0 +1,137 @@
+import asyncio
+import pytest
+from datetime import datetime
+
+from helpers import make_device
+from src.config import settings
+from src.device_managers.voip import VoipManager
+from src.models import SMS
+from src.supervisor import DeviceSupervisor, _DeviceState
+
+@pytest.fixture
+def fast_settings(monkeypatch):
+    monkeypatch.setattr(settings, "MESSAGE_CHECK_INTERVAL", 0.2)
+    monkeypatch.setattr(settings, "MESSAGE_CHECK_INTERVAL_FAST", 0.01)
+    monkeypatch.setattr(settings, "POLL_BACKOFF_FACTOR", 2.0)
+    monkeypatch.setattr(settings, "POLL_HOT_WINDOW", 0.05)
+    monkeypatch.setattr(settings, "DEVICE_SCAN_INTERVAL", 0.01)
+    monkeypatch.setattr(settings, "SUPERVISOR_MAX_FAILURES", 2)
+    return settings
+
+class FakeIngest:
+    def __init__(self):
+        self.messages = []
+
+    async def put_many(self, messages):
+        self.messages.extend(messages)
+        return len(messages)
+
+class FakeManager:
+    def __init__(self, inbox=(), fail_polls=0, fail_inits=0):
+        self.inbox = list(inbox)
+        self.fail_polls = fail_polls
+        self.fail_inits = fail_inits
+        self.initialized = 0
+        self.cleaned = 0
+        self.polls = 0
+
+    async def initialize(self, device):
+        self.initialized += 1
+        if self.fail_inits:
+            self.fail_inits -= 1
+            return False
+        return True
+
+    async def cleanup(self, device):
+        self.cleaned += 1
+
+    async def check_messages(self, device):
+        self.polls += 1
+        if self.fail_polls:
+            self.fail_polls -= 1
+            raise IOError("port vanished")
+        messages, self.inbox = self.inbox, []
+        return messages
+
+    async def get_signal_strength(self, device):
+        return 70
+
+@pytest.mark.asyncio
+class TestDeviceSupervisor:
+    async def test_interval_backs_off_when_idle_and_resets_on_activity(self, fast_settings):
+        supervisor = DeviceSupervisor(lambda d: None, FakeIngest())
+        state = _DeviceState(make_device())
+
+        intervals = [supervisor._next_interval(state, False) for _ in range(10)]
+        assert intervals[-1] == settings.MESSAGE_CHECK_INTERVAL
+        assert intervals == sorted(intervals)
+
+        assert supervisor._next_interval(state, True) == settings.MESSAGE_CHECK_INTERVAL_FAST
+
+    async def test_polled_messages_reach_ingest(self, fast_settings):
+        sms = SMS(
+            device_id="dev1", from_number="+1999", to_number="+15550001111",
+            text="code 1234", received_at=datetime.utcnow(), delivered=False
+        )
+        manager = FakeManager(inbox=[sms])
+        ingest = FakeIngest()
+        supervisor = DeviceSupervisor(lambda d: manager, ingest)
+        device = make_device()
+
+        supervisor.start(device)
+        await asyncio.sleep(0.3)
+        await supervisor.stop()
+
+        assert ingest.messages == [sms]
+        assert device.status == "online"
+        assert device.signal_strength == 70
+
+    async def test_failing_device_is_restarted(self, fast_settings):
+        manager = FakeManager(fail_polls=2)
+        supervisor = DeviceSupervisor(lambda d: manager, FakeIngest())
+
+        supervisor.start(make_device())
+        await asyncio.sleep(0.5)
+        await supervisor.stop()
+
+        assert manager.cleaned == 1
+        assert manager.initialized == 2
+
+    async def test_failed_initialization_is_cleaned_up(self, fast_settings):
+        manager = FakeManager(fail_inits=2)
+        supervisor = DeviceSupervisor(lambda d: manager, FakeIngest())
+
+        supervisor.start(make_device())
+        await asyncio.sleep(0.3)
+        await supervisor.stop()
+
+        # Each failed attempt releases what it opened before the retry
+        assert manager.initialized == 3
+        assert manager.cleaned == 2
+
+    async def test_voip_poll_errors_count_as_failures(self, fast_settings):
+        manager = VoipManager(None)
+        device = make_device()
+        device.config = {'service_type': 'twilio'}
+
+        # Not connected: raised, so the supervisor's failure count goes up
+        with pytest.raises(IOError):
+            await manager.check_messages(device)
+
+    async def test_mark_active_wakes_idle_device(self, fast_settings):
+        manager = FakeManager()
+        supervisor = DeviceSupervisor(lambda d: manager, FakeIngest())
+        supervisor.start(make_device())
+        await asyncio.sleep(0.5)
+        polls = manager.polls
+
+        supervisor.mark_active("dev1", seconds=1)
+        await asyncio.sleep(0.1)
+        await supervisor.stop()
+
+        assert manager.polls - polls >= 3
+
+    async def test_start_offsets_are_staggered(self):
+        offsets = {DeviceSupervisor._offset(f"dev{i}", 10) for i in range(50)}
+        assert len(offsets) > 40
+        assert all(0 <= offset < 10 for offset in offsets)
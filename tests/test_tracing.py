@@ -0,0 +1,75 @@
+import pytest
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from src.ingest import MessageIngest
+from src.models import SMS
+from src.tracing import ACKED, PARSED, PUSHED, LatencyTracker, SMSTrace, tracker
+
+def make_sms(text="code 1234"):
+    return SMS(
+        device_id="dev1", from_number="+1999", to_number="+15550001111",
+        text=text, received_at=datetime.utcnow(), delivered=False
+    )
+
+class FakeDB:
+    async def add_messages(self, messages):
+        for i, message in enumerate(messages):
+            message.id = i + 1
+        return messages
+
+    @asynccontextmanager
+    async def unit_of_work(self):
+        yield None
+
+    async def update_message_statuses(self, message_ids, status, session=None):
+        pass
+
+    async def schedule_retries(self, message_ids, error=None, session=None):
+        pass
+
+    async def add_message_counts(self, counts, session=None):
+        pass
+
+class FakeSMSHub:
+    async def push_sms(self, sms_id, phone, phone_from, text):
+        return text != "reject"
+
+@pytest.mark.asyncio
+class TestTracing:
+    async def test_durations_are_measured_between_stages(self):
+        trace = SMSTrace("huawei", detected=100.0)
+        trace.mark(PARSED, 100.5)
+        trace.mark(PUSHED, 101.0)
+        trace.mark(ACKED, 103.0)
+
+        assert trace.durations() == {"parsed": 0.5, "pushed": 0.5, "acked": 2.0, "total": 3.0}
+
+    async def test_percentiles_per_type_and_segment(self):
+        latency = LatencyTracker(size=100)
+        for i in range(200):
+            trace = SMSTrace("sierra", detected=0.0 + i)
+            trace.mark(ACKED, i + (i % 100 + 1) / 1000)
+            latency.record(trace)
+
+        total = latency.percentiles()["sierra"]["segments"]["total"]
+        assert total["count"] == 100
+        assert total["p50"] == pytest.approx(51, abs=0.1)
+        assert total["p99"] == pytest.approx(100, abs=0.1)
+        assert latency.percentiles("huawei") == {}
+
+    async def test_ingest_records_every_stage(self):
+        ingest = MessageIngest(FakeDB(), FakeSMSHub(), workers=1)
+        sms, rejected = make_sms(), make_sms("reject")
+        sms.trace = SMSTrace("android")
+        failed = tracker.failed.get("unknown", 0)
+
+        ingest.submit_many([sms, rejected])
+        await ingest.start()
+        await ingest.stop()
+
+        assert set(sms.trace.durations()) == {"queued", "persisted", "pushed", "acked", "total"}
+        assert not rejected.trace.marks[ACKED]
+        assert tracker.failed["unknown"] == failed + 1
+        assert tracker.percentiles("android")["android"]["segments"]["total"]["count"] >= 1
+        assert "trace" not in sms.dict()
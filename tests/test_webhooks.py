@@ -0,0 +1,278 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from aiohttp import web
+from datetime import datetime
+
+from helpers import make_device
+from src.device_managers.voip import VoipManager
+from src.ingest import MessageIngest
+from src.config import settings
+from src.models import SMS
+from src.webhooks import (
+    VoipWebhookHandler,
+    WebhookError,
+    TwilioWebhook,
+    NexmoWebhook,
+    PlivoWebhook
+)
+
+ACCOUNT_SID = "ACtest"
+AUTH_TOKEN = "test_token"
+WEBHOOK_URL = "https://bridge.example.com/api/webhooks/voip/twilio"
+
+def make_voip_device(api_base=None, **config):
+    return make_device("test_voip", "voip", status="online", phone_number="+15550001111", config={
+        'service_type': 'twilio',
+        'account_sid': ACCOUNT_SID,
+        'auth_token': AUTH_TOKEN,
+        'api_base': api_base,
+        **config
+    })
+
+def twilio_message(sid, direction="inbound", to="+15550001111",
+                   date="Mon, 01 Jan 2024 12:00:00 +0000"):
+    return {
+        'sid': sid,
+        'direction': direction,
+        'from': "+15559998888",
+        'to': to,
+        'body': f"code {sid}",
+        'date_created': date,
+        'date_sent': date
+    }
+
+@pytest.fixture
+async def twilio_server():
+    """Local stand-in for the Twilio REST API"""
+    pages = [
+        [twilio_message("SM1"), twilio_message("SM2", direction="outbound-api")],
+        [twilio_message("SM3")]
+    ]
+    requests = []
+
+    async def account(request):
+        return web.json_response({'sid': ACCOUNT_SID})
+
+    async def messages(request):
+        requests.append(dict(request.query))
+        page = int(request.query.get('Page', 0))
+        next_page = None
+        if page + 1 < len(pages):
+            next_page = f"/2010-04-01/Accounts/{ACCOUNT_SID}/Messages.json?Page={page + 1}"
+        return web.json_response({'messages': pages[page], 'next_page_uri': next_page})
+
+    app = web.Application()
+    app.router.add_get(f"/2010-04-01/Accounts/{ACCOUNT_SID}.json", account)
+    app.router.add_get(f"/2010-04-01/Accounts/{ACCOUNT_SID}/Messages.json", messages)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    yield f"http://127.0.0.1:{port}", requests
+
+    await runner.cleanup()
+
+def signed_twilio_request(sid="SM100"):
+    params = {
+        'MessageSid': sid,
+        'From': "+15559998888",
+        'To': "+15550001111",
+        'Body': "Your code is 1234"
+    }
+    headers = {'x-twilio-signature': TwilioWebhook.signature(WEBHOOK_URL, params, AUTH_TOKEN)}
+    return params, headers
+
+class FakeVoipManager:
+    def __init__(self, device):
+        self.device = device
+
+    def find_device(self, service_type, phone_number):
+        if phone_number == self.device.phone_number:
+            return self.device
+        return None
+
+@pytest.mark.asyncio
+class TestVoipWebhooks:
+    async def test_accepts_signed_twilio_message(self):
+        ingest = MessageIngest(db=None, smshub=None)
+        handler = VoipWebhookHandler(lambda: [FakeVoipManager(make_voip_device())], ingest)
+        params, headers = signed_twilio_request()
+
+        provider = handler.handle('twilio', WEBHOOK_URL, params, headers)
+
+        assert provider.name == 'twilio'
+        assert ingest.depth == 1
+        assert ingest.seen("twilio:SM100")
+
+    async def test_rejects_bad_signature(self):
+        ingest = MessageIngest(db=None, smshub=None)
+        handler = VoipWebhookHandler(lambda: [FakeVoipManager(make_voip_device())], ingest)
+        params, _ = signed_twilio_request()
+
+        with pytest.raises(WebhookError) as exc:
+            handler.handle('twilio', WEBHOOK_URL, params, {'x-twilio-signature': 'forged'})
+        assert exc.value.status_code == 403
+        assert ingest.depth == 0
+
+    async def test_duplicate_deliveries_are_idempotent(self):
+        ingest = MessageIngest(db=None, smshub=None)
+        handler = VoipWebhookHandler(lambda: [FakeVoipManager(make_voip_device())], ingest)
+        params, headers = signed_twilio_request()
+
+        handler.handle('twilio', WEBHOOK_URL, params, headers)
+        handler.handle('twilio', WEBHOOK_URL, params, headers)
+
+        assert ingest.depth == 1
+
+    async def test_unknown_number_matches_devices_on_other_workers(self):
+        handler = VoipWebhookHandler(lambda: [], MessageIngest(db=None, smshub=None))
+        params, headers = signed_twilio_request()
+
+        with pytest.raises(WebhookError) as exc:
+            handler.handle('twilio', WEBHOOK_URL, params, headers)
+        assert exc.value.status_code == 404
+        # main.route_webhook forwards to the owner of the matching device
+        assert handler.matches('twilio', make_voip_device(), params)
+        assert not handler.matches('plivo', make_voip_device(), params)
+
+    async def test_nexmo_numbers_without_plus_find_the_device(self):
+        device = make_voip_device(service_type='nexmo')
+        manager = VoipManager(db=None)
+
+        async def connected(device):
+            return True
+
+        manager._initialize_nexmo = connected
+        assert await manager._initialize_modem(device)
+        handler = VoipWebhookHandler(lambda: [manager], MessageIngest(db=None, smshub=None))
+
+        # Nexmo sends E.164 without the leading +
+        assert handler.find_device('nexmo', '15550001111') is device
+        assert handler.matches('nexmo', device, {'to': '15550001111'})
+        assert handler.find_device('nexmo', '15550002222') is None
+
+    async def test_nexmo_and_plivo_signatures(self):
+        params = {'msisdn': "15559998888", 'to': "15550001111", 'messageId': "0A1", 'text': "hi"}
+        params['sig'] = NexmoWebhook.signature(params, "secret")
+        assert NexmoWebhook().verify(WEBHOOK_URL, params, {}, "secret")
+        assert not NexmoWebhook().verify(WEBHOOK_URL, params, {}, "other")
+
+        headers = {
+            'x-plivo-signature-v2': PlivoWebhook.signature(WEBHOOK_URL, "nonce", "secret"),
+            'x-plivo-signature-v2-nonce': "nonce"
+        }
+        assert PlivoWebhook().verify(WEBHOOK_URL + "?a=1", {}, headers, "secret")
+
+@pytest.mark.asyncio
+class TestTwilioGapRecovery:
+    async def test_poll_paginates_and_skips_outbound(self, twilio_server):
+        api_base, requests = twilio_server
+        manager = VoipManager(None)
+        device = make_voip_device(api_base, last_check="2024-01-01T00:00:00")
+
+        assert await manager._initialize_modem(device) is True
+        messages = await manager.check_messages(device)
+
+        assert [m.external_id for m in messages] == ["twilio:SM1", "twilio:SM3"]
+        assert requests[0]['To'] == device.phone_number
+        assert len(requests) == 2
+        await manager.cleanup(device)
+
+    async def test_webhook_devices_poll_only_for_gap_recovery(self, twilio_server):
+        api_base, requests = twilio_server
+        manager = VoipManager(None)
+        device = make_voip_device(api_base, webhook=True, last_check="2024-01-01T00:00:00")
+
+        await manager._initialize_modem(device)
+        assert manager.find_device('twilio', device.phone_number) is device
+
+        first = await manager.check_messages(device)
+        second = await manager.check_messages(device)
+
+        assert len(first) == 2
+        assert second == []
+        assert len(requests) == 2
+        await manager.cleanup(device)
+
+class IdDB:
+    """add_messages with the message_ids claim; fails the first `failures` calls"""
+
+    def __init__(self, stored=(), failures=0):
+        self.stored = set(stored)
+        self.failures = failures
+        self.added = []
+
+    async def add_messages(self, messages):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database unavailable")
+        fresh = [m for m in messages if m.external_id not in self.stored]
+        self.stored.update(m.external_id for m in fresh)
+        for message in fresh:
+            message.id = len(self.added) + 1
+            self.added.append(message)
+        return fresh
+
+    @asynccontextmanager
+    async def unit_of_work(self):
+        yield None
+
+    async def update_message_statuses(self, message_ids, status, session=None):
+        pass
+
+    async def schedule_retries(self, message_ids, error=None, session=None):
+        pass
+
+    async def add_message_counts(self, counts, session=None):
+        pass
+
+class CountingSMSHub:
+    def __init__(self):
+        self.pushed = []
+
+    async def push_sms(self, sms_id, phone, phone_from, text):
+        self.pushed.append(sms_id)
+        return True
+
+def make_sms(external_id):
+    return SMS(
+        device_id="test_voip", from_number="+15559998888", to_number="+15550001111",
+        text="code 1234", received_at=datetime.utcnow(), delivered=False,
+        external_id=external_id
+    )
+
+@pytest.mark.asyncio
+class TestIngestDurability:
+    async def test_ids_stored_before_a_restart_are_skipped(self):
+        smshub = CountingSMSHub()
+        ingest = MessageIngest(IdDB(stored={"twilio:SM1"}), smshub)
+        batch = [make_sms("twilio:SM1"), make_sms("twilio:SM2")]
+        for sms in batch:
+            ingest.submit(sms)
+
+        stored = await ingest._process(batch)
+
+        assert [m.external_id for m in stored] == ["twilio:SM2"]
+        assert smshub.pushed == [stored[0].id]
+
+    async def test_batch_is_requeued_when_the_database_fails(self, monkeypatch):
+        monkeypatch.setattr(settings, "INGEST_REQUEUE_DELAY", 0)
+        db = IdDB(failures=1)
+        ingest = MessageIngest(db, CountingSMSHub())
+        sms = make_sms("twilio:SM1")
+        ingest.submit(sms)
+        batch = [await ingest._queue.get()]
+
+        with pytest.raises(ConnectionError):
+            await ingest._process(batch)
+        assert not ingest.seen("twilio:SM1")
+
+        await asyncio.gather(*ingest._requeues)
+        assert ingest.depth == 1 and ingest.seen("twilio:SM1")
+        await ingest._process([await ingest._queue.get()])
+        assert [m.external_id for m in db.added] == ["twilio:SM1"]